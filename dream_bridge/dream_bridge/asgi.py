@@ -3,6 +3,12 @@ ASGI config for dream_bridge project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Le flux SSE du statut des rêves (api/dreams/<id>/events/, voir
+dream_bridge_app/status_events.py) doit être servi par un serveur ASGI,
+par exemple : uvicorn dream_bridge.asgi:application. Ce point d'entrée
+l'active (DREAM_STATUS_STREAM=1) ; sous WSGI, la page d'attente interroge
+l'API de statut.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -12,5 +18,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dream_bridge.settings')
+os.environ.setdefault('DREAM_STATUS_STREAM', '1')
 
 application = get_asgi_application()
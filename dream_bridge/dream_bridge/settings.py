@@ -1,5 +1,7 @@
 from pathlib import Path
+import json
 import os
+from celery.schedules import crontab
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -84,6 +86,18 @@ DATABASES = {
     }
 }
 
+# Profil SQLite (voir dream_bridge_app/sqlite_tuning.py) : "production" active
+# WAL, synchronous=NORMAL, busy_timeout, mmap et cache sur chaque connexion,
+# et des transactions IMMEDIATE (attente du verrou au lieu de "database is locked")
+DREAM_SQLITE_PROFILE = os.environ.get("DREAM_SQLITE_PROFILE", "default")
+if DREAM_SQLITE_PROFILE == "production":
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# File d'écriture unique du pipeline (voir db_writer.py) : taille max du lot et
+# fenêtre d'attente (ms) ; DREAM_DB_WRITER_BATCH_SIZE=1 la désactive
+DREAM_DB_WRITER_BATCH_SIZE = int(os.environ.get("DREAM_DB_WRITER_BATCH_SIZE", "1"))
+DREAM_DB_WRITER_WINDOW_MS = int(os.environ.get("DREAM_DB_WRITER_WINDOW_MS", "0"))
+
 # Validation des mots de passe
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -99,6 +113,118 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Europe/Paris'
+CELERY_BEAT_SCHEDULE = {
+    # Horoscopes + citation du jour, traduits et mis en cache pour la journée
+    'refresh-daily-messages': {
+        'task': 'dream_bridge_app.tasks.refresh_daily_messages_task',
+        'schedule': crontab(hour=0, minute=5),
+    },
+}
+CELERY_TASK_ROUTES = {
+    'dream_bridge_app.tasks.process_dream_async_task': {'queue': 'dreams_async'},
+}
+# Encodage AVIF/WebP, gourmand en CPU : file dédiée seulement si un worker la
+# consomme (voir image_derivatives.py) ; vide par défaut, file 'celery' partagée.
+DREAM_IMAGE_QUEUE = os.environ.get("DREAM_IMAGE_QUEUE", "")
+if DREAM_IMAGE_QUEUE:
+    CELERY_TASK_ROUTES['dream_bridge_app.tasks.generate_image_derivatives_task'] = {'queue': DREAM_IMAGE_QUEUE}
+
+# Pipeline des rêves : "celery" (une tâche par étape) ou "async"
+# (boucle asyncio par processus, DREAM_ASYNC_CONCURRENCY rêves à la fois)
+DREAM_PIPELINE_MODE = os.environ.get("DREAM_PIPELINE_MODE", "celery")
+DREAM_ASYNC_CONCURRENCY = int(os.environ.get("DREAM_ASYNC_CONCURRENCY", "32"))
+
+# Backend fournisseurs du pipeline : "real", "simulated" ou "replay" (voir providers.py)
+DREAM_PROVIDER_BACKEND = os.environ.get("DREAM_PROVIDER_BACKEND", "simulated")
+
+# Backend simulé : latence médiane (s), dispersion log-normale et taux d'erreur
+# par étape, proches des timings réels. DREAM_SIMULATION_LATENCY_SCALE les
+# multiplie (0 = instantané, 1 = timings réalistes pour les tests de charge).
+DREAM_SIMULATION_STAGES = {
+    "transcription": {"latency": 4.0, "sigma": 0.35, "error_rate": 0.0},
+    "emotion": {"latency": 1.5, "sigma": 0.3, "error_rate": 0.0},
+    "image_prompt": {"latency": 1.2, "sigma": 0.3, "error_rate": 0.0},
+    "image": {"latency": 15.0, "sigma": 0.4, "error_rate": 0.0},
+    "personal_message": {"latency": 1.5, "sigma": 0.3, "error_rate": 0.0},
+}
+for _stage, _profile in json.loads(os.environ.get("DREAM_SIMULATION_STAGES", "{}")).items():
+    DREAM_SIMULATION_STAGES.setdefault(_stage, {}).update(_profile)
+DREAM_SIMULATION_LATENCY_SCALE = float(os.environ.get("DREAM_SIMULATION_LATENCY_SCALE", "0"))
+
+# Enregistrement des réponses réelles (si renseigné) et rejeu ("replay")
+DREAM_PROVIDER_RECORD_DIR = os.environ.get("DREAM_PROVIDER_RECORD_DIR", "")
+DREAM_REPLAY_DIR = os.environ.get("DREAM_REPLAY_DIR", str(BASE_DIR / "replay"))
+DREAM_REPLAY_SPEED = float(os.environ.get("DREAM_REPLAY_SPEED", "1"))
+
+# Émotions : le LLM n'est appelé que si la marge du score lexical local
+# (écart entre les deux premières émotions) est sous ce seuil (voir emotions.py)
+DREAM_EMOTION_MARGIN_THRESHOLD = float(os.environ.get("DREAM_EMOTION_MARGIN_THRESHOLD", "0.25"))
+DREAM_EMOTION_CACHE_SIZE = int(os.environ.get("DREAM_EMOTION_CACHE_SIZE", "4096"))
+# Appels LLM d'émotions regroupés par processus (voir emotion_batcher.py) : à
+# activer (taille > 1) seulement quand beaucoup de rêves partagent un processus
+# (mode async, workers à threads) ; sinon chaque appel attendrait la fenêtre pour rien.
+DREAM_EMOTION_BATCH_WINDOW_MS = int(os.environ.get("DREAM_EMOTION_BATCH_WINDOW_MS", "200"))
+DREAM_EMOTION_BATCH_SIZE = int(os.environ.get("DREAM_EMOTION_BATCH_SIZE", "1"))
+
+# Mémo des traductions (voir translations.py) : LRU par processus, table bornée
+DREAM_TRANSLATION_LRU_SIZE = int(os.environ.get("DREAM_TRANSLATION_LRU_SIZE", "1024"))
+DREAM_TRANSLATION_MAX_ROWS = int(os.environ.get("DREAM_TRANSLATION_MAX_ROWS", "20000"))
+
+# Redis applicatif (verrous single-flight) : par défaut celui du broker Celery
+DREAM_REDIS_URL = os.environ.get("DREAM_REDIS_URL", CELERY_BROKER_URL)
+DREAM_REDIS_TIMEOUT = float(os.environ.get("DREAM_REDIS_TIMEOUT", "0.5"))
+# Single-flight (voir singleflight.py) : durée de vie du verrou, attente max des suiveurs
+SINGLE_FLIGHT_LOCK_TTL = float(os.environ.get("SINGLE_FLIGHT_LOCK_TTL", "60"))
+SINGLE_FLIGHT_WAIT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_WAIT_TIMEOUT", "90"))
+
+# Blob store des audios sources (volume partagé entre web et workers, voir blobstore.py)
+DREAM_BLOB_ROOT = os.environ.get("DREAM_BLOB_ROOT", str(BASE_DIR / "blobs"))
+
+# Stockage des images générées (voir image_store.py) : "png" (sans perte), "webp" ou "avif"
+DREAM_IMAGE_STORAGE_FORMAT = os.environ.get("DREAM_IMAGE_STORAGE_FORMAT", "png")
+DREAM_IMAGE_STORAGE_QUALITY = int(os.environ.get("DREAM_IMAGE_STORAGE_QUALITY", "90"))
+
+# Dérivés des images générées (voir image_derivatives.py) : largeurs, formats par préférence, qualité
+DREAM_IMAGE_DERIVATIVE_WIDTHS = [int(w) for w in os.environ.get("DREAM_IMAGE_DERIVATIVE_WIDTHS", "320,640,1024").split(",")]
+DREAM_IMAGE_DERIVATIVE_FORMATS = os.environ.get("DREAM_IMAGE_DERIVATIVE_FORMATS", "avif,webp").split(",")
+DREAM_IMAGE_DERIVATIVE_QUALITY = int(os.environ.get("DREAM_IMAGE_DERIVATIVE_QUALITY", "70"))
+
+# Rapports du tableau de bord en cache (invalidés à chaque changement d'un rêve, voir report_cache.py)
+DREAM_REPORT_CACHE_SECONDS = int(os.environ.get("DREAM_REPORT_CACHE_SECONDS", "3600"))
+
+# Cache par défaut : propre à chaque processus. Cache "reports" : partagé
+# entre web et workers Celery (leurs invalidations doivent se voir), dans Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'reports': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get("DREAM_REPORT_CACHE_URL", DREAM_REDIS_URL),
+        'KEY_PREFIX': 'dream-bridge',
+        'OPTIONS': {
+            'socket_connect_timeout': DREAM_REDIS_TIMEOUT,
+            'socket_timeout': DREAM_REDIS_TIMEOUT,
+        },
+    },
+}
+
+# Flux SSE du statut d'un rêve (voir status_events.py). Activé par asgi.py : sous
+# WSGI, chaque connexion ouverte bloquerait un worker ; la page reste au polling.
+DREAM_STATUS_STREAM_ENABLED = os.environ.get("DREAM_STATUS_STREAM", "0") == "1"
+# Durée max d'une connexion SSE
+DREAM_STATUS_STREAM_TIMEOUT = float(os.environ.get("DREAM_STATUS_STREAM_TIMEOUT", "300"))
+
+# Galerie : rêves par page (pagination par curseur, voir gallery.py)
+DREAM_GALLERY_PAGE_SIZE = int(os.environ.get("DREAM_GALLERY_PAGE_SIZE", "24"))
+
+# Clients HTTP des fournisseurs (Groq, Mistral) : un pool keep-alive par processus
+PROVIDER_HTTP_MAX_CONNECTIONS = int(os.environ.get("PROVIDER_HTTP_MAX_CONNECTIONS", "64"))
+PROVIDER_HTTP_MAX_KEEPALIVE = int(os.environ.get("PROVIDER_HTTP_MAX_KEEPALIVE", "32"))
+PROVIDER_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("PROVIDER_HTTP_KEEPALIVE_EXPIRY", "90"))
+PROVIDER_HTTP_TIMEOUT = float(os.environ.get("PROVIDER_HTTP_TIMEOUT", "120"))  # génération d'image lente
+PROVIDER_HTTP_CONNECT_TIMEOUT = float(os.environ.get("PROVIDER_HTTP_CONNECT_TIMEOUT", "5"))
+PROVIDER_WARMUP_CONNECT = os.environ.get("PROVIDER_WARMUP_CONNECT", "1") == "1"
 
 # Fichiers media (uploads)
 MEDIA_URL = '/media/'
@@ -1,6 +1,11 @@
 from django.contrib import admin
-from .models import Dream
+from .models import AudioBlob, DailyMessage, Dream, DreamDailyStat, ProviderAgent, TranscriptionCache, Translation
 
 # Register your models here.
 admin.site.register(Dream)
-
+admin.site.register(ProviderAgent)
+admin.site.register(AudioBlob)
+admin.site.register(TranscriptionCache)
+admin.site.register(DailyMessage)
+admin.site.register(Translation)
+admin.site.register(DreamDailyStat)
@@ -0,0 +1,127 @@
+"""
+Registre des agents fournisseurs (agent d'images Mistral).
+
+Avant, chaque rêve appelait beta.agents.create : un aller-retour API de
+plus sur le chemin critique et un agent orphelin par rêve. Ici, un agent
+est créé une seule fois par configuration, repéré par le hash de
+(modèle, nom, description, instructions, outils), gardé en mémoire et en
+base (ProviderAgent).
+
+Validation paresseuse : on ne vérifie pas l'agent à chaque rêve. S'il a
+disparu côté fournisseur (404 au démarrage d'une conversation), on
+l'oublie, on le recrée et on relance une fois. Changer la configuration
+change le hash, donc crée un nouvel agent.
+"""
+import hashlib
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from mistralai.models import MistralError
+
+from . import stats
+from .models import ProviderAgent
+
+IMAGE_AGENT_CONFIG = {
+    "model": "mistral-large-latest",
+    "name": "Générateur d'images de rêves",
+    "description": "Agent qui utilise un outil de génération d'images à partir d'un prompt texte.",
+    "instructions": "Utilise l'outil de génération d'image pour créer une image basée sur le prompt fourni.",
+    "tools": [{"type": "image_generation"}],
+}
+
+_agent_ids = {}
+_lock = threading.Lock()
+
+
+def config_hash(config: dict, provider: str = "mistral") -> str:
+    payload = json.dumps({"provider": provider, **config}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lookup(key: str):
+    agent_id = _agent_ids.get(key)
+    if agent_id:
+        stats.incr("agents.hits")
+        return agent_id
+    agent_id = ProviderAgent.objects.filter(config_hash=key).values_list("agent_id", flat=True).first()
+    if agent_id:
+        stats.incr("agents.hits")
+        with _lock:
+            _agent_ids[key] = agent_id
+    return agent_id
+
+
+def _store(key: str, agent_id: str, config: dict, provider: str) -> str:
+    """Enregistre l'agent ; si un autre worker a gagné la course, on garde le sien."""
+    stats.incr("agents.misses")
+    agent, _ = ProviderAgent.objects.get_or_create(
+        config_hash=key,
+        defaults={"provider": provider, "agent_id": agent_id, "config": config,
+                  "last_validated_at": timezone.now()},
+    )
+    agent_id = agent.agent_id
+    with _lock:
+        _agent_ids[key] = agent_id
+    return agent_id
+
+
+def forget_agent(config: dict, provider: str = "mistral") -> None:
+    key = config_hash(config, provider)
+    with _lock:
+        _agent_ids.pop(key, None)
+    ProviderAgent.objects.filter(config_hash=key).delete()
+
+
+def _is_missing_agent(exc: Exception) -> bool:
+    return isinstance(exc, MistralError) and exc.status_code == 404
+
+
+def get_agent_id(client, config: dict = IMAGE_AGENT_CONFIG, provider: str = "mistral") -> str:
+    key = config_hash(config, provider)
+    agent_id = _lookup(key)
+    if agent_id:
+        return agent_id
+    agent = client.beta.agents.create(**config)
+    return _store(key, agent.id, config, provider)
+
+
+def start_conversation(client, inputs: str, config: dict = IMAGE_AGENT_CONFIG):
+    """Démarre une conversation avec l'agent enregistré (recréé une fois s'il a disparu)."""
+    agent_id = get_agent_id(client, config)
+    try:
+        return client.beta.conversations.start(agent_id=agent_id, inputs=inputs)
+    except Exception as e:
+        if not _is_missing_agent(e):
+            raise
+        forget_agent(config)
+        agent_id = get_agent_id(client, config)
+        return client.beta.conversations.start(agent_id=agent_id, inputs=inputs)
+
+
+async def aget_agent_id(client, config: dict = IMAGE_AGENT_CONFIG, provider: str = "mistral") -> str:
+    key = config_hash(config, provider)
+    agent_id = await sync_to_async(_lookup)(key)
+    if agent_id:
+        return agent_id
+    agent = await client.beta.agents.create_async(**config)
+    return await sync_to_async(_store)(key, agent.id, config, provider)
+
+
+async def astart_conversation(client, inputs: str, config: dict = IMAGE_AGENT_CONFIG):
+    agent_id = await aget_agent_id(client, config)
+    try:
+        return await client.beta.conversations.start_async(agent_id=agent_id, inputs=inputs)
+    except Exception as e:
+        if not _is_missing_agent(e):
+            raise
+        await sync_to_async(forget_agent)(config)
+        agent_id = await aget_agent_id(client, config)
+        return await client.beta.conversations.start_async(agent_id=agent_id, inputs=inputs)
+
+
+def reset_agent_cache() -> None:
+    with _lock:
+        _agent_ids.clear()
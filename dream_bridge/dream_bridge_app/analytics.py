@@ -0,0 +1,162 @@
+"""
+Analyses de l'historique des rêves d'un utilisateur, vectorisées avec NumPy.
+
+Deux requêtes, sans conversion Python par rêve :
+
+- par jour local, le nombre de rêves et la longueur cumulée des récits,
+  lus dans l'agrégat DreamDailyStat (son coût suit le nombre de jours) ;
+- la suite des émotions, dans l'ordre chronologique, seule colonne lue sur
+  les rêves eux-mêmes.
+
+Elles deviennent des tableaux NumPy compacts (jours en int32 depuis
+l'epoch, émotions codées en int8). Tout le reste se fait sans boucle
+Python, si bien que plusieurs années d'historique se traitent en quelques
+dizaines de millisecondes :
+
+- séries de jours consécutifs avec rêve : la plus longue et l'actuelle
+  (terminée aujourd'hui ou hier) ;
+- moyennes glissantes sur 7 et 30 jours du nombre de rêves par jour et de
+  la longueur des récits ;
+- matrice de transitions d'émotion d'un rêve au suivant (comptes et
+  probabilités par ligne).
+"""
+from datetime import date
+
+import numpy as np
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Dream, DreamDailyStat
+
+EMOTION_CODES = [code for code, _ in Dream.EMOTIONS]
+ROLLING_WINDOWS = (7, 30)
+SERIES_DAYS = 90  # profondeur des séries glissantes renvoyées (graphique)
+_EPOCH = date(1970, 1, 1)
+
+
+class DreamHistory:
+    """
+    Jours avec rêve (triés) et, pour chacun, nombre de rêves et longueur
+    cumulée des récits ; émotions de chaque rêve, ordre chronologique.
+    """
+
+    def __init__(self, days: np.ndarray, counts: np.ndarray, length_sums: np.ndarray, emotions: np.ndarray):
+        self.days = days
+        self.counts = counts
+        self.length_sums = length_sums
+        self.emotions = emotions
+
+    @classmethod
+    def load(cls, user) -> "DreamHistory":
+        daily = list(DreamDailyStat.objects.filter(user=user)
+                     .values("day").order_by("day")
+                     .annotate(dreams=Sum("dreams"), length=Sum("transcription_length"))
+                     .values_list("day", "dreams", "length"))
+        day_values, counts, length_sums = zip(*daily) if daily else ((), (), ())
+        codes = list(Dream.objects.filter(user=user).order_by("created_at", "id").values_list("emotion", flat=True))
+        return cls(np.array(day_values, dtype="datetime64[D]").astype(np.int32),
+                   np.array(counts, dtype=np.int64), np.array(length_sums, dtype=np.int64),
+                   _encode_emotions(codes))
+
+    def __len__(self) -> int:
+        return len(self.emotions)
+
+
+def _encode_emotions(codes: list) -> np.ndarray:
+    """Indices dans EMOTION_CODES (int8), -1 pour une émotion vide ou inconnue."""
+    known = np.array(EMOTION_CODES)
+    order = np.argsort(known)
+    values = np.array(codes, dtype=known.dtype)
+    positions = order[np.searchsorted(known, values, sorter=order).clip(max=len(known) - 1)]
+    return np.where(known[positions] == values, positions, -1).astype(np.int8)
+
+
+def _day_number(day: date) -> int:
+    return (day - _EPOCH).days
+
+
+def streaks(history: DreamHistory, today: date = None) -> dict:
+    """Plus longue série de jours consécutifs avec rêve, et série en cours."""
+    if not len(history.days):
+        return {"longest": 0, "current": 0}
+    unique_days = history.days
+    # Une série s'arrête là où l'écart entre deux jours dépasse 1.
+    breaks = np.flatnonzero(np.diff(unique_days) != 1)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.concatenate((breaks, [len(unique_days) - 1]))
+    lengths = ends - starts + 1
+
+    today_number = _day_number(today or timezone.localdate())
+    current = int(lengths[-1]) if today_number - unique_days[-1] <= 1 else 0
+    return {"longest": int(lengths.max()), "current": current}
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return cumulative[window:] - cumulative[:-window] if len(values) >= window else np.empty(0, dtype=np.int64)
+
+
+def rolling_averages(history: DreamHistory, today: date = None) -> dict:
+    """
+    Pour chaque fenêtre (7, 30 jours) se terminant aujourd'hui : rêves par
+    jour en moyenne et longueur moyenne des récits (None sans rêve), plus la
+    série quotidienne des rêves par jour sur les SERIES_DAYS derniers jours.
+    """
+    today_number = _day_number(today or timezone.localdate())
+    if not len(history.days) or today_number < history.days.min():
+        return {f"{w}d": {"dreams_per_day": 0.0, "avg_length": None, "series": []} for w in ROLLING_WINDOWS}
+
+    result = {}
+    first = int(history.days[0])
+    offsets = history.days - first
+    span = max(today_number - first + 1, int(offsets[-1]) + 1)
+    counts = np.zeros(span, dtype=np.int64)
+    length_sums = np.zeros(span, dtype=np.int64)
+    counts[offsets] = history.counts
+    length_sums[offsets] = history.length_sums
+
+    for window in ROLLING_WINDOWS:
+        # Jours antérieurs au premier rêve comptés à zéro pour couvrir toute la fenêtre.
+        padded_counts = np.concatenate((np.zeros(window - 1), counts))
+        padded_lengths = np.concatenate((np.zeros(window - 1), length_sums))
+        dreams = _rolling_sum(padded_counts, window)
+        lengths = _rolling_sum(padded_lengths, window)
+        end = today_number - first + 1
+        last_dreams = int(dreams[end - 1])
+        result[f"{window}d"] = {
+            "dreams_per_day": round(last_dreams / window, 3),
+            "avg_length": round(float(lengths[end - 1]) / last_dreams, 2) if last_dreams else None,
+            "series": np.round(dreams[max(0, end - SERIES_DAYS):end] / window, 3).tolist(),
+        }
+    return result
+
+
+def emotion_transitions(history: DreamHistory) -> dict:
+    """Transitions d'émotion entre rêves consécutifs (émotions inconnues ignorées)."""
+    size = len(EMOTION_CODES)
+    counts = np.zeros((size, size), dtype=np.int64)
+    if len(history) > 1:
+        before, after = history.emotions[:-1], history.emotions[1:]
+        known = (before >= 0) & (after >= 0)
+        np.add.at(counts, (before[known], after[known]), 1)
+    totals = counts.sum(axis=1, keepdims=True)
+    probabilities = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+    probabilities = np.round(probabilities, 3)
+    return {
+        "labels": EMOTION_CODES,
+        "counts": counts.tolist(),
+        "probabilities": probabilities.tolist(),
+        # Lignes non vides, prêtes pour le template : {"label", "cells"}
+        "rows": [{"label": EMOTION_CODES[i], "cells": probabilities[i].tolist()}
+                 for i in np.flatnonzero(totals[:, 0])],
+    }
+
+
+def dream_analytics(user, today: date = None) -> dict:
+    """Séries, moyennes glissantes et transitions pour tout l'historique de `user`."""
+    history = DreamHistory.load(user)
+    return {
+        "streaks": streaks(history, today),
+        "rolling": rolling_averages(history, today),
+        "transitions": emotion_transitions(history),
+    }
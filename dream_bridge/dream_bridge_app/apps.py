@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DreamBridgeAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dream_bridge_app'
+
+    def ready(self):
+        import dream_bridge_app.signals  # noqa
+        import dream_bridge_app.sqlite_tuning  # noqa
@@ -0,0 +1,183 @@
+"""
+Exécution asynchrone du pipeline : un seul processus worker fait avancer
+plusieurs dizaines de rêves en même temps.
+
+Toutes les étapes attendent le réseau (Whisper, chat Groq, agents Mistral,
+téléchargement du fichier) : au lieu de bloquer un slot prefork pendant
+20–60 s, on les exécute comme coroutines sur une boucle asyncio propre au
+processus, avec les méthodes async du backend fournisseur (clients
+asynchrones en mode réel) et un plafond de concurrence
+(settings.DREAM_ASYNC_CONCURRENCY).
+
+Mêmes points de reprise que le pipeline Celery (services.run_*_stage) :
+chaque étape saute son travail si son artefact est déjà en base.
+
+Worker conseillé :
+    celery -A dream_bridge worker -P threads -c 64 -Q dreams_async
+"""
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import blobstore, db_writer, emotions, image_store, services
+from .models import Dream
+from .prompt_registry import EMOTION_SYSTEM, IMAGE_PROMPT_SYSTEM, get_prompt
+from .providers import get_provider
+
+
+async def _llm_emotion_scores(transcription: str) -> dict:
+    # Les rêves menés de front par la boucle partagent le batcher du processus.
+    future = services.submit_llm_emotion_scores(transcription)
+    if future is not None:
+        return await asyncio.wrap_future(future)
+    system_prompt = services.get_emotion_system_prompt()
+    if not system_prompt:
+        return {}
+    return await get_provider().aemotion_scores(transcription, system_prompt)
+
+
+async def _get_emotion_scores(transcription: str) -> dict:
+    """Version asynchrone de services.get_emotion_scores."""
+    return await emotions.aclassify(transcription, _llm_emotion_scores)
+
+
+async def _transcribe_audio(audio_ref: str) -> str:
+    """Version asynchrone de services.transcribe_audio (même cache)."""
+    provider = get_provider()
+    entry = await sync_to_async(services.lookup_transcription)(audio_ref, provider.name)
+    if entry is not None:
+        return entry.text
+    text = await provider.atranscribe(blobstore.resolve(audio_ref))
+    await sync_to_async(services.remember_transcription)(audio_ref, provider.name, text)
+    return text
+
+
+async def run_transcription_stage(dream_id: str) -> None:
+    dream = await Dream.objects.aget(id=dream_id)
+    if dream.status != Dream.DreamStatus.PROCESSING:
+        dream.status = Dream.DreamStatus.PROCESSING
+        await db_writer.asave_fields(dream, ["status", "updated_at"])
+    if dream.transcription:
+        return
+
+    dream.transcription = await _transcribe_audio(dream.audio_ref)
+    await db_writer.asave_fields(dream, ["transcription", "updated_at"])
+    await sync_to_async(services._discard_source_audio)(dream)
+
+
+async def run_emotion_stage(dream_id: str) -> None:
+    dream = await Dream.objects.aget(id=dream_id)
+    if dream.emotion_scores is not None:
+        return
+
+    dream.emotion_prompt_version = get_prompt(EMOTION_SYSTEM).version
+    dream.emotion_scores = await _get_emotion_scores(dream.transcription)
+    dream.emotion = services.dominant_emotion(dream.emotion_scores)
+    await db_writer.asave_fields(dream, ["emotion_scores", "emotion", "emotion_prompt_version", "updated_at"])
+
+
+async def run_image_prompt_stage(dream_id: str) -> None:
+    dream = await Dream.objects.aget(id=dream_id)
+    if dream.image_prompt:
+        return
+
+    system_prompt = get_prompt(IMAGE_PROMPT_SYSTEM)
+    dream.image_prompt = await get_provider().aimage_prompt(dream.transcription, system_prompt.text)
+    dream.image_prompt_version = system_prompt.version
+    await db_writer.asave_fields(dream, ["image_prompt", "image_prompt_version", "updated_at"])
+
+
+async def run_image_stage(dream_id: str) -> None:
+    dream = await Dream.objects.aget(id=dream_id)
+    if not dream.generated_image:
+        await image_store.astore_image_stream(dream, get_provider().agenerate_image_stream(dream.image_prompt))
+        await db_writer.asave_fields(dream, ["generated_image", "updated_at"])
+    if not dream.image_derivatives:
+        await sync_to_async(services.schedule_image_derivatives, thread_sensitive=False)(str(dream.id))
+
+
+async def run_personal_message_stage(dream_id: str) -> None:
+    # Appel Groq + phrase du jour encore synchrones : thread dédié pour ne pas
+    # bloquer la boucle ni le thread ORM partagé.
+    await sync_to_async(services.run_personal_message_stage, thread_sensitive=False)(dream_id)
+
+
+async def _image_branch(dream_id: str) -> None:
+    await run_image_prompt_stage(dream_id)
+    await run_image_stage(dream_id)
+
+
+async def run_dream_pipeline(dream_id: str) -> None:
+    """Un rêve : transcription → (émotion ‖ prompt → image) → message."""
+    stage = services.STAGE_TRANSCRIPTION
+    try:
+        await run_transcription_stage(dream_id)
+        stage = services.STAGE_EMOTION
+        emotion_result, image_result = await asyncio.gather(
+            run_emotion_stage(dream_id), _image_branch(dream_id), return_exceptions=True
+        )
+        for stage, result in ((services.STAGE_EMOTION, emotion_result), (services.STAGE_IMAGE, image_result)):
+            if isinstance(result, BaseException):
+                raise result
+        stage = services.STAGE_PERSONAL_MESSAGE
+        await run_personal_message_stage(dream_id)
+        # COMPLETED seulement une fois les deux branches réussies (voir services.complete_dream).
+        await sync_to_async(services.complete_dream)(dream_id)
+    except Exception as e:
+        await sync_to_async(services.mark_dream_failed)(dream_id, stage, e)
+
+
+async def run_dreams_concurrently(dream_ids, concurrency: int = None) -> None:
+    """Fait avancer plusieurs rêves en parallèle, au plus `concurrency` à la fois."""
+    semaphore = asyncio.Semaphore(concurrency or settings.DREAM_ASYNC_CONCURRENCY)
+
+    async def _bounded(dream_id):
+        async with semaphore:
+            await run_dream_pipeline(dream_id)
+
+    await asyncio.gather(*(_bounded(dream_id) for dream_id in dream_ids))
+
+
+# ----------------------- Boucle par processus -----------------------
+
+class AsyncPipelineExecutor:
+    """
+    Boucle asyncio dans un thread de fond, partagée par toutes les tâches
+    Celery du processus. submit() renvoie un concurrent.futures.Future :
+    la tâche l'attend (ack inchangé) pendant que la boucle fait avancer
+    les autres rêves.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._thread = threading.Thread(target=self._run_loop, name="dream-async-pipeline", daemon=True)
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _bounded(self, dream_id: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            await run_dream_pipeline(dream_id)
+
+    def submit(self, dream_id: str):
+        return asyncio.run_coroutine_threadsafe(self._bounded(dream_id), self._loop)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> AsyncPipelineExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AsyncPipelineExecutor(settings.DREAM_ASYNC_CONCURRENCY)
+        return _executor
@@ -0,0 +1,153 @@
+"""
+Blob store des audios sources, partagé entre nœuds web et workers.
+
+Avant, la vue écrivait l'upload dans tempfile.gettempdir() et passait ce
+chemin local à Celery : impossible de lancer les workers sur une autre
+machine. Ici, l'upload est copié en flux dans DREAM_BLOB_ROOT (volume
+partagé), sous son SHA-256 :
+
+    <DREAM_BLOB_ROOT>/ab/cd/abcd…   (deux niveaux de répertoires)
+
+L'écriture passe par un fichier temporaire du même volume puis un
+os.replace atomique : un lecteur voit le blob entier ou rien. Un même
+contenu n'est stocké qu'une fois.
+
+Dream.audio_ref contient la clé, pas un chemin. Chaque rêve prend une
+référence (AudioBlob.refcount) à l'upload et la rend une fois la
+transcription enregistrée, en échec (mark_dream_failed) ou à sa
+suppression (signals.py) ; à zéro, le fichier est supprimé.
+collect_garbage() rattrape ce qu'un crash aurait laissé derrière lui.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import AudioBlob
+
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+TMP_DIR = "tmp"
+STALE_TMP_SECONDS = 3600
+
+
+def blob_root() -> str:
+    return str(settings.DREAM_BLOB_ROOT)
+
+
+def is_blob_key(ref: str) -> bool:
+    return bool(ref) and bool(KEY_RE.match(ref))
+
+
+def blob_path(key: str) -> str:
+    if not is_blob_key(key):
+        raise ValueError(f"Clé de blob invalide : {key!r}")
+    return os.path.join(blob_root(), key[:2], key[2:4], key)
+
+
+def resolve(ref: str) -> str:
+    """
+    Chemin local d'un audio_ref : clé de blob, ou ancien chemin absolu
+    (messages déjà en file avant le blob store).
+    """
+    return blob_path(ref) if is_blob_key(ref) else ref
+
+
+def _write_temp(chunks) -> tuple:
+    """Copie le flux dans un fichier temporaire du volume partagé, en le hachant."""
+    tmp_dir = os.path.join(blob_root(), TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return digest.hexdigest(), size, tmp_path
+
+
+def put(chunks) -> str:
+    """
+    Stocke un flux d'octets et prend une référence dessus. Renvoie la clé.
+
+    Le compteur est incrémenté dans la même transaction que le renommage :
+    un release() concurrent ne peut pas supprimer le fichier entre les deux.
+    """
+    key, size, tmp_path = _write_temp(chunks)
+    path = blob_path(key)
+    try:
+        with transaction.atomic():
+            AudioBlob.objects.select_for_update().get_or_create(key=key, defaults={"size": size})
+            AudioBlob.objects.filter(key=key).update(refcount=F("refcount") + 1)
+            if os.path.exists(path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return key
+
+
+def put_upload(uploaded_file) -> str:
+    """Stocke un UploadedFile Django sans le charger entièrement en mémoire."""
+    return put(uploaded_file.chunks())
+
+
+def release(key: str) -> None:
+    """Rend une référence ; le blob disparaît quand plus aucun rêve n'en a besoin."""
+    with transaction.atomic():
+        blob = AudioBlob.objects.select_for_update().filter(key=key).first()
+        if blob is None:
+            return
+        if blob.refcount > 1:
+            AudioBlob.objects.filter(key=key).update(refcount=F("refcount") - 1)
+            return
+        blob.delete()
+        try:
+            os.remove(blob_path(key))
+        except FileNotFoundError:
+            pass
+
+
+def collect_garbage() -> dict:
+    """
+    Supprime les blobs sans référence, les fichiers sans ligne AudioBlob et
+    les fichiers temporaires abandonnés (upload interrompu). Les fichiers
+    récents sont épargnés : leur put() n'est peut-être pas encore validé.
+    """
+    removed = {"rows": 0, "files": 0, "tmp": 0}
+    removed["rows"], _ = AudioBlob.objects.filter(refcount__lte=0).delete()
+
+    root = blob_root()
+    if not os.path.isdir(root):
+        return removed
+    known = set(AudioBlob.objects.values_list("key", flat=True))
+    now = time.time()
+    for dirpath, _, filenames in os.walk(root):
+        in_tmp = os.path.basename(dirpath) == TMP_DIR
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if now - os.path.getmtime(path) <= STALE_TMP_SECONDS:
+                continue
+            if in_tmp:
+                os.remove(path)
+                removed["tmp"] += 1
+            elif is_blob_key(name) and name not in known:
+                os.remove(path)
+                removed["files"] += 1
+    return removed
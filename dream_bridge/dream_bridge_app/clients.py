@@ -0,0 +1,126 @@
+"""
+Registre des clients fournisseurs (Groq, Mistral) et du client Redis
+applicatif, un exemplaire par processus.
+
+Chaque client garde son pool HTTP keep-alive : plus de poignée de main TLS
+ni de nouveau pool à chaque étape ou à chaque rêve. Les clients httpx sont
+thread-safe, le même objet sert donc à tous les threads du processus.
+Les workers Celery les créent (et ouvrent une connexion) dès
+worker_process_init, voir tasks.warm_up_provider_clients.
+
+Compteurs : stats.snapshot("clients.") → clients.hits / clients.misses.
+"""
+import logging
+import threading
+
+import httpx
+import redis
+from django.conf import settings
+
+from groq import AsyncGroq, Groq
+from mistralai import Mistral
+
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.PROVIDER_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.PROVIDER_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.PROVIDER_HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(settings.PROVIDER_HTTP_TIMEOUT, connect=settings.PROVIDER_HTTP_CONNECT_TIMEOUT)
+
+
+def _get_or_create(name: str, factory):
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = _clients[name] = factory()
+                stats.incr("clients.misses")
+                return client
+    stats.incr("clients.hits")
+    return client
+
+
+def get_groq_client() -> Groq:
+    return _get_or_create("groq", lambda: Groq(
+        api_key=settings.GROQ_API_KEY,
+        http_client=httpx.Client(limits=_limits(), timeout=_timeout()),
+    ))
+
+
+def get_async_groq_client() -> AsyncGroq:
+    return _get_or_create("groq_async", lambda: AsyncGroq(
+        api_key=settings.GROQ_API_KEY,
+        http_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+    ))
+
+
+def get_mistral_client() -> Mistral:
+    """Un seul client Mistral : méthodes synchrones et *_async partagent ses pools."""
+    return _get_or_create("mistral", lambda: Mistral(
+        api_key=settings.MISTRAL_API_KEY,
+        client=httpx.Client(limits=_limits(), timeout=_timeout()),
+        async_client=httpx.AsyncClient(limits=_limits(), timeout=_timeout()),
+    ))
+
+
+def get_redis_client() -> redis.Redis:
+    """Client Redis partagé (verrous single-flight, etc.) ; timeouts courts, Redis est optionnel."""
+    return _get_or_create("redis", lambda: redis.Redis.from_url(
+        settings.DREAM_REDIS_URL,
+        socket_connect_timeout=settings.DREAM_REDIS_TIMEOUT,
+        socket_timeout=settings.DREAM_REDIS_TIMEOUT,
+    ))
+
+
+def warm_up() -> None:
+    """
+    Crée les clients synchrones et, si PROVIDER_WARMUP_CONNECT, ouvre déjà
+    une connexion TLS vers chaque fournisseur (liste des modèles, sans coût).
+    Rien à faire hors backend "real" ; sans clés, Groq() lèverait une erreur
+    dans worker_process_init : les clients seront créés au premier appel.
+    """
+    if settings.DREAM_PROVIDER_BACKEND != "real":
+        return
+    if not (settings.GROQ_API_KEY and settings.MISTRAL_API_KEY):
+        logger.warning("Warm-up des clients ignoré : GROQ_API_KEY ou MISTRAL_API_KEY absente.")
+        return
+    groq_client = get_groq_client()
+    mistral_client = get_mistral_client()
+    if not settings.PROVIDER_WARMUP_CONNECT:
+        return
+    for provider, ping in (("groq", groq_client.models.list), ("mistral", mistral_client.models.list)):
+        try:
+            ping()
+        except Exception as e:
+            logger.warning("Warm-up %s impossible : %s", provider, e)
+
+
+def reset_clients() -> None:
+    """
+    Oublie les clients (après un fork ou dans les tests). Pas de close() :
+    après un fork, les sockets héritées appartiennent encore au parent.
+    """
+    with _lock:
+        _clients.clear()
+
+
+def client_pool_stats() -> dict:
+    return {
+        "clients": sorted(_clients),
+        "hits": stats.get("clients.hits"),
+        "misses": stats.get("clients.misses"),
+        "hit_rate": stats.hit_rate("clients"),
+    }
@@ -0,0 +1,144 @@
+"""
+File d'écriture unique (optionnelle) pour les save() du pipeline.
+
+Chaque étape enregistre ses colonnes par un petit save(update_fields=...)
+en autocommit : une transaction, un verrou d'écriture SQLite et un commit
+par étape et par rêve. Quand un processus mène beaucoup de rêves de front
+(mode async, workers à threads), ces écrivains se disputent le verrou.
+
+Avec DREAM_DB_WRITER_BATCH_SIZE > 1, save_fields() confie l'écriture à
+un thread unique du processus : les écritures en file au début du lot,
+plus celles reçues pendant DREAM_DB_WRITER_WINDOW_MS (0 par défaut),
+jusqu'à DREAM_DB_WRITER_BATCH_SIZE, sont appliquées dans une seule
+transaction, chacune dans son propre savepoint
+(une écriture en échec n'annule pas les autres). L'appelant attend le
+commit du lot : une étape qui suit relit bien ce qui vient d'être écrit.
+Les signaux post_save et les callbacks on_commit s'exécutent comme avant,
+dans le thread d'écriture.
+
+Sans réglage (taille 1), ou à l'intérieur d'une transaction de
+l'appelant, save_fields() revient à instance.save(update_fields=...).
+Compteurs : stats "db_writer.batches", "db_writer.writes".
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import stats
+
+
+class WriteBatcher:
+    """
+    File + thread de fond. `flush(batch)` applique un lot de
+    (écriture, Future) et règle chaque Future.
+    """
+
+    def __init__(self, flush, window: float, max_size: int, name: str = "db-writer"):
+        self.flush = flush
+        self.window = window
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, write) -> Future:
+        future = Future()
+        self._queue.put((write, future))
+        return future
+
+    def _collect(self) -> list:
+        """Attend une première écriture, puis en accumule jusqu'à la fin de la fenêtre ou du lot."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                # Fenêtre écoulée (ou nulle) : on prend encore ce qui attend déjà dans la file.
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            stats.incr("db_writer.batches")
+            stats.incr("db_writer.writes", len(batch))
+            try:
+                self.flush(batch)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+
+def _save_batch(batch: list) -> None:
+    """Un lot de (instance, update_fields) en une transaction, un savepoint par écriture."""
+    close_old_connections()
+    saved = []
+    try:
+        with transaction.atomic():
+            for (instance, update_fields), future in batch:
+                try:
+                    with transaction.atomic():
+                        instance.save(update_fields=update_fields)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    saved.append(future)
+    except Exception as e:
+        for future in saved:
+            future.set_exception(e)
+    else:
+        for future in saved:
+            future.set_result(None)
+
+
+_writer = None
+_writer_pid = None
+_lock = threading.Lock()
+
+
+def get_writer() -> WriteBatcher:
+    """Writer du processus (recréé après un fork : le thread du parent n'existe pas ici)."""
+    global _writer, _writer_pid
+    with _lock:
+        if _writer is None or _writer_pid != os.getpid():
+            _writer = WriteBatcher(
+                _save_batch, settings.DREAM_DB_WRITER_WINDOW_MS / 1000, settings.DREAM_DB_WRITER_BATCH_SIZE
+            )
+            _writer_pid = os.getpid()
+        return _writer
+
+
+def reset_writer() -> None:
+    """Oublie le writer (tests) ; son thread démon reste bloqué sur une file vide."""
+    global _writer
+    with _lock:
+        _writer = None
+
+
+def _batched() -> bool:
+    return settings.DREAM_DB_WRITER_BATCH_SIZE > 1 and not transaction.get_connection().in_atomic_block
+
+
+def save_fields(instance, update_fields: list) -> None:
+    """instance.save(update_fields=...), regroupé avec les écritures voisines si la file est active."""
+    if not _batched():
+        instance.save(update_fields=update_fields)
+        return
+    get_writer().submit((instance, update_fields)).result()
+
+
+async def asave_fields(instance, update_fields: list) -> None:
+    """Version asynchrone de save_fields (la boucle n'attend que le commit du lot)."""
+    if not settings.DREAM_DB_WRITER_BATCH_SIZE > 1:
+        await instance.asave(update_fields=update_fields)
+        return
+    await asyncio.wrap_future(get_writer().submit((instance, update_fields)))
@@ -0,0 +1,115 @@
+"""
+Micro-batching des appels LLM d'émotions.
+
+Quand plusieurs rêves du même processus arrivent en même temps à l'étape
+émotion (mode async, workers à threads), chacun envoyait sa propre
+requête Mistral avec le même long prompt système. Ici, les transcriptions
+en attente sont regroupées pendant une courte fenêtre
+(DREAM_EMOTION_BATCH_WINDOW_MS) ou jusqu'à DREAM_EMOTION_BATCH_SIZE
+textes, classées en une seule requête JSON structurée, puis chaque
+résultat est rendu à la tâche qui l'attend (concurrent.futures.Future).
+Désactivé par défaut (DREAM_EMOTION_BATCH_SIZE=1) : avec un seul appelant,
+la fenêtre ne ferait qu'ajouter de la latence.
+
+Si la réponse groupée est illisible ou incomplète, chaque texte du lot
+repart en requête individuelle, toutes en parallèle. Compteurs : stats "emotions.batches",
+"emotions.batched_items", "emotions.batch_fallbacks".
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+
+class EmotionBatcher:
+    """
+    File + thread de fond. `batch_scorer(texts) -> [scores]` traite un lot,
+    `single_scorer(text) -> scores` sert aux lots d'un seul texte et au repli.
+    """
+
+    def __init__(self, batch_scorer, single_scorer, window: float, max_size: int):
+        self.batch_scorer = batch_scorer
+        self.single_scorer = single_scorer
+        self.window = window
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._fallback = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="emotion-fallback")
+        self._thread = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, transcription: str) -> Future:
+        future = Future()
+        self._queue.put((transcription, future))
+        return future
+
+    def _collect(self) -> list:
+        """Attend un premier texte, puis en accumule jusqu'à la fin de la fenêtre ou du lot."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            self._flush(self._collect())
+
+    def _flush(self, batch: list) -> None:
+        texts = [text for text, _ in batch]
+        if len(batch) > 1:
+            stats.incr("emotions.batches")
+            stats.incr("emotions.batched_items", len(batch))
+            try:
+                results = self.batch_scorer(texts)
+            except Exception as e:
+                stats.incr("emotions.batch_fallbacks")
+                logger.warning("Lot d'émotions rejeté (%s), repli sur des requêtes individuelles.", e)
+            else:
+                for (_, future), scores in zip(batch, results):
+                    future.set_result(scores)
+                return
+            # Requêtes individuelles en parallèle : le lot ne paie que la plus lente.
+            for text, future in batch:
+                self._fallback.submit(self._score_one, text, future)
+            return
+        self._score_one(*batch[0])
+
+    def _score_one(self, text: str, future: Future) -> None:
+        try:
+            future.set_result(self.single_scorer(text))
+        except Exception as e:
+            future.set_exception(e)
+
+
+_batcher = None
+_batcher_pid = None
+_lock = threading.Lock()
+
+
+def get_batcher(batch_scorer, single_scorer, window: float, max_size: int) -> EmotionBatcher:
+    """Batcher du processus (recréé après un fork : le thread du parent n'existe pas ici)."""
+    global _batcher, _batcher_pid
+    with _lock:
+        if _batcher is None or _batcher_pid != os.getpid():
+            _batcher = EmotionBatcher(batch_scorer, single_scorer, window, max_size)
+            _batcher_pid = os.getpid()
+        return _batcher
+
+
+def reset_batcher() -> None:
+    """Oublie le batcher (tests) ; son thread démon reste bloqué sur une file vide."""
+    global _batcher
+    with _lock:
+        _batcher = None
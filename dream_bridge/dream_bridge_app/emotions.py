@@ -0,0 +1,240 @@
+"""
+Classification des émotions en deux étages.
+
+1. Score local : lexique français compilé une fois en matrice NumPy
+   (mots × émotions). Un texte devient un vecteur d'occurrences
+   (np.bincount), multiplié par la matrice : moins d'une milliseconde,
+   sans réseau. Les mots précédés d'une négation ("pas", "jamais"…) à
+   moins de NEGATION_WINDOW mots sont ignorés.
+2. LLM (backend fournisseur) seulement si la marge entre les deux
+   premières émotions locales est sous DREAM_EMOTION_MARGIN_THRESHOLD.
+   S'il échoue, on garde le score local sans le mettre en cache : un nouvel
+   essai rappelle le LLM. Si le lexique ne trouve rien, ProviderError est
+   levée et l'étape est relancée (DreamStageTask) au lieu d'enregistrer {}.
+
+Le résultat a la même forme qu'avant ({"joie": 0.7, ...}) et est mis en
+cache par hash du texte normalisé. Compteurs : stats "emotions." (hits /
+misses du cache, local / llm / llm_errors).
+"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from . import stats
+from .providers import ProviderError
+
+logger = logging.getLogger(__name__)
+
+EMOTION_LABELS = ["joie", "tristesse", "colère", "peur", "surprise", "dégoût"]
+
+# Poids 2 : mot qui nomme l'émotion ; 1 : mot qui l'évoque.
+LEXICON = {
+    "joie": {
+        "joie": 2, "heureux": 2, "heureuse": 2, "bonheur": 2, "content": 2, "contente": 2,
+        "rire": 1, "riais": 1, "sourire": 1, "souriais": 1, "joyeux": 2, "gai": 1, "fete": 1,
+        "danser": 1, "dansais": 1, "lumiere": 1, "soleil": 1, "amour": 1, "aimer": 1, "calme": 1,
+        "paisible": 1, "libre": 1, "liberte": 1, "voler": 1, "volais": 1, "serein": 1, "sereine": 1,
+        "plaisir": 1, "magnifique": 1, "merveilleux": 1, "emerveille": 1, "apaise": 1, "douceur": 1,
+    },
+    "tristesse": {
+        "triste": 2, "tristesse": 2, "pleurer": 2, "pleurais": 2, "larmes": 2, "chagrin": 2,
+        "seul": 1, "seule": 1, "solitude": 1, "perdu": 1, "perdue": 1, "perte": 1, "deuil": 2,
+        "mort": 1, "morte": 1, "disparu": 1, "disparue": 1, "abandonne": 1, "abandonnee": 1,
+        "vide": 1, "gris": 1, "pluie": 1, "regret": 1, "nostalgie": 1, "melancolie": 2,
+        "manque": 1, "adieu": 1, "enterrement": 1, "desespoir": 2,
+    },
+    "colère": {
+        "colere": 2, "enerve": 2, "enervee": 2, "furieux": 2, "furieuse": 2, "rage": 2,
+        "criais": 1, "crier": 1, "hurler": 1, "hurlais": 1, "frapper": 1, "frappais": 1,
+        "dispute": 1, "disputais": 1, "injuste": 1, "injustice": 1, "haine": 2, "deteste": 1,
+        "vengeance": 1, "agace": 1, "agacee": 1, "exaspere": 2, "violent": 1, "violence": 1,
+        "bagarre": 1, "insulte": 1, "trahi": 1, "trahie": 1,
+    },
+    "peur": {
+        "peur": 2, "effraye": 2, "effrayee": 2, "terrifie": 2, "terrifiee": 2, "terreur": 2,
+        "angoisse": 2, "angoissee": 2, "panique": 2, "cauchemar": 2, "poursuivi": 1,
+        "poursuivie": 1, "courir": 1, "fuir": 1, "fuyais": 1, "monstre": 1, "noir": 1,
+        "obscurite": 1, "tomber": 1, "tombais": 1, "chute": 1, "danger": 1, "menace": 1,
+        "cacher": 1, "cachais": 1, "crainte": 2, "inquiet": 1, "inquiete": 1, "sang": 1,
+        "noyer": 1, "noyais": 1, "piege": 1, "enferme": 1, "enfermee": 1,
+    },
+    "surprise": {
+        "surprise": 2, "surpris": 2, "etonne": 2, "etonnee": 2, "soudain": 1, "soudainement": 1,
+        "brusquement": 1, "inattendu": 2, "inattendue": 2, "bizarre": 1, "etrange": 1,
+        "incroyable": 1, "apparu": 1, "apparue": 1, "transforme": 1, "transformait": 1,
+        "stupefait": 2, "choc": 1, "imprevu": 1, "mysterieux": 1, "mysterieuse": 1,
+    },
+    "dégoût": {
+        "degout": 2, "degoutant": 2, "degoutante": 2, "degoute": 2, "degoutee": 2,
+        "ecoeure": 2, "ecoeuree": 2, "sale": 1, "salete": 1, "vomir": 2, "vomi": 2,
+        "pourri": 1, "pourrie": 1, "puanteur": 2, "odeur": 1, "insecte": 1, "insectes": 1,
+        "boue": 1, "repugnant": 2, "repugnante": 2, "moisi": 1, "nausee": 2,
+        "cafard": 1, "rats": 1,
+    },
+}
+
+NEGATIONS = {"pas", "jamais", "aucun", "aucune", "sans", "ni"}
+NEGATION_WINDOW = 3  # "pas de peur", "jamais eu de peur"
+# "plus" ne nie qu'après "ne"/"n'" ("je n'avais plus peur", pas "de plus en plus heureux").
+CONDITIONAL_NEGATIONS = {"plus"}
+NEGATION_PARTICLES = {"ne", "n"}
+
+_TOKEN_RE = re.compile(r"[a-z]+")
+_SUFFIXES = ("ements", "ement", "euses", "euse", "ees", "ee", "es", "e", "s", "x")
+
+
+def normalize_text(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces simples."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_TOKEN_RE.findall(text))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _stem(token: str) -> str:
+    """Racinisation minimale : retire un suffixe de genre/nombre ou d'adverbe."""
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[: -len(suffix)]
+    return token
+
+
+def _compile_lexicon():
+    """Index racine → ligne, et matrice des poids (racines × émotions)."""
+    index = {}
+    rows = []
+    for column, label in enumerate(EMOTION_LABELS):
+        for word, weight in LEXICON[label].items():
+            stem = _stem(normalize_text(word))
+            if stem not in index:
+                index[stem] = len(rows)
+                rows.append(np.zeros(len(EMOTION_LABELS)))
+            rows[index[stem]][column] = max(rows[index[stem]][column], weight)
+    return index, np.vstack(rows)
+
+
+_VOCAB, _WEIGHTS = _compile_lexicon()
+# Le noyau couvre le mot lui-même et ses NEGATION_WINDOW prédécesseurs ;
+# le mot lui-même est retiré ensuite (une négation ne se nie pas).
+_NEGATION_KERNEL = np.ones(NEGATION_WINDOW + 1, dtype=int)
+
+
+def score_locally(text: str) -> tuple:
+    """
+    Scores lexicaux (somme à 1, ou tous à 0 sans indice) et marge de
+    confiance (écart entre les deux premières émotions).
+    """
+    tokens = normalize_text(text).split()
+    if not tokens:
+        return {label: 0.0 for label in EMOTION_LABELS}, 0.0
+
+    ids = np.fromiter((_VOCAB.get(_stem(t), -1) for t in tokens), dtype=int, count=len(tokens))
+    negators = np.fromiter((t in NEGATIONS for t in tokens), dtype=int, count=len(tokens))
+    particles = np.fromiter((t in NEGATION_PARTICLES for t in tokens), dtype=int, count=len(tokens))
+    conditional = np.fromiter((t in CONDITIONAL_NEGATIONS for t in tokens), dtype=bool, count=len(tokens))
+    negators |= conditional & (np.convolve(particles, _NEGATION_KERNEL)[: len(tokens)] - particles > 0)
+    # Un mot est nié si une négation figure parmi les NEGATION_WINDOW mots qui le précèdent.
+    negated = np.convolve(negators, _NEGATION_KERNEL)[: len(tokens)] - negators > 0
+    kept = ids[(ids >= 0) & ~negated]
+
+    raw = np.bincount(kept, minlength=len(_VOCAB)) @ _WEIGHTS
+    total = raw.sum()
+    if not total:
+        return {label: 0.0 for label in EMOTION_LABELS}, 0.0
+    probs = raw / total
+    top_two = np.sort(probs)[-2:]
+    scores = {label: round(float(p), 3) for label, p in zip(EMOTION_LABELS, probs)}
+    return scores, float(top_two[1] - top_two[0])
+
+
+# ----------------------- Cache -----------------------
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_scores(key: str):
+    with _lock:
+        scores = _cache.get(key)
+        if scores is not None:
+            _cache.move_to_end(key)
+    stats.incr("emotions.hits" if scores is not None else "emotions.misses")
+    return dict(scores) if scores is not None else None
+
+
+def remember_scores(key: str, scores: dict) -> None:
+    with _lock:
+        _cache[key] = dict(scores)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.DREAM_EMOTION_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def reset_cache() -> None:
+    with _lock:
+        _cache.clear()
+
+
+# ----------------------- Classification -----------------------
+
+def _local_or_none(text: str) -> tuple:
+    """
+    (clé de cache, scores, scores locaux incertains) : `scores` vient du
+    cache ou d'un score local assez tranché ; sinon il vaut None et le
+    troisième élément sert de repli si le LLM échoue.
+    """
+    key = text_hash(text)
+    scores = cached_scores(key)
+    if scores is not None:
+        return key, scores, None
+    local, margin = score_locally(text)
+    if margin >= settings.DREAM_EMOTION_MARGIN_THRESHOLD:
+        stats.incr("emotions.local")
+        remember_scores(key, local)
+        return key, local, None
+    return key, None, local
+
+
+def _settle(key: str, llm_scores, local: dict, error) -> dict:
+    if error is not None or not llm_scores:
+        # Repli non mis en cache : le prochain essai redemande au LLM.
+        stats.incr("emotions.llm_errors")
+        if not any(local.values()):
+            # Rien à conserver : {} enregistré passerait pour une étape terminée.
+            raise ProviderError(f"Émotion indisponible : {error or 'réponse vide'}") from error
+        logger.warning("Émotion via LLM indisponible (%s), score lexical conservé.", error or "réponse vide")
+        return local
+    stats.incr("emotions.llm")
+    remember_scores(key, llm_scores)
+    return llm_scores
+
+
+def classify(text: str, llm_scorer) -> dict:
+    """Scores d'émotion : cache, puis lexique, puis `llm_scorer(text)` si incertain."""
+    key, scores, local = _local_or_none(text)
+    if scores is not None:
+        return scores
+    try:
+        return _settle(key, llm_scorer(text), local, None)
+    except Exception as e:
+        return _settle(key, None, local, e)
+
+
+async def aclassify(text: str, allm_scorer) -> dict:
+    """Version asynchrone de classify (le LLM est attendu, le reste est local)."""
+    key, scores, local = _local_or_none(text)
+    if scores is not None:
+        return scores
+    try:
+        return _settle(key, await allm_scorer(text), local, None)
+    except Exception as e:
+        return _settle(key, None, local, e)
@@ -0,0 +1,107 @@
+"""
+Galerie paginée par curseur (keyset).
+
+La galerie chargeait tous les rêves COMPLETED de la table, tous
+utilisateurs confondus, sans limite. Ici, seuls les rêves de
+l'utilisateur sont lus, par pages de DREAM_GALLERY_PAGE_SIZE, triés par
+(created_at, id) décroissants. Le curseur est le couple (created_at, id)
+du dernier rêve de la page : la page suivante reprend juste après lui
+(WHERE created_at < c OR (created_at = c AND id < i)) au lieu d'un OFFSET
+qui relit toutes les pages précédentes.
+
+Index utilisés (Dream.Meta) : (user, status, created_at) sans filtre
+d'émotion, (user, emotion, created_at) avec. Le filtre de date devient un
+intervalle sur created_at (journée locale) pour rester dans l'index.
+"""
+import base64
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Dream
+from .templatetags.dream_images import image_placeholder, image_srcset
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible ou falsifié."""
+
+
+def encode_cursor(dream: Dream) -> str:
+    raw = f"{dream.created_at.isoformat()}|{dream.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """(created_at, id) d'un curseur produit par encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, dream_id = base64.urlsafe_b64decode(padded).decode("utf-8").split("|")
+        created_at = parse_datetime(created_at)
+        dream_id = uuid.UUID(dream_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Curseur invalide : {cursor!r}") from e
+    if created_at is None:
+        raise InvalidCursor(f"Curseur invalide : {cursor!r}")
+    return created_at, dream_id
+
+
+def _day_bounds(day):
+    """Début et fin (exclue) de `day` dans le fuseau courant."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def gallery_queryset(user, emotion: str = None, day: str = None):
+    """Rêves affichables de `user`, du plus récent au plus ancien."""
+    dreams = Dream.objects.filter(
+        user=user, status=Dream.DreamStatus.COMPLETED, generated_image__isnull=False
+    ).exclude(generated_image="")
+
+    if emotion and emotion != "all":
+        dreams = dreams.filter(emotion=emotion)
+
+    try:
+        parsed_day = parse_date(day) if day else None
+    except ValueError:
+        parsed_day = None  # date impossible (ex. 2025-02-30) : filtre ignoré, comme un format invalide
+    if parsed_day:
+        start, end = _day_bounds(parsed_day)
+        dreams = dreams.filter(created_at__gte=start, created_at__lt=end)
+
+    return dreams.order_by("-created_at", "-id")
+
+
+def gallery_page(user, emotion: str = None, day: str = None, cursor: str = None, size: int = None) -> tuple:
+    """
+    Une page de la galerie : (rêves, curseur de la page suivante ou None).
+    Lève InvalidCursor si `cursor` est illisible.
+    """
+    size = size or settings.DREAM_GALLERY_PAGE_SIZE
+    dreams = gallery_queryset(user, emotion, day)
+    if cursor:
+        created_at, dream_id = decode_cursor(cursor)
+        dreams = dreams.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=dream_id))
+
+    # Un rêve de plus que la page : s'il existe, il y a une page suivante.
+    items = list(dreams[:size + 1])
+    next_cursor = encode_cursor(items[size - 1]) if len(items) > size else None
+    return items[:size], next_cursor
+
+
+def serialize_dream(dream: Dream) -> dict:
+    """Carte de galerie au format JSON (défilement infini)."""
+    return {
+        "id": str(dream.id),
+        "image_url": dream.generated_image.url if dream.generated_image else "",
+        "srcset": image_srcset(dream, "webp"),
+        "placeholder": image_placeholder(dream),
+        "created_at": timezone.localtime(dream.created_at).strftime("%d/%m/%Y"),
+        "emotion": dream.emotion or "",
+        "text": dream.personal_phrase or dream.phrase or "",
+        "url": reverse("dream_bridge_app:dream-status", kwargs={"dream_id": dream.id}),
+    }
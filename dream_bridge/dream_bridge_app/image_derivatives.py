@@ -0,0 +1,108 @@
+"""
+Dérivés des images générées : plusieurs largeurs en AVIF/WebP et un
+placeholder flou, pour que la galerie ne télécharge plus des PNG pleine
+résolution.
+
+Après l'étape image, le pipeline envoie generate_image_derivatives_task
+sur la file Celery par défaut. Pour que l'encodage, coûteux en CPU,
+n'occupe pas les workers du pipeline (qui attendent surtout le réseau),
+DREAM_IMAGE_QUEUE=images le route sur une file dédiée, à faire consommer
+par un worker prefork (un processus par cœur) :
+
+    celery -A dream_bridge worker -Q images -P prefork
+
+Sans ce worker, laisser le réglage vide : une file que personne ne
+consomme garderait les tâches indéfiniment.
+
+Les fichiers sont rangés à côté de l'original
+(dreams/images/dream_<id>.w640.webp). Le manifeste est enregistré dans
+Dream.image_derivatives :
+
+    {"placeholder": "data:image/webp;base64,...",
+     "sources": {"avif": [[320, "dreams/images/..."], ...], "webp": [...]}}
+
+Les balises de templatetags/dream_images.py s'en servent pour produire
+srcset et <picture>. Un format que Pillow ne sait pas encoder est ignoré.
+"""
+import base64
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageFilter, features
+
+from .models import Dream
+
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 30
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+
+def available_formats() -> list:
+    """Formats configurés que ce Pillow sait encoder, dans l'ordre de préférence."""
+    return [fmt for fmt in settings.DREAM_IMAGE_DERIVATIVE_FORMATS if features.check(fmt)]
+
+
+def derivative_name(original_name: str, width: int, fmt: str) -> str:
+    root, _ = os.path.splitext(original_name)
+    return f"{root}.w{width}.{fmt}"
+
+
+def _resized(image: Image.Image, width: int) -> Image.Image:
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def render_derivatives(data: bytes) -> tuple:
+    """
+    Encode les dérivés d'une image (fonction pure, sans base ni stockage).
+    Renvoie ({format: [(largeur, octets), ...]}, data URI du placeholder).
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = original.convert("RGBA" if original.mode in ("RGBA", "LA", "P") else "RGB")
+
+    # Pas d'agrandissement : on garde au moins une largeur, celle de l'original au besoin.
+    widths = sorted({min(w, image.width) for w in settings.DREAM_IMAGE_DERIVATIVE_WIDTHS})
+    quality = settings.DREAM_IMAGE_DERIVATIVE_QUALITY
+    encoded = {fmt: [] for fmt in available_formats()}
+    for width in widths:
+        resized = image if width == image.width else _resized(image, width)
+        for fmt in encoded:
+            encoded[fmt].append((width, _encode(resized, fmt, quality)))
+
+    tiny = _resized(image, min(PLACEHOLDER_WIDTH, image.width)).filter(ImageFilter.GaussianBlur(1))
+    placeholder = "data:image/webp;base64," + base64.b64encode(
+        _encode(tiny, "webp", PLACEHOLDER_QUALITY)
+    ).decode("ascii")
+    return encoded, placeholder
+
+
+def build_derivatives(dream_id: str) -> dict:
+    """Génère et enregistre les dérivés de l'image d'un rêve ; renvoie le manifeste."""
+    dream = Dream.objects.get(id=dream_id)
+    if not dream.generated_image:
+        return {}
+
+    storage = dream.generated_image.storage
+    with dream.generated_image.open("rb") as f:
+        encoded, placeholder = render_derivatives(f.read())
+
+    sources = {}
+    for fmt, variants in encoded.items():
+        sources[fmt] = []
+        for width, payload in variants:
+            name = derivative_name(dream.generated_image.name, width, fmt)
+            if storage.exists(name):
+                storage.delete(name)  # régénération : même nom, pas de suffixe aléatoire
+            sources[fmt].append([width, storage.save(name, ContentFile(payload))])
+
+    dream.image_derivatives = {"placeholder": placeholder, "sources": sources}
+    dream.save(update_fields=["image_derivatives", "updated_at"])
+    return dream.image_derivatives
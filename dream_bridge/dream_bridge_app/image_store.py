@@ -0,0 +1,134 @@
+"""
+Écriture en flux des images générées.
+
+L'image Mistral était lue en entier en mémoire (.read()), enveloppée dans
+un ContentFile puis enregistrée telle quelle en PNG. Ici :
+
+1. les morceaux téléchargés sont écrits au fil de l'eau dans un fichier
+   temporaire du dossier de destination, et hachés (SHA-256) en même temps ;
+2. l'image est ré-encodée au format DREAM_IMAGE_STORAGE_FORMAT : "png"
+   (recompression sans perte, optimize=True), "webp" ou "avif"
+   (qualité DREAM_IMAGE_STORAGE_QUALITY, WebP sans perte à 100) ;
+3. le fichier final, dream_<id>.<sha8>.<ext>, est mis en place par un
+   renommage atomique avant que le rêve ne pointe dessus : pas de fichier
+   à moitié écrit visible, et une URL qui change avec le contenu.
+
+Un contenu que Pillow ne sait pas lire est gardé tel quel. Si le stockage
+n'a pas de chemin local (stockage distant), le fichier temporaire est
+confié à storage.save().
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = "dreams/images"
+FORMAT_EXTENSIONS = {"png": "png", "webp": "webp", "avif": "avif"}
+
+
+def _local_dir(storage):
+    try:
+        directory = storage.path(IMAGE_DIR)
+    except NotImplementedError:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _reencode(path: str, fmt: str) -> bool:
+    """Ré-encode `path` sur place (via un second temporaire) ; False si ce n'est pas une image."""
+    quality = settings.DREAM_IMAGE_STORAGE_QUALITY
+    options = {"optimize": True} if fmt == "png" else {"quality": quality}
+    if fmt == "webp" and quality >= 100:
+        options = {"lossless": True}
+    converted = f"{path}.{fmt}"
+    try:
+        with Image.open(path) as image:
+            image.save(converted, format=fmt.upper(), **options)
+    except (UnidentifiedImageError, OSError) as e:
+        if os.path.exists(converted):
+            os.remove(converted)
+        logger.warning("Image générée non ré-encodée (%s), octets conservés tels quels.", e)
+        return False
+    os.replace(converted, path)
+    return True
+
+
+class ImageWriter:
+    """Fichier temporaire haché au fil de l'écriture, publié par commit()."""
+
+    def __init__(self, dream, storage=None):
+        self.dream = dream
+        self.storage = storage or dream.generated_image.storage
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        directory = _local_dir(self.storage)
+        fd, self.tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".part", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.sha256.update(chunk)
+        self.size += len(chunk)
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        """Ré-encode, renomme atomiquement et renvoie le nom de stockage de l'image."""
+        self._file.close()
+        fmt = settings.DREAM_IMAGE_STORAGE_FORMAT
+        ext = FORMAT_EXTENSIONS[fmt] if _reencode(self.tmp_path, fmt) else "png"
+        name = f"{IMAGE_DIR}/dream_{self.dream.id}.{self.sha256.hexdigest()[:8]}.{ext}"
+
+        stats.incr("images.stored")
+        stats.incr("images.downloaded_bytes", self.size)
+        stats.incr("images.stored_bytes", os.path.getsize(self.tmp_path))
+        if _local_dir(self.storage) is None:
+            try:
+                with open(self.tmp_path, "rb") as f:
+                    return self.storage.save(name, File(f))
+            finally:
+                os.remove(self.tmp_path)
+        os.replace(self.tmp_path, self.storage.path(name))
+        return name
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def store_image_stream(dream, chunks) -> str:
+    """Écrit les morceaux d'une image et rattache le fichier au rêve (sans save())."""
+    writer = ImageWriter(dream)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+        dream.generated_image.name = writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    return dream.generated_image.name
+
+
+async def astore_image_stream(dream, chunks) -> str:
+    """
+    Version asynchrone : les morceaux arrivent d'un itérateur async ; le
+    ré-encodage (CPU) et le renommage passent dans un thread.
+    """
+    writer = await asyncio.to_thread(ImageWriter, dream)
+    try:
+        async for chunk in chunks:
+            writer.write(chunk)
+        dream.generated_image.name = await asyncio.to_thread(writer.commit)
+    except BaseException:
+        writer.abort()
+        raise
+    return dream.generated_image.name
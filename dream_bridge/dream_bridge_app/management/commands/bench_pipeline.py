@@ -0,0 +1,100 @@
+"""
+Benchmark du pipeline : rêves/minute en mode synchrone (un slot prefork
+traite les rêves l'un après l'autre) contre le mode asynchrone (un seul
+processus, DREAM_ASYNC_CONCURRENCY rêves à la fois).
+
+Les fournisseurs passent par le backend simulé (providers.SimulatedBackend)
+réglé à `--latency` secondes par appel, et la phrase du jour par un bouchon
+équivalent : on mesure l'orchestration, pas les API. Tout se passe dans une
+base de test jetable et un MEDIA_ROOT temporaire.
+
+    python manage.py bench_pipeline --dreams 40 --latency 0.2 --concurrency 32
+"""
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from dream_bridge_app import async_pipeline, providers, services
+from dream_bridge_app.models import Dream
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Compare le débit (rêves/minute) du pipeline synchrone et asynchrone avec des fournisseurs factices."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dreams", type=int, default=40, help="Nombre de rêves par mode.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Latence simulée par appel fournisseur (s).")
+        parser.add_argument("--concurrency", type=int, default=None, help="Plafond de rêves simultanés (mode async).")
+        parser.add_argument("--mode", choices=["both", "sync", "async"], default="both")
+
+    def handle(self, *args, **options):
+        latency = options["latency"]
+        stages = {
+            stage: {"latency": latency, "sigma": 0.0, "error_rate": 0.0}
+            for stage in (
+                providers.STAGE_TRANSCRIPTION, providers.STAGE_EMOTION, providers.STAGE_IMAGE_PROMPT,
+                providers.STAGE_IMAGE, providers.STAGE_PERSONAL_MESSAGE,
+            )
+        }
+
+        def daily_message(*args, **kwargs):
+            time.sleep(latency)
+            return "Citation du jour."
+
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(
+                        MEDIA_ROOT=media_root,
+                        DREAM_PROVIDER_BACKEND="simulated",
+                        DREAM_SIMULATION_STAGES=stages,
+                        DREAM_SIMULATION_LATENCY_SCALE=1.0,
+                    ), \
+                    patch.object(services, "get_daily_message", daily_message):
+                providers.reset_providers()
+                user = User.objects.create_user(username="bench", password="bench")
+
+                if options["mode"] in ("both", "sync"):
+                    dream_ids = self._create_dreams(user, options["dreams"], media_root)
+                    started = time.perf_counter()
+                    for dream_id in dream_ids:
+                        services.orchestrate_dream_generation(dream_id)
+                    self._report("sync", dream_ids, time.perf_counter() - started)
+
+                if options["mode"] in ("both", "async"):
+                    dream_ids = self._create_dreams(user, options["dreams"], media_root)
+                    started = time.perf_counter()
+                    asyncio.run(async_pipeline.run_dreams_concurrently(dream_ids, options["concurrency"]))
+                    self._report("async", dream_ids, time.perf_counter() - started)
+        finally:
+            providers.reset_providers()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _create_dreams(self, user, count: int, media_root: str) -> list:
+        dream_ids = []
+        for _ in range(count):
+            dream = Dream.objects.create(user=user)
+            audio_path = os.path.join(media_root, f"{dream.id}.webm")
+            with open(audio_path, "wb") as f:
+                f.write(b"bench-audio")
+            dream.audio_ref = audio_path
+            dream.save(update_fields=["audio_ref"])
+            dream_ids.append(str(dream.id))
+        return dream_ids
+
+    def _report(self, mode: str, dream_ids: list, elapsed: float) -> None:
+        completed = Dream.objects.filter(id__in=dream_ids, status=Dream.DreamStatus.COMPLETED).count()
+        rate = completed / elapsed * 60 if elapsed else 0.0
+        self.stdout.write(
+            f"{mode:>5} : {completed}/{len(dream_ids)} rêves en {elapsed:.2f} s → {rate:.1f} rêves/minute"
+        )
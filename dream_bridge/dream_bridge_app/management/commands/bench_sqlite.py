@@ -0,0 +1,177 @@
+"""
+Benchmark SQLite : débit en lecture / écriture concurrentes, avant et après
+le profil de production (sqlite_tuning.py) et la file d'écriture unique
+(db_writer.py).
+
+Une base jetable reproduit la charge du pipeline : `--writers` threads
+d'un même processus (worker à threads ou async) font de petites mises à
+jour d'une ligne (comme save(update_fields=...)), et
+`--readers` processus lisent le statut d'un rêve (comme la page d'attente),
+pendant `--seconds` secondes. Trois configurations :
+
+- default    : réglages SQLite d'origine, transactions différées ;
+- production : PRAGMA du profil, transactions IMMEDIATE ;
+- writer     : production + toutes les écritures via un WriteBatcher.
+
+    python manage.py bench_sqlite --writers 8 --readers 8 --seconds 5
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from dream_bridge_app.db_writer import WriteBatcher
+from dream_bridge_app.sqlite_tuning import PRODUCTION_PRAGMAS, apply_pragmas
+
+MODES = ("default", "production", "writer")
+
+
+def _connect(path: str, pragmas: dict) -> sqlite3.Connection:
+    # isolation_level=None : BEGIN / COMMIT explicites, comme les atomic() de Django.
+    # timeout=5 : valeur par défaut du backend Django.
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def _read_loop(path: str, pragmas: dict, rows: int, seconds: float, reads, locked) -> None:
+    """Lit le statut de rêves au hasard pendant `seconds` secondes (comme la page d'attente)."""
+    connection = _connect(path, pragmas)
+    deadline = time.monotonic() + seconds
+    done = refused = 0
+    while time.monotonic() < deadline:
+        try:
+            connection.execute("SELECT status, updated_at FROM dream WHERE id = ?",
+                               (random.randint(1, rows),)).fetchone()
+        except sqlite3.OperationalError:
+            refused += 1
+            continue
+        done += 1
+    connection.close()
+    with reads.get_lock():
+        reads.value += done
+    with locked.get_lock():
+        locked.value += refused
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit SQLite en lectures/écritures concurrentes selon le profil."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Rêves dans la base de test.")
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--batch-size", type=int, default=32, help="Lot max de la file d'écriture.")
+        parser.add_argument("--window-ms", type=int, default=0, help="Fenêtre de la file d'écriture.")
+        parser.add_argument("--mode", choices=("all",) + MODES, default="all")
+
+    def handle(self, *args, **options):
+        modes = MODES if options["mode"] == "all" else (options["mode"],)
+        for mode in modes:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.sqlite3")
+                self._seed(path, options["rows"])
+                self._report(mode, self._run(path, mode, options))
+
+    def _seed(self, path: str, rows: int) -> None:
+        connection = sqlite3.connect(path, isolation_level=None)
+        connection.executescript("""
+            CREATE TABLE dream (id INTEGER PRIMARY KEY, user_id INTEGER, status TEXT,
+                                transcription TEXT, updated_at REAL);
+            CREATE INDEX dream_user ON dream (user_id, status);
+        """)
+        connection.execute("BEGIN")
+        connection.executemany(
+            "INSERT INTO dream (id, user_id, status, transcription, updated_at) VALUES (?, ?, 'PENDING', '', ?)",
+            [(i, i % 100, time.time()) for i in range(1, rows + 1)],
+        )
+        connection.execute("COMMIT")
+        connection.close()
+
+    def _run(self, path: str, mode: str, options: dict) -> dict:
+        pragmas = {} if mode == "default" else PRODUCTION_PRAGMAS
+        begin = "BEGIN" if mode == "default" else "BEGIN IMMEDIATE"
+        rows, deadline = options["rows"], time.monotonic() + options["seconds"]
+        results = {"writes": 0, "reads": 0, "locked": 0, "write_latencies": []}
+        lock = threading.Lock()
+
+        def update(connection, dream_id):
+            connection.execute(
+                "UPDATE dream SET status = ?, transcription = ?, updated_at = ? WHERE id = ?",
+                (random.choice(("PROCESSING", "COMPLETED")), "x" * 200, time.time(), dream_id),
+            )
+
+        batcher = None
+        if mode == "writer":
+            writer_connection = _connect(path, pragmas)
+
+            def flush(batch):
+                writer_connection.execute(begin)
+                try:
+                    for dream_id, _ in batch:
+                        update(writer_connection, dream_id)
+                    writer_connection.execute("COMMIT")
+                except Exception:
+                    writer_connection.execute("ROLLBACK")
+                    raise
+                for _, future in batch:
+                    future.set_result(None)
+
+            batcher = WriteBatcher(flush, options["window_ms"] / 1000, options["batch_size"], name="bench-writer")
+
+        def writer():
+            connection = _connect(path, pragmas)
+            latencies, writes, locked = [], 0, 0
+            while time.monotonic() < deadline:
+                dream_id = random.randint(1, rows)
+                started = time.perf_counter()
+                try:
+                    if batcher is not None:
+                        batcher.submit(dream_id).result()
+                    else:
+                        connection.execute(begin)
+                        update(connection, dream_id)
+                        connection.execute("COMMIT")
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    continue
+                latencies.append(time.perf_counter() - started)
+                writes += 1
+            connection.close()
+            with lock:
+                results["writes"] += writes
+                results["locked"] += locked
+                results["write_latencies"] += latencies
+
+        started = time.perf_counter()
+        # Lecteurs dans d'autres processus (pages web) : ils ne prennent pas le GIL des écrivains.
+        counters = [multiprocessing.Value("q", 0) for _ in range(2)]
+        readers = [multiprocessing.Process(target=_read_loop, args=(path, pragmas, rows, options["seconds"], *counters))
+                   for _ in range(options["readers"])]
+        writers = [threading.Thread(target=writer) for _ in range(options["writers"])]
+        for worker in readers + writers:
+            worker.start()
+        for worker in readers + writers:
+            worker.join()
+        results["reads"] += counters[0].value
+        results["locked"] += counters[1].value
+        results["elapsed"] = time.perf_counter() - started
+        return results
+
+    def _report(self, mode: str, results: dict) -> None:
+        elapsed = results["elapsed"]
+        latencies = results["write_latencies"]
+        p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) >= 2 else 0.0
+        self.stdout.write(
+            f"{mode:>10} : {results['writes'] / elapsed:8.0f} écritures/s  {results['reads'] / elapsed:9.0f} lectures/s"
+            f"  p95 écriture {p95:6.1f} ms  verrous refusés {results['locked']}"
+        )
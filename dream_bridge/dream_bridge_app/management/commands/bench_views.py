@@ -0,0 +1,100 @@
+"""
+Benchmark de régression des vues et métriques (voir view_benchmarks.py).
+
+Crée une base de test jetable, y sème `--users` utilisateurs de `--dreams`
+rêves chacun, puis mesure chaque vue et fonction de métriques : p50 / p95
+et nombre de requêtes SQL, comparé aux budgets. Les résultats sont
+confrontés à la référence JSON (`--baseline`) enregistrée pour le même
+volume ; `--update-baseline` (ou une référence absente) l'écrit.
+
+    python manage.py bench_views --dreams 100000 --repeat 20
+    python manage.py bench_views --dreams 100000 --update-baseline
+
+Échec (code de sortie non nul) si un budget de requêtes est dépassé ou si
+un cas régresse face à la référence (`--tolerance` sur le p95).
+"""
+import json
+import os
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from dream_bridge_app import view_benchmarks
+
+LOCAL_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "reports": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "reports"},
+}
+
+
+class Command(BaseCommand):
+    help = "Mesure latences (p50/p95) et requêtes SQL des vues sur un gros historique, face à une référence JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1)
+        parser.add_argument("--dreams", type=int, default=10000, help="Rêves par utilisateur (10k à 1M).")
+        parser.add_argument("--days", type=int, default=730, help="Étendue de l'historique semé.")
+        parser.add_argument("--repeat", type=int, default=20, help="Appels mesurés par cas.")
+        parser.add_argument("--baseline", default=str(settings.BASE_DIR / "bench" / "views_baseline.json"))
+        parser.add_argument("--update-baseline", action="store_true")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Hausse de p95 tolérée (0.25 = +25 %%).")
+
+    def handle(self, *args, **options):
+        meta = {"users": options["users"], "dreams_per_user": options["dreams"], "days": options["days"]}
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            # Pas de broker ni de Redis pendant la mesure : aucune tâche ne doit partir,
+            # et les rapports vont dans un cache local à la place du cache Redis partagé.
+            with patch("dream_bridge_app.tasks.refresh_personal_message_task.delay"), \
+                    override_settings(CACHES=LOCAL_CACHES):
+                cache.clear()
+                users = view_benchmarks.seed(
+                    options["users"], options["dreams"], options["days"],
+                    progress=lambda line: self.stdout.write(f"  {line}", ending="\r"),
+                )
+                self.stdout.write("")
+                results = {}
+                for name, prepare, call in view_benchmarks.cases(users[0]):
+                    results[name] = view_benchmarks.measure(prepare, call, options["repeat"])
+                    result = results[name]
+                    self.stdout.write(
+                        f"{name:<32} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms"
+                        f"  requêtes {result['queries']}"
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        failures = view_benchmarks.over_budget(results)
+        failures += self._compare(options, meta, results)
+        if failures:
+            raise CommandError("Régressions :\n  " + "\n  ".join(failures))
+
+    def _compare(self, options: dict, meta: dict, results: dict) -> list:
+        path = options["baseline"]
+        baseline = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        regressions = []
+        if baseline and baseline.get("meta") == meta:
+            self.stdout.write(f"\nComparaison avec {path} :")
+            lines, regressions = view_benchmarks.compare(results, baseline["results"], options["tolerance"])
+            for line in lines:
+                self.stdout.write(line)
+        elif baseline:
+            self.stdout.write(f"\nRéférence {path} mesurée sur un autre volume ({baseline.get('meta')}) : pas de comparaison.")
+
+        if options["update_baseline"] or baseline is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"meta": meta, "results": results}, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Référence écrite : {path}")
+        return regressions
@@ -0,0 +1,20 @@
+"""
+Nettoyage du blob store : blobs sans référence, fichiers orphelins et
+uploads interrompus (voir blobstore.collect_garbage).
+
+    python manage.py gc_blobs
+"""
+from django.core.management.base import BaseCommand
+
+from dream_bridge_app import blobstore
+
+
+class Command(BaseCommand):
+    help = "Supprime les audios du blob store dont plus aucun rêve n'a besoin."
+
+    def handle(self, *args, **options):
+        removed = blobstore.collect_garbage()
+        self.stdout.write(
+            f"{removed['rows']} blob(s) sans référence, {removed['files']} fichier(s) orphelin(s), "
+            f"{removed['tmp']} upload(s) interrompu(s) supprimés."
+        )
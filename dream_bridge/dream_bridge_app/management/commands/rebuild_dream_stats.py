@@ -0,0 +1,27 @@
+"""
+Reconstruit l'agrégat quotidien des rêves (DreamDailyStat, voir rollups.py),
+par exemple après un import ou des écritures en masse.
+
+    python manage.py rebuild_dream_stats [--user <id>]
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from dream_bridge_app import rollups
+
+
+class Command(BaseCommand):
+    help = "Recalcule la table DreamDailyStat à partir des rêves."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Limiter la reconstruction à cet utilisateur (id).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"] is not None:
+            try:
+                user = get_user_model().objects.get(pk=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Utilisateur {options['user']} introuvable.")
+        rows = rollups.rebuild(user)
+        self.stdout.write(f"{rows} ligne(s) DreamDailyStat reconstruite(s).")
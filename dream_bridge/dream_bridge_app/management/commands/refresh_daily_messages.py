@@ -0,0 +1,18 @@
+"""
+Remplit tout de suite le cache des messages du jour (12 horoscopes +
+citation), par exemple au premier déploiement, sans attendre la tâche beat.
+
+    python manage.py refresh_daily_messages
+"""
+from django.core.management.base import BaseCommand
+
+from dream_bridge_app.services import refresh_daily_messages
+
+
+class Command(BaseCommand):
+    help = "Récupère, traduit et met en cache les horoscopes et la citation du jour."
+
+    def handle(self, *args, **options):
+        report = refresh_daily_messages()
+        for key, status in sorted(report.items()):
+            self.stdout.write(f"{key:>12} : {status}")
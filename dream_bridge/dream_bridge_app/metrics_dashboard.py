@@ -1,8 +1,11 @@
+from datetime import datetime, time, timedelta
+
 from django.utils import timezone
-from datetime import timedelta
-from collections import Counter
-from .models import Dream
-from collections import defaultdict, Counter # à regarder de plus près
+
+from .models import Dream, DreamDailyStat
+
+# Nombre de jours couverts par chaque période ('all' → du premier au dernier rêve)
+PERIOD_DAYS = {"3d": 3, "7d": 7, "1m": 30, "30d": 30}
 
 
 # --- Liste des émotions disponibles pour un utilisateur ---
@@ -15,19 +18,29 @@ def emotions_disponible(user):
 
 # --- Récupérer les rêves d’un utilisateur sur une période, avec filtre émotion ---
 def get_dreams_in_period(user, period="all", emotion=None):
-    today = timezone.localdate()
     qs = Dream.objects.filter(user=user).order_by("created_at")
 
-    if period == "3d":
-        start_date = today - timedelta(days=2)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    elif period == "7d":
-        start_date = today - timedelta(days=6)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    elif period in ("1m", "30d"):
-        start_date = today - timedelta(days=29)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    # 'all' ou autres → pas de filtre par date, déjà pris en compte
+    days = PERIOD_DAYS.get(period)
+    if days:
+        # Intervalle sur created_at (et non created_at__date) : l'index (user, …, created_at) reste utilisable.
+        start = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=days - 1), time.min))
+        qs = qs.filter(created_at__gte=start, created_at__lt=start + timedelta(days=days))
+    # 'all' ou autres → pas de filtre par date
+
+    if emotion and emotion != "all":
+        qs = qs.filter(emotion=emotion)
+
+    return qs
+
+
+# --- Agrégat quotidien d’un utilisateur sur une période, avec filtre émotion ---
+def get_daily_stats_in_period(user, period="all", emotion=None):
+    qs = DreamDailyStat.objects.filter(user=user)
+
+    days = PERIOD_DAYS.get(period)
+    if days:
+        today = timezone.localdate()
+        qs = qs.filter(day__gte=today - timedelta(days=days - 1), day__lte=today)
 
     if emotion and emotion != "all":
         qs = qs.filter(emotion=emotion)
@@ -35,50 +48,71 @@ def get_dreams_in_period(user, period="all", emotion=None):
     return qs
 
 
+# --- Toutes les métriques du rapport en une requête ---
+def report_metrics(user, period="all", emotion=None):
+    """
+    Total, fréquence, répartition des émotions et longueur moyenne des
+    récits, calculés en une requête sur l'agrégat DreamDailyStat (une
+    ligne par jour et par émotion, voir rollups.py) : le coût suit le
+    nombre de jours, pas le nombre de rêves.
+    """
+    rows = list(
+        get_daily_stats_in_period(user, period, emotion=emotion)
+        .filter(dreams__gt=0)
+        .values("day", "emotion", "dreams", "transcription_length")
+        .order_by("day")
+    )
+    if not rows:
+        return {"total_dreams": 0, "dream_frequency": 0.0, "emotion_distribution": {}, "transcription_trend": []}
+
+    total = sum(row["dreams"] for row in rows)
+
+    # Fréquence des jours avec rêve
+    days = [row["day"] for row in rows]
+    total_days = PERIOD_DAYS.get(period) or max(1, (days[-1] - days[0]).days + 1)
+    frequency = round(min(len(set(days)) / total_days * 100, 100.0), 2)
+
+    # Répartition des émotions (rêves sans émotion exclus)
+    counts = {}
+    for row in rows:
+        if row["emotion"]:
+            counts[row["emotion"]] = counts.get(row["emotion"], 0) + row["dreams"]
+    labelled = sum(counts.values())
+    distribution = {k: round(v / labelled, 3) for k, v in counts.items()} if labelled else {}
+
+    # Longueur moyenne des récits par jour
+    length_sums, day_counts = {}, {}
+    for row in rows:
+        length_sums[row["day"]] = length_sums.get(row["day"], 0) + row["transcription_length"]
+        day_counts[row["day"]] = day_counts.get(row["day"], 0) + row["dreams"]
+    trend = [
+        {"date": str(day), "avg_length": round(length_sums[day] / day_counts[day], 2)}
+        for day in sorted(day_counts)
+    ]
+
+    return {
+        "total_dreams": total,
+        "dream_frequency": frequency,
+        "emotion_distribution": distribution,
+        "transcription_trend": trend,
+    }
+
+
 # --- Total de rêves ---
 def total_dreams(user, period="all", emotion=None):
-    return get_dreams_in_period(user, period, emotion=emotion).count()
+    return report_metrics(user, period, emotion)["total_dreams"]
 
 
 # --- Fréquence des jours avec rêve ---
 def dream_frequency(user, period="all", emotion=None):
-    qs = get_dreams_in_period(user, period, emotion=emotion)
-    if not qs.exists():
-        return 0.0
-
-    dream_days = set(qs.values_list("created_at__date", flat=True))
-
-    today = timezone.localdate()
-    if period == "3d":
-        total_days = 3
-    elif period == "7d":
-        total_days = 7
-    elif period in ("1m", "30d"):
-        total_days = 30
-    else:
-        earliest = qs.earliest('created_at').created_at.date()
-        latest = qs.latest('created_at').created_at.date()
-        total_days = max(1, (latest - earliest).days + 1)
-
-    frequency = len(dream_days) / total_days * 100
-    return round(min(frequency, 100.0), 2)
+    return report_metrics(user, period, emotion)["dream_frequency"]
 
 
 # --- Répartition des émotions ---
 def emotion_distribution(user, period="all", emotion=None):
-    qs = get_dreams_in_period(user, period, emotion=emotion)
-    if not qs.exists():
-        return {}
+    return report_metrics(user, period, emotion)["emotion_distribution"]
 
-    counts = Counter(d.emotion for d in qs if d.emotion)
-    total = sum(counts.values())
-    if total == 0:
-        return {}
 
-    return {k: round(v / total, 3) for k, v in counts.items()}
-
-
-# --- Longueur moyenne des transcriptions ---
 # --- Longueur moyenne des récits ---
 def get_transcription_trend(user, period="all", emotion=None):
     """
@@ -86,40 +120,4 @@ def get_transcription_trend(user, period="all", emotion=None):
     en tenant compte de la période et éventuellement d'une émotion filtrée.
     Renvoie une liste de dicts : [{'date': 'YYYY-MM-DD', 'avg_length': 42.5}, ...]
     """
-    today = timezone.localdate()
-    qs = Dream.objects.filter(user=user, transcription__isnull=False).order_by("created_at")
-
-    # Filtre sur la période
-    if period == "3d":
-        start_date = today - timedelta(days=2)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    elif period == "7d":
-        start_date = today - timedelta(days=6)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    elif period in ("1m", "30d"):
-        start_date = today - timedelta(days=29)
-        qs = qs.filter(created_at__date__gte=start_date, created_at__date__lte=today)
-    # 'all' → pas de filtre
-
-    # Filtre par émotion si demandé
-    if emotion and emotion != "all":
-        qs = qs.filter(emotion=emotion)
-
-    if not qs.exists():
-        return []
-
-    # Regrouper par jour
-    lengths_by_day = defaultdict(list)
-    for dream in qs:
-        day = dream.created_at.date()
-        lengths_by_day[day].append(len(dream.transcription))
-
-    # Calculer la moyenne journalière
-    trend = []
-    for day in sorted(lengths_by_day):
-        avg_length = sum(lengths_by_day[day]) / len(lengths_by_day[day])
-        trend.append({"date": str(day), "avg_length": round(avg_length, 2)})
-
-    return trend
-
-
+    return report_metrics(user, period, emotion)["transcription_trend"]
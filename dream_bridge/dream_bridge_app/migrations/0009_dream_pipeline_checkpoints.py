@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0008_dream_personal_phrase_dream_personal_phrase_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dream',
+            name='audio_ref',
+            field=models.CharField(blank=True, default='', help_text='Reference to the source audio, kept until transcription succeeds.', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='dream',
+            name='emotion_scores',
+            field=models.JSONField(blank=True, help_text='Raw emotion scores; null until the emotion stage has run.', null=True),
+        ),
+        migrations.AddField(
+            model_name='dream',
+            name='failed_stage',
+            field=models.CharField(blank=True, default='', help_text='Pipeline stage that failed last, if any.', max_length=20),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0009_dream_pipeline_checkpoints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProviderAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(max_length=20)),
+                ('config_hash', models.CharField(max_length=64, unique=True)),
+                ('agent_id', models.CharField(max_length=100)),
+                ('config', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_validated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
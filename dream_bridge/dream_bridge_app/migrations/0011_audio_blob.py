@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0010_provider_agent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioBlob',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0011_audio_blob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_sha256', models.CharField(max_length=64)),
+                ('provider', models.CharField(max_length=20)),
+                ('model', models.CharField(max_length=50)),
+                ('text', models.TextField()),
+                ('language', models.CharField(blank=True, default='', max_length=10)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('audio_sha256', 'provider', 'model'), name='unique_transcription_per_audio')],
+            },
+        ),
+    ]
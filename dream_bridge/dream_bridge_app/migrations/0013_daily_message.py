@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0012_transcription_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('text', models.TextField()),
+                ('fetched_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('key', 'day'), name='unique_daily_message_per_day')],
+            },
+        ),
+    ]
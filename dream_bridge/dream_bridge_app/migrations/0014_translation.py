@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0013_daily_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Translation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=10)),
+                ('target', models.CharField(max_length=10)),
+                ('text_hash', models.CharField(max_length=64)),
+                ('source_text', models.TextField()),
+                ('translated', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('source', 'target', 'text_hash'), name='unique_translation')],
+            },
+        ),
+    ]
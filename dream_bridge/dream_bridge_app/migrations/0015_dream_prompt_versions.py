@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0014_translation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dream',
+            name='emotion_prompt_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='dream',
+            name='image_prompt_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='dream',
+            name='personal_phrase_prompt_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0015_dream_prompt_versions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dream',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='dream_user_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='dream',
+            index=models.Index(fields=['user', 'emotion', 'created_at'], name='dream_user_emotion_created'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0016_dream_gallery_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dream',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, help_text='Resized AVIF/WebP variants and blur placeholder (see image_derivatives.py).', null=True),
+        ),
+    ]
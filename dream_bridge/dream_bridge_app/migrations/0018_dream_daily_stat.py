@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_daily_stats(apps, schema_editor):
+    """Agrégat initial à partir des rêves existants (même calcul que rollups.rebuild)."""
+    from django.db.models import Count, Q, Sum
+    from django.db.models.functions import Length, TruncDate
+
+    Dream = apps.get_model('dream_bridge_app', 'Dream')
+    DreamDailyStat = apps.get_model('dream_bridge_app', 'DreamDailyStat')
+    rows = (Dream.objects.order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values('user_id', 'day', 'emotion')
+            .annotate(dreams=Count('id'), total_length=Sum(Length('transcription')),
+                      completed_count=Count('id', filter=Q(status='COMPLETED')),
+                      failed_count=Count('id', filter=Q(status='FAILED'))))
+    DreamDailyStat.objects.bulk_create([
+        DreamDailyStat(user_id=row['user_id'], day=row['day'], emotion=row['emotion'] or '',
+                       dreams=row['dreams'], transcription_length=row['total_length'] or 0,
+                       completed=row['completed_count'], failed=row['failed_count'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dream_bridge_app', '0017_dream_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DreamDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('emotion', models.CharField(blank=True, default='', max_length=20)),
+                ('dreams', models.PositiveIntegerField(default=0)),
+                ('transcription_length', models.PositiveBigIntegerField(default=0)),
+                ('completed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dream_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'emotion'), name='unique_dream_daily_stat')],
+            },
+        ),
+        migrations.RunPython(fill_daily_stats, migrations.RunPython.noop),
+    ]
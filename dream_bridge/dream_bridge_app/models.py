@@ -343,9 +343,32 @@ class Dream(models.Model):
         upload_to='dreams/images/', null=True, blank=True,
         help_text=_("The final image generated from the dream.")
     )
+    image_derivatives = models.JSONField(
+        null=True, blank=True,
+        help_text=_("Resized AVIF/WebP variants and blur placeholder (see image_derivatives.py).")
+    )
 
     error_message = models.TextField(blank=True)
 
+    # --- Points de reprise du pipeline ---
+    audio_ref = models.CharField(
+        max_length=255, blank=True, default="",
+        help_text=_("Reference to the source audio, kept until transcription succeeds.")
+    )
+    emotion_scores = models.JSONField(
+        null=True, blank=True,
+        help_text=_("Raw emotion scores; null until the emotion stage has run.")
+    )
+    failed_stage = models.CharField(
+        max_length=20, blank=True, default="",
+        help_text=_("Pipeline stage that failed last, if any.")
+    )
+
+    # --- Versions des prompts utilisés (voir prompt_registry) ---
+    emotion_prompt_version = models.CharField(max_length=40, blank=True, default="")
+    image_prompt_version = models.CharField(max_length=40, blank=True, default="")
+    personal_phrase_prompt_version = models.CharField(max_length=40, blank=True, default="")
+
     # --- Timestamps ---
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -370,5 +393,136 @@ class Dream(models.Model):
         blank=True
     )
 
+    class Meta:
+        # Galerie par curseur (voir gallery.py) : chaque page est un parcours d'index.
+        indexes = [
+            models.Index(fields=["user", "status", "created_at"], name="dream_user_status_created"),
+            models.Index(fields=["user", "emotion", "created_at"], name="dream_user_emotion_created"),
+        ]
+
     def __str__(self) -> str:
         return f"Dream {self.id} ({self.status})"
+
+
+class ProviderAgent(models.Model):
+    """
+    Agent créé chez un fournisseur (ex. agent d'images Mistral), réutilisé
+    tant que sa configuration (modèle, instructions, outils) ne change pas.
+    """
+    provider = models.CharField(max_length=20)
+    config_hash = models.CharField(max_length=64, unique=True)
+    agent_id = models.CharField(max_length=100)
+    config = models.JSONField(default=dict)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_validated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.provider} agent {self.agent_id}"
+
+
+class AudioBlob(models.Model):
+    """
+    Audio source stocké une seule fois dans le blob store partagé, adressé
+    par son SHA-256. `refcount` compte les rêves qui en ont encore besoin ;
+    à zéro, le fichier est supprimé (voir blobstore.release).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Blob {self.key[:12]}… ({self.refcount} réf.)"
+
+
+class TranscriptionCache(models.Model):
+    """
+    Transcription déjà payée pour un contenu audio (SHA-256 du blob), par
+    backend et modèle : un ré-upload du même enregistrement la réutilise.
+    """
+    audio_sha256 = models.CharField(max_length=64)
+    provider = models.CharField(max_length=20)
+    model = models.CharField(max_length=50)
+    text = models.TextField()
+    language = models.CharField(max_length=10, blank=True, default="")
+
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["audio_sha256", "provider", "model"], name="unique_transcription_per_audio"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"Transcription {self.audio_sha256[:12]}… ({self.provider}/{self.model})"
+
+
+class DailyMessage(models.Model):
+    """
+    Horoscope d'un signe (clé = signe anglais, ex. "aries") ou citation du
+    jour (clé "quote"), déjà traduit. Rempli chaque nuit par
+    tasks.refresh_daily_messages_task ; les vues ne lisent que cette table.
+    """
+    QUOTE_KEY = "quote"
+
+    key = models.CharField(max_length=20)
+    day = models.DateField()
+    text = models.TextField()
+    fetched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["key", "day"], name="unique_daily_message_per_day"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.key} — {self.day}"
+
+
+class Translation(models.Model):
+    """Traduction déjà obtenue, clé (langue source, langue cible, SHA-256 du texte)."""
+    source = models.CharField(max_length=10)
+    target = models.CharField(max_length=10)
+    text_hash = models.CharField(max_length=64)
+    source_text = models.TextField()
+    translated = models.TextField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["source", "target", "text_hash"], name="unique_translation"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.source}→{self.target} {self.text_hash[:12]}…"
+
+
+class DreamDailyStat(models.Model):
+    """
+    Agrégat des rêves d'un utilisateur par jour local et par émotion, tenu
+    à jour à chaque changement d'un rêve (voir rollups.py). Le tableau de
+    bord lit cette table : son coût suit le nombre de jours, pas de rêves.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='dream_daily_stats')
+    day = models.DateField()
+    emotion = models.CharField(max_length=20, blank=True, default="")
+    dreams = models.PositiveIntegerField(default=0)
+    transcription_length = models.PositiveBigIntegerField(default=0)
+    completed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "day", "emotion"], name="unique_dream_daily_stat"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.user_id} — {self.day} — {self.emotion or '∅'} : {self.dreams}"
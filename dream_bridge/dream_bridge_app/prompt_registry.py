@@ -0,0 +1,142 @@
+"""
+Registre des prompts de dream_bridge_app/prompts.
+
+Les prompts étaient relus sur disque à chaque appel du pipeline. Ici, tous
+les fichiers *.txt du dossier sont chargés une fois et leurs gabarits
+str.format découpés d'avance (texte fixe / champs). Un fichier n'est relu
+que si son mtime a changé, et le dossier n'est ré-inspecté qu'au plus
+toutes les RELOAD_CHECK_SECONDS : on peut retoucher un prompt sans
+redémarrer les workers.
+
+Chaque prompt a une version "<nom>@<8 premiers caractères du SHA-256>"
+(ou "<nom>@builtin" pour un prompt de secours codé en dur), enregistrée
+sur le rêve avec l'artefact qu'il a produit (Dream.*_prompt_version) :
+on peut comparer latence et longueur de sortie d'une version à l'autre.
+"""
+import hashlib
+import os
+import threading
+import time
+from string import Formatter
+
+from django.conf import settings
+
+PROMPTS_DIR = os.path.join(settings.BASE_DIR, "dream_bridge_app", "prompts")
+RELOAD_CHECK_SECONDS = 2.0
+
+# Noms de prompts (nom du fichier sans .txt)
+IMAGE_PROMPT_SYSTEM = "context"
+EMOTION_SYSTEM = "context_emotion"
+PERSONAL_MESSAGE = "personal_daily_message"
+
+# Prompts de secours si le fichier est absent.
+BUILTIN_PROMPTS = {
+    IMAGE_PROMPT_SYSTEM: (
+        "Tu es un artiste onirique et un expert en interprétation des rêves. "
+        "Transforme la transcription d'un rêve en un prompt court, évocateur et visuel pour un modèle de génération d'images. "
+        "- Décris la scène, les personnages, l'ambiance. "
+        "- Utilise un langage descriptif riche (couleurs, textures, lumières). "
+        "- Termine par des mots-clés de style : photorealistic, cinematic lighting, high detail, 8k. "
+        "- Réponds uniquement par le prompt."
+    ),
+    EMOTION_SYSTEM: "",
+    # ✔ Fallback étoffé : émotion + nuance astro + micro-action
+    PERSONAL_MESSAGE: (
+        "Tu écris un « message du jour » personnalisé, en français, pour {username}.\n\n"
+        "CONTEXTE RÊVE\n"
+        "- Transcription (brute) : {dream_transcription}\n"
+        "- Ambiance / prompt d’image : {image_prompt}\n"
+        "- Émotion dominante perçue : {dominant_emotion}\n\n"
+        "PRÉFÉRENCES UTILISATEUR\n"
+        "- Croit en l’astrologie : {believes_in_astrology}\n"
+        "- Signe astrologique (si connu) : {zodiac_sign}\n\n"
+        "INSTRUCTIONS\n"
+        "- 2 à 3 phrases (≈ 70–110 mots), ton chaleureux mais précis, ancré dans le rêve.\n"
+        "- Fais sentir explicitement l’émotion dominante et ce qu’elle invite à faire.\n"
+        "- Si Croit en l’astrologie = True ET Signe renseigné, ajoute une nuance subtile et positive liée au signe (sans cliché ni horoscope brut).\n"
+        "- Termine par une micro-action concrète issue du rêve (ex. noter, appeler, clarifier, respirer, poser une limite, oser demander).\n"
+        "- Pas de liste, pas d’emoji, pas de titre. Sortie : uniquement le message.\n"
+    ),
+}
+
+
+class Prompt:
+    """Texte d'un prompt, sa version et son gabarit pré-découpé."""
+
+    def __init__(self, name: str, text: str, version: str, mtime: float = None):
+        self.name = name
+        self.text = text
+        self.version = version
+        self.mtime = mtime
+        self._segments = list(Formatter().parse(text))
+        self.fields = {field for _, field, _, _ in self._segments if field}
+
+    def format(self, **context) -> str:
+        """Équivalent de text.format(**context), sans re-parser le gabarit."""
+        parts = []
+        for literal, field, spec, conversion in self._segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = context[field]
+            if conversion == "r":
+                value = repr(value)
+            elif conversion == "s":
+                value = str(value)
+            elif conversion == "a":
+                value = ascii(value)
+            parts.append(format(value, spec or ""))
+        return "".join(parts)
+
+
+def _version(name: str, text: str) -> str:
+    return f"{name}@{hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]}"
+
+
+class PromptRegistry:
+    def __init__(self, directory: str, builtins: dict):
+        self.directory = directory
+        self.builtins = {name: Prompt(name, text, f"{name}@builtin") for name, text in builtins.items()}
+        self._prompts = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def _load(self, name: str, path: str, mtime: float) -> Prompt:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        return Prompt(name, text, _version(name, text), mtime)
+
+    def reload(self) -> None:
+        """Relit les fichiers nouveaux ou modifiés, oublie ceux qui ont disparu."""
+        with self._lock:
+            seen = {}
+            try:
+                entries = [e for e in os.scandir(self.directory) if e.name.endswith(".txt") and e.is_file()]
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                name = entry.name[:-4]
+                mtime = entry.stat().st_mtime
+                current = self._prompts.get(name)
+                seen[name] = current if current and current.mtime == mtime else self._load(name, entry.path, mtime)
+            self._prompts = seen
+            self._checked_at = time.monotonic()
+
+    def get(self, name: str) -> Prompt:
+        if time.monotonic() - self._checked_at > RELOAD_CHECK_SECONDS:
+            self.reload()
+        prompt = self._prompts.get(name) or self.builtins.get(name)
+        if prompt is None:
+            raise KeyError(f"Prompt inconnu : {name!r}")
+        return prompt
+
+    def versions(self) -> dict:
+        return {name: prompt.version for name, prompt in self._prompts.items()}
+
+
+registry = PromptRegistry(PROMPTS_DIR, BUILTIN_PROMPTS)
+
+
+def get_prompt(name: str) -> Prompt:
+    return registry.get(name)
@@ -0,0 +1,568 @@
+"""
+Backends fournisseurs du pipeline, choisis par settings.DREAM_PROVIDER_BACKEND :
+
+- "real"      : Groq (Whisper, chat) et Mistral (émotion, agent d'images) ;
+- "simulated" : fixtures de simulation.pkl chargées une fois par processus,
+                avec latence et taux d'erreur injectés par étape
+                (DREAM_SIMULATION_STAGES × DREAM_SIMULATION_LATENCY_SCALE) ;
+- "replay"    : rejoue des réponses enregistrées (DREAM_REPLAY_DIR) avec
+                leurs latences mesurées (× DREAM_REPLAY_SPEED).
+
+Un backend réel enregistre ses réponses dans DREAM_PROVIDER_RECORD_DIR si
+ce réglage est renseigné : c'est la source du mode "replay".
+
+Chaque méthode a sa version async (a*) pour async_pipeline ; par défaut elle
+délègue la version synchrone à un thread.
+"""
+import asyncio
+import itertools
+import json
+import os
+import pickle
+import random
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from mistralai.models import ToolFileChunk
+
+from .agents import astart_conversation, start_conversation
+from .clients import get_async_groq_client, get_groq_client, get_mistral_client
+from .models import Dream
+
+STAGE_TRANSCRIPTION = "transcription"
+STAGE_EMOTION = "emotion"
+STAGE_IMAGE_PROMPT = "image_prompt"
+STAGE_IMAGE = "image"
+STAGE_PERSONAL_MESSAGE = "personal_message"
+
+TRANSCRIPTION_MODEL = "whisper-large-v3"
+TRANSCRIPTION_LANGUAGE = "fr"
+IMAGE_CHUNK_SIZE = 64 * 1024
+
+EMOTION_USER_PROMPT = (
+    "Analyse le texte ci-dessous. Ta réponse doit être un dictionnaire JSON valide "
+    "avec des émotions en clé et des scores entre 0 et 1 en valeur. "
+    "Ne mets pas de texte, uniquement du JSON : "
+)
+EMOTION_BATCH_USER_PROMPT = (
+    "Analyse séparément chacun des rêves ci-dessous (liste JSON d'objets id/texte). "
+    "Ta réponse doit être un objet JSON valide de la forme "
+    '{"results": [{"id": <id>, "scores": {<émotion>: <score entre 0 et 1>}}]}, '
+    "avec exactement une entrée par rêve. Ne mets pas de texte, uniquement du JSON : "
+)
+PERSONAL_MESSAGE_SYSTEM_PROMPT = (
+    "Tu es un coach onirique bienveillant. Rédige un message en français, "
+    "sans emoji ni liste ni titre, en 2–3 phrases, ancré dans le rêve."
+)
+
+
+class ProviderError(Exception):
+    """Erreur d'un backend fournisseur (dont les erreurs injectées en simulation)."""
+
+
+class ProviderBackend:
+    """Interface commune : un appel fournisseur par étape du pipeline."""
+    name = ""
+
+    def transcribe(self, audio_path: str) -> str:
+        raise NotImplementedError
+
+    def emotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        raise NotImplementedError
+
+    def emotion_scores_batch(self, transcriptions: list, system_prompt: str) -> list:
+        """Scores de plusieurs transcriptions, dans l'ordre ; par défaut un appel par texte."""
+        return [self.emotion_scores(transcription, system_prompt) for transcription in transcriptions]
+
+    def image_prompt(self, transcription: str, system_prompt: str) -> str:
+        raise NotImplementedError
+
+    def generate_image(self, image_prompt: str) -> bytes:
+        raise NotImplementedError
+
+    def generate_image_stream(self, image_prompt: str):
+        """Image par morceaux (itérable de bytes) ; par défaut un seul morceau."""
+        yield self.generate_image(image_prompt)
+
+    def personal_message(self, prompt: str, model: str) -> str:
+        raise NotImplementedError
+
+    async def atranscribe(self, audio_path: str) -> str:
+        return await asyncio.to_thread(self.transcribe, audio_path)
+
+    async def aemotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        return await asyncio.to_thread(self.emotion_scores, transcription, system_prompt)
+
+    async def aimage_prompt(self, transcription: str, system_prompt: str) -> str:
+        return await asyncio.to_thread(self.image_prompt, transcription, system_prompt)
+
+    async def agenerate_image(self, image_prompt: str) -> bytes:
+        return await asyncio.to_thread(self.generate_image, image_prompt)
+
+    async def agenerate_image_stream(self, image_prompt: str):
+        yield await self.agenerate_image(image_prompt)
+
+    async def apersonal_message(self, prompt: str, model: str) -> str:
+        return await asyncio.to_thread(self.personal_message, prompt, model)
+
+
+# ----------------------- Backend réel -----------------------
+
+def _emotion_messages(transcription: str, system_prompt: str) -> list:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": EMOTION_USER_PROMPT + transcription},
+    ]
+
+
+def _emotion_batch_messages(transcriptions: list, system_prompt: str) -> list:
+    items = [{"id": i, "texte": transcription} for i, transcription in enumerate(transcriptions)]
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": EMOTION_BATCH_USER_PROMPT + json.dumps(items, ensure_ascii=False)},
+    ]
+
+
+def parse_emotion_batch(content: str, count: int) -> list:
+    """Réponse groupée → une liste de scores par rêve ; ProviderError si elle est incomplète."""
+    try:
+        results = json.loads(content)["results"]
+        by_id = {int(item["id"]): item["scores"] for item in results}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ProviderError(f"Réponse d'émotions groupée illisible : {e}") from e
+    if sorted(by_id) != list(range(count)) or not all(isinstance(v, dict) for v in by_id.values()):
+        raise ProviderError("Réponse d'émotions groupée incomplète.")
+    return [by_id[i] for i in range(count)]
+
+
+def _image_prompt_messages(transcription: str, system_prompt: str) -> list:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": transcription},
+    ]
+
+
+def _personal_message_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": PERSONAL_MESSAGE_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _image_file_id(conversation_response):
+    for chunk in conversation_response.outputs[-1].content:
+        if isinstance(chunk, ToolFileChunk):
+            return chunk.file_id
+    raise ValueError("L'agent Mistral n'a pas retourné de fichier image.")
+
+
+class RealBackend(ProviderBackend):
+    name = "real"
+
+    def transcribe(self, audio_path: str) -> str:
+        # Le SDK lit le fichier au moment de l'envoi.
+        transcription = get_groq_client().audio.transcriptions.create(
+            file=Path(audio_path), model=TRANSCRIPTION_MODEL, language=TRANSCRIPTION_LANGUAGE
+        )
+        return transcription.text
+
+    def emotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        chat_response = get_mistral_client().chat.complete(
+            model="mistral-large-latest",
+            messages=_emotion_messages(transcription, system_prompt),
+            response_format={"type": "json_object"},
+        )
+        return json.loads(chat_response.choices[0].message.content) or {}
+
+    def emotion_scores_batch(self, transcriptions: list, system_prompt: str) -> list:
+        chat_response = get_mistral_client().chat.complete(
+            model="mistral-large-latest",
+            messages=_emotion_batch_messages(transcriptions, system_prompt),
+            response_format={"type": "json_object"},
+        )
+        return parse_emotion_batch(chat_response.choices[0].message.content, len(transcriptions))
+
+    def image_prompt(self, transcription: str, system_prompt: str) -> str:
+        completion = get_groq_client().chat.completions.create(
+            model="llama3-70b-8192",
+            messages=_image_prompt_messages(transcription, system_prompt),
+        )
+        return completion.choices[0].message.content.strip()
+
+    def generate_image(self, image_prompt: str) -> bytes:
+        mistral_client = get_mistral_client()
+        conversation_response = start_conversation(mistral_client, image_prompt)
+        return mistral_client.files.download(file_id=_image_file_id(conversation_response)).read()
+
+    def generate_image_stream(self, image_prompt: str):
+        # Le SDK renvoie la réponse httpx non lue (stream=True) : on la consomme par morceaux.
+        mistral_client = get_mistral_client()
+        conversation_response = start_conversation(mistral_client, image_prompt)
+        response = mistral_client.files.download(file_id=_image_file_id(conversation_response))
+        try:
+            yield from response.iter_bytes(IMAGE_CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def personal_message(self, prompt: str, model: str) -> str:
+        if not settings.GROQ_API_KEY:
+            raise ProviderError("GROQ_API_KEY absente.")
+        completion = get_groq_client().chat.completions.create(
+            model=model, messages=_personal_message_messages(prompt), temperature=0.8,
+        )
+        return (completion.choices[0].message.content or "").strip()
+
+    async def atranscribe(self, audio_path: str) -> str:
+        transcription = await get_async_groq_client().audio.transcriptions.create(
+            file=Path(audio_path), model=TRANSCRIPTION_MODEL, language=TRANSCRIPTION_LANGUAGE
+        )
+        return transcription.text
+
+    async def aemotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        chat_response = await get_mistral_client().chat.complete_async(
+            model="mistral-large-latest",
+            messages=_emotion_messages(transcription, system_prompt),
+            response_format={"type": "json_object"},
+        )
+        return json.loads(chat_response.choices[0].message.content) or {}
+
+    async def aimage_prompt(self, transcription: str, system_prompt: str) -> str:
+        completion = await get_async_groq_client().chat.completions.create(
+            model="llama3-70b-8192",
+            messages=_image_prompt_messages(transcription, system_prompt),
+        )
+        return completion.choices[0].message.content.strip()
+
+    async def agenerate_image(self, image_prompt: str) -> bytes:
+        mistral_client = get_mistral_client()
+        conversation_response = await astart_conversation(mistral_client, image_prompt)
+        download = await mistral_client.files.download_async(file_id=_image_file_id(conversation_response))
+        return await download.aread()
+
+    async def agenerate_image_stream(self, image_prompt: str):
+        mistral_client = get_mistral_client()
+        conversation_response = await astart_conversation(mistral_client, image_prompt)
+        response = await mistral_client.files.download_async(file_id=_image_file_id(conversation_response))
+        try:
+            async for chunk in response.aiter_bytes(IMAGE_CHUNK_SIZE):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def apersonal_message(self, prompt: str, model: str) -> str:
+        if not settings.GROQ_API_KEY:
+            raise ProviderError("GROQ_API_KEY absente.")
+        completion = await get_async_groq_client().chat.completions.create(
+            model=model, messages=_personal_message_messages(prompt), temperature=0.8,
+        )
+        return (completion.choices[0].message.content or "").strip()
+
+
+# ----------------------- Backend simulé -----------------------
+
+@lru_cache(maxsize=1)
+def load_simulation_data() -> dict:
+    """Fixtures de simulation, lues une seule fois par processus."""
+    sim_path = os.path.join(settings.BASE_DIR, "dream_bridge_app", "simulation.pkl")
+    with open(sim_path, "rb") as f:
+        return pickle.load(f)
+
+
+class SimulatedBackend(ProviderBackend):
+    """
+    Réponses des fixtures, après une latence tirée d'une loi log-normale
+    (médiane `latency` s, dispersion `sigma`) et une erreur avec une
+    probabilité `error_rate`, par étape.
+    """
+    name = "simulated"
+
+    def __init__(self, stages: dict = None, latency_scale: float = None, seed=None):
+        self.stages = stages if stages is not None else settings.DREAM_SIMULATION_STAGES
+        self.latency_scale = settings.DREAM_SIMULATION_LATENCY_SCALE if latency_scale is None else latency_scale
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, stage: str) -> float:
+        """Tire (latence en secondes, erreur injectée ?) pour une étape."""
+        profile = self.stages.get(stage, {})
+        with self._lock:
+            latency = profile.get("latency", 0.0) * self._random.lognormvariate(0.0, profile.get("sigma", 0.0))
+            failed = self._random.random() < profile.get("error_rate", 0.0)
+        return latency * self.latency_scale, failed
+
+    def _simulate(self, stage: str) -> None:
+        latency, failed = self._draw(stage)
+        if latency:
+            time.sleep(latency)
+        if failed:
+            raise ProviderError(f"Erreur simulée ({stage}).")
+
+    async def _asimulate(self, stage: str) -> None:
+        latency, failed = self._draw(stage)
+        if latency:
+            await asyncio.sleep(latency)
+        if failed:
+            raise ProviderError(f"Erreur simulée ({stage}).")
+
+    def _emotion_fixture(self) -> dict:
+        scores = load_simulation_data().get("emotion_scores")
+        if scores:
+            return dict(scores)
+        with self._lock:
+            return {code: round(self._random.random(), 2) for code, _ in Dream.EMOTIONS if code != "neutre"}
+
+    def _personal_message_fixture(self) -> str:
+        return load_simulation_data().get(
+            "personal_message",
+            "Ce rêve t'invite à ralentir et à écouter ce qui se dit en toi. "
+            "Note aujourd'hui une image qui t'a marqué et ce qu'elle t'évoque.",
+        )
+
+    def transcribe(self, audio_path: str) -> str:
+        self._simulate(STAGE_TRANSCRIPTION)
+        return load_simulation_data()["transcription"]
+
+    def emotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        self._simulate(STAGE_EMOTION)
+        return self._emotion_fixture()
+
+    def emotion_scores_batch(self, transcriptions: list, system_prompt: str) -> list:
+        self._simulate(STAGE_EMOTION)
+        return [self._emotion_fixture() for _ in transcriptions]
+
+    def image_prompt(self, transcription: str, system_prompt: str) -> str:
+        self._simulate(STAGE_IMAGE_PROMPT)
+        return load_simulation_data()["image_prompt"]
+
+    def generate_image(self, image_prompt: str) -> bytes:
+        self._simulate(STAGE_IMAGE)
+        return load_simulation_data()["image_bytes"]
+
+    def personal_message(self, prompt: str, model: str) -> str:
+        self._simulate(STAGE_PERSONAL_MESSAGE)
+        return self._personal_message_fixture()
+
+    async def atranscribe(self, audio_path: str) -> str:
+        await self._asimulate(STAGE_TRANSCRIPTION)
+        return load_simulation_data()["transcription"]
+
+    async def aemotion_scores(self, transcription: str, system_prompt: str) -> dict:
+        await self._asimulate(STAGE_EMOTION)
+        return self._emotion_fixture()
+
+    async def aimage_prompt(self, transcription: str, system_prompt: str) -> str:
+        await self._asimulate(STAGE_IMAGE_PROMPT)
+        return load_simulation_data()["image_prompt"]
+
+    async def agenerate_image(self, image_prompt: str) -> bytes:
+        await self._asimulate(STAGE_IMAGE)
+        return load_simulation_data()["image_bytes"]
+
+    async def apersonal_message(self, prompt: str, model: str) -> str:
+        await self._asimulate(STAGE_PERSONAL_MESSAGE)
+        return self._personal_message_fixture()
+
+
+# ----------------------- Enregistrement & rejeu -----------------------
+
+RECORDING_FILE = "recording.jsonl"
+
+
+class RecordingBackend(ProviderBackend):
+    """
+    Enveloppe un backend et ajoute chaque réponse (+ latence mesurée) à
+    <dossier>/recording.jsonl ; les images sont écrites à côté.
+    """
+
+    def __init__(self, backend: ProviderBackend, record_dir: str):
+        self.backend = backend
+        self.name = backend.name
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _record(self, stage: str, started: float, output) -> None:
+        latency = round(time.perf_counter() - started, 3)
+        with self._lock:
+            if isinstance(output, bytes):
+                image_name = f"{stage}-{time.time_ns()}.bin"
+                (self.record_dir / image_name).write_bytes(output)
+                output = {"file": image_name}
+            with open(self.record_dir / RECORDING_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"stage": stage, "latency": latency, "output": output}, ensure_ascii=False) + "\n")
+
+    def _call(self, stage: str, method, *args):
+        started = time.perf_counter()
+        output = method(*args)
+        self._record(stage, started, output)
+        return output
+
+    async def _acall(self, stage: str, method, *args):
+        started = time.perf_counter()
+        output = await method(*args)
+        await asyncio.to_thread(self._record, stage, started, output)
+        return output
+
+    def transcribe(self, *args):
+        return self._call(STAGE_TRANSCRIPTION, self.backend.transcribe, *args)
+
+    def emotion_scores(self, *args):
+        return self._call(STAGE_EMOTION, self.backend.emotion_scores, *args)
+
+    def image_prompt(self, *args):
+        return self._call(STAGE_IMAGE_PROMPT, self.backend.image_prompt, *args)
+
+    def generate_image(self, *args):
+        return self._call(STAGE_IMAGE, self.backend.generate_image, *args)
+
+    def personal_message(self, *args):
+        return self._call(STAGE_PERSONAL_MESSAGE, self.backend.personal_message, *args)
+
+    def emotion_scores_batch(self, *args):
+        started = time.perf_counter()
+        results = self.backend.emotion_scores_batch(*args)
+        # Une entrée par texte : le rejeu les relit une à une via emotion_scores.
+        for scores in results:
+            self._record(STAGE_EMOTION, started, scores)
+        return results
+
+    def generate_image_stream(self, *args):
+        started = time.perf_counter()
+        chunks = []
+        for chunk in self.backend.generate_image_stream(*args):
+            chunks.append(chunk)
+            yield chunk
+        # Enregistrée d'un bloc, comme generate_image.
+        self._record(STAGE_IMAGE, started, b"".join(chunks))
+
+    async def atranscribe(self, *args):
+        return await self._acall(STAGE_TRANSCRIPTION, self.backend.atranscribe, *args)
+
+    async def aemotion_scores(self, *args):
+        return await self._acall(STAGE_EMOTION, self.backend.aemotion_scores, *args)
+
+    async def aimage_prompt(self, *args):
+        return await self._acall(STAGE_IMAGE_PROMPT, self.backend.aimage_prompt, *args)
+
+    async def agenerate_image(self, *args):
+        return await self._acall(STAGE_IMAGE, self.backend.agenerate_image, *args)
+
+    async def apersonal_message(self, *args):
+        return await self._acall(STAGE_PERSONAL_MESSAGE, self.backend.apersonal_message, *args)
+
+    async def agenerate_image_stream(self, *args):
+        started = time.perf_counter()
+        chunks = []
+        async for chunk in self.backend.agenerate_image_stream(*args):
+            chunks.append(chunk)
+            yield chunk
+        await asyncio.to_thread(self._record, STAGE_IMAGE, started, b"".join(chunks))
+
+
+class ReplayBackend(ProviderBackend):
+    """Rejoue, en boucle et par étape, les réponses d'un enregistrement."""
+    name = "replay"
+
+    def __init__(self, replay_dir: str = None, speed: float = None):
+        self.replay_dir = Path(replay_dir or settings.DREAM_REPLAY_DIR)
+        self.speed = settings.DREAM_REPLAY_SPEED if speed is None else speed
+        self._records = self._load()
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        records = {}
+        with open(self.replay_dir / RECORDING_FILE, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    output = record["output"]
+                    if isinstance(output, dict) and "file" in output:
+                        record["output"] = (self.replay_dir / output["file"]).read_bytes()
+                    records.setdefault(record["stage"], []).append(record)
+        return {stage: itertools.cycle(items) for stage, items in records.items()}
+
+    def _next(self, stage: str) -> dict:
+        with self._lock:
+            if stage not in self._records:
+                raise ProviderError(f"Aucune réponse enregistrée pour l'étape {stage}.")
+            return next(self._records[stage])
+
+    def _replay(self, stage: str):
+        record = self._next(stage)
+        if self.speed:
+            time.sleep(record["latency"] * self.speed)
+        return record["output"]
+
+    async def _areplay(self, stage: str):
+        record = self._next(stage)
+        if self.speed:
+            await asyncio.sleep(record["latency"] * self.speed)
+        return record["output"]
+
+    def transcribe(self, audio_path):
+        return self._replay(STAGE_TRANSCRIPTION)
+
+    def emotion_scores(self, transcription, system_prompt):
+        return self._replay(STAGE_EMOTION)
+
+    def image_prompt(self, transcription, system_prompt):
+        return self._replay(STAGE_IMAGE_PROMPT)
+
+    def generate_image(self, image_prompt):
+        return self._replay(STAGE_IMAGE)
+
+    def personal_message(self, prompt, model):
+        return self._replay(STAGE_PERSONAL_MESSAGE)
+
+    async def atranscribe(self, audio_path):
+        return await self._areplay(STAGE_TRANSCRIPTION)
+
+    async def aemotion_scores(self, transcription, system_prompt):
+        return await self._areplay(STAGE_EMOTION)
+
+    async def aimage_prompt(self, transcription, system_prompt):
+        return await self._areplay(STAGE_IMAGE_PROMPT)
+
+    async def agenerate_image(self, image_prompt):
+        return await self._areplay(STAGE_IMAGE)
+
+    async def apersonal_message(self, prompt, model):
+        return await self._areplay(STAGE_PERSONAL_MESSAGE)
+
+
+# ----------------------- Sélection -----------------------
+
+BACKENDS = {
+    "real": RealBackend,
+    "simulated": SimulatedBackend,
+    "replay": ReplayBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_provider() -> ProviderBackend:
+    """Backend configuré, instancié une fois par processus (et par nom)."""
+    name = settings.DREAM_PROVIDER_BACKEND
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                if name not in BACKENDS:
+                    raise ValueError(f"DREAM_PROVIDER_BACKEND inconnu : {name!r}")
+                backend = BACKENDS[name]()
+                if name == "real" and settings.DREAM_PROVIDER_RECORD_DIR:
+                    backend = RecordingBackend(backend, settings.DREAM_PROVIDER_RECORD_DIR)
+                _backends[name] = backend
+    return backend
+
+
+def reset_providers() -> None:
+    with _backends_lock:
+        _backends.clear()
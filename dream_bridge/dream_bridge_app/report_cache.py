@@ -0,0 +1,126 @@
+"""
+Cache des rapports du tableau de bord.
+
+Passer d'un onglet à l'autre (3d / 7d / 1m / all) recalculait toutes les
+métriques alors que rien n'avait changé. Le contexte calculé est gardé
+dans le cache Django, clé (utilisateur, génération, jour, période,
+émotion) :
+
+- la génération est un compteur par utilisateur, incrémenté (signals.py,
+  après commit) dès qu'un de ses rêves est créé, supprimé ou change de
+  statut, d'émotion ou de transcription : une entrée périmée n'est plus jamais lue, une
+  donnée inchangée n'est jamais recalculée ;
+- le jour local fait partie de la clé : les périodes glissantes changent à minuit ;
+- les analyses de l'historique (analytics.py) ne dépendent ni de la
+  période ni du filtre : une seule entrée par génération, partagée par
+  tous les onglets.
+
+Compteurs et rapports vivent dans le cache "reports" (settings.CACHES,
+Redis) et non dans le cache par défaut, propre à chaque processus : une
+incrémentation faite par un worker Celery doit être vue par les processus
+web. Si ce cache est injoignable, le rapport est calculé sans cache
+(jamais servi périmé) et Redis n'est retenté qu'après REDIS_RETRY_SECONDS.
+
+Un compteur disparu du cache (éviction, redémarrage) repart d'une valeur
+tirée de l'horloge, toujours plus grande que les précédentes : les
+anciennes entrées ne peuvent pas redevenir valides. Compteurs : stats
+"reports." (hits / misses / cache_errors).
+"""
+import logging
+import time
+from urllib.parse import quote
+
+import redis
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+CACHE_ALIAS = "reports"
+REDIS_RETRY_SECONDS = 30
+
+_redis_down_until = 0.0
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _available() -> bool:
+    return time.monotonic() >= _redis_down_until
+
+
+def _cache_failed(e: Exception) -> None:
+    global _redis_down_until
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+    stats.incr("reports.cache_errors")
+    logger.warning("Cache des rapports indisponible (%s), rapports calculés sans cache.", e)
+
+
+def _generation_key(user_id) -> str:
+    return f"report-generation:{user_id}"
+
+
+def generation(user_id) -> int:
+    key = _generation_key(user_id)
+    value = _cache().get(key)
+    if value is None:
+        _cache().add(key, time.time_ns(), timeout=None)
+        value = _cache().get(key)
+    return value
+
+
+def bump_generation(user_id) -> None:
+    """Invalide d'un coup tous les rapports en cache de l'utilisateur."""
+    if not _available():
+        return
+    key = _generation_key(user_id)
+    try:
+        try:
+            _cache().incr(key)
+        except ValueError:
+            _cache().add(key, time.time_ns(), timeout=None)
+    except redis.RedisError as e:
+        _cache_failed(e)
+
+
+def _cached(user, suffix: str, compute) -> dict:
+    if not _available():
+        stats.incr("reports.misses")
+        return compute()
+    try:
+        key = f"report:{user.pk}:{generation(user.pk)}:{timezone.localdate().isoformat()}:{suffix}"
+        context = _cache().get(key)
+    except redis.RedisError as e:
+        _cache_failed(e)
+        stats.incr("reports.misses")
+        return compute()
+    if context is not None:
+        stats.incr("reports.hits")
+        return context
+    stats.incr("reports.misses")
+    context = compute()
+    try:
+        _cache().set(key, context, timeout=settings.DREAM_REPORT_CACHE_SECONDS)
+    except redis.RedisError as e:
+        _cache_failed(e)
+    return context
+
+
+def cached_report(user, period: str, emotion: str, compute) -> dict:
+    """Contexte du rapport depuis le cache, ou `compute()` puis mise en cache."""
+    return _cached(user, f"{quote(period or '')}:{quote(emotion or 'all')}", compute)
+
+
+def cached_analytics(user, compute) -> dict:
+    """Analyses de tout l'historique : une seule entrée, quels que soient période et filtre."""
+    return _cached(user, "analytics", compute)
+
+
+def reset() -> None:
+    """Oublie le repli sur Redis indisponible (tests)."""
+    global _redis_down_until
+    _redis_down_until = 0.0
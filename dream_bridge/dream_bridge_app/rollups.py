@@ -0,0 +1,76 @@
+"""
+Agrégat quotidien des rêves (DreamDailyStat) pour le tableau de bord.
+
+La période "all" du rapport relisait tout l'historique de l'utilisateur à
+chaque affichage. La table DreamDailyStat garde, par (utilisateur, jour
+local, émotion) : le nombre de rêves, la longueur cumulée des
+transcriptions et les nombres de COMPLETED / FAILED.
+
+Quand un rêve est créé, supprimé, ou change de statut, d'émotion ou de
+transcription (signaux de signals.py), seules les lignes de son jour sont
+recalculées : un GROUP BY sur les rêves de cette journée. Les écritures
+qui contournent les signaux (QuerySet.update, bulk_create) ne sont prises
+en compte qu'au prochain changement du même jour, ou par :
+
+    python manage.py rebuild_dream_stats [--user <id>]
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Length, TruncDate
+from django.utils import timezone
+
+from .models import Dream, DreamDailyStat
+
+# Champs de Dream dont dépend l'agrégat (un save(update_fields=...) sans eux est ignoré)
+TRACKED_FIELDS = {"status", "emotion", "transcription", "created_at", "user"}
+
+AGGREGATES = {
+    "dreams": Count("id"),
+    "total_length": Sum(Length("transcription")),
+    "completed_count": Count("id", filter=Q(status=Dream.DreamStatus.COMPLETED)),
+    "failed_count": Count("id", filter=Q(status=Dream.DreamStatus.FAILED)),
+}
+
+
+def _stat(user_id, day, row) -> DreamDailyStat:
+    return DreamDailyStat(
+        user_id=user_id, day=day, emotion=row["emotion"] or "", dreams=row["dreams"],
+        transcription_length=row["total_length"] or 0,
+        completed=row["completed_count"], failed=row["failed_count"],
+    )
+
+
+def refresh_day(user_id, day) -> None:
+    """Recalcule les lignes (user_id, day, *) à partir des rêves de cette journée locale."""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    rows = (Dream.objects
+            .filter(user_id=user_id, created_at__gte=start, created_at__lt=start + timedelta(days=1))
+            .order_by()
+            .values("emotion")
+            .annotate(**AGGREGATES))
+    with transaction.atomic():
+        DreamDailyStat.objects.filter(user_id=user_id, day=day).delete()
+        DreamDailyStat.objects.bulk_create([_stat(user_id, day, row) for row in rows])
+
+
+def refresh_for_dream(dream: Dream) -> None:
+    if dream.user_id and dream.created_at:
+        refresh_day(dream.user_id, timezone.localdate(dream.created_at))
+
+
+def rebuild(user=None) -> int:
+    """Reconstruit tout l'agrégat (ou celui d'un utilisateur) ; renvoie le nombre de lignes."""
+    dreams = Dream.objects.all() if user is None else Dream.objects.filter(user=user)
+    stats = DreamDailyStat.objects.all() if user is None else DreamDailyStat.objects.filter(user=user)
+    rows = (dreams.order_by()
+            .annotate(day=TruncDate("created_at"))
+            .values("user_id", "day", "emotion")
+            .annotate(**AGGREGATES))
+    with transaction.atomic():
+        stats.delete()
+        created = DreamDailyStat.objects.bulk_create(
+            [_stat(row["user_id"], row["day"], row) for row in rows], batch_size=1000
+        )
+    return len(created)
@@ -1,69 +1,42 @@
+import logging
 import os
-import pickle
-import json
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.cache import cache
+from django.db.models import F
 from django.utils import timezone
 
-from groq import Groq
-from mistralai import Mistral
-from mistralai.models import ToolFileChunk
-
-from deep_translator import GoogleTranslator
-
-from .models import Dream
+from . import blobstore, db_writer, emotion_batcher, emotions, image_store, singleflight, stats, translations
+from .models import DailyMessage, Dream, TranscriptionCache
+from .prompt_registry import EMOTION_SYSTEM, IMAGE_PROMPT_SYSTEM, PERSONAL_MESSAGE, get_prompt
+from .providers import (
+    STAGE_EMOTION,
+    STAGE_IMAGE,
+    STAGE_IMAGE_PROMPT,
+    STAGE_PERSONAL_MESSAGE,
+    STAGE_TRANSCRIPTION,
+    TRANSCRIPTION_LANGUAGE,
+    TRANSCRIPTION_MODEL,
+    get_provider,
+)
 
 User = get_user_model()
-MISTRAL_API_KEY = settings.MISTRAL_API_KEY
+logger = logging.getLogger(__name__)
 
 # ----------------------- Prompts & fichiers -----------------------
-
-PROMPTS_DIR = os.path.join(settings.BASE_DIR, "dream_bridge_app", "prompts")
-PERSONAL_MSG_PROMPT_PATH = os.path.join(PROMPTS_DIR, "personal_daily_message.txt")
-
+# Les prompts viennent du registre (chargés une fois, rechargés si le
+# fichier change) ; voir prompt_registry.py.
 
 def get_personal_message_template() -> str:
-    """
-    Charge le template /prompts/personal_daily_message.txt.
-    Fallback plus expressif si le fichier est absent.
-    """
-    try:
-        with open(PERSONAL_MSG_PROMPT_PATH, "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        # ✔ Fallback étoffé : émotion + nuance astro + micro-action
-        return (
-            "Tu écris un « message du jour » personnalisé, en français, pour {username}.\n\n"
-            "CONTEXTE RÊVE\n"
-            "- Transcription (brute) : {dream_transcription}\n"
-            "- Ambiance / prompt d’image : {image_prompt}\n"
-            "- Émotion dominante perçue : {dominant_emotion}\n\n"
-            "PRÉFÉRENCES UTILISATEUR\n"
-            "- Croit en l’astrologie : {believes_in_astrology}\n"
-            "- Signe astrologique (si connu) : {zodiac_sign}\n\n"
-            "INSTRUCTIONS\n"
-            "- 2 à 3 phrases (≈ 70–110 mots), ton chaleureux mais précis, ancré dans le rêve.\n"
-            "- Fais sentir explicitement l’émotion dominante et ce qu’elle invite à faire.\n"
-            "- Si Croit en l’astrologie = True ET Signe renseigné, ajoute une nuance subtile et positive liée au signe (sans cliché ni horoscope brut).\n"
-            "- Termine par une micro-action concrète issue du rêve (ex. noter, appeler, clarifier, respirer, poser une limite, oser demander).\n"
-            "- Pas de liste, pas d’emoji, pas de titre. Sortie : uniquement le message.\n"
-        )
-
-
-def read_context_file(filename="context.txt"):
-    """Lit un fichier de contexte depuis le dossier de l'application."""
-    path = os.path.join(settings.BASE_DIR, "dream_bridge_app", filename)
-    try:
-        with open(path, "r", encoding="utf-8") as file:
-            return file.read()
-    except FileNotFoundError:
-        return ""
+    """Template prompts/personal_daily_message.txt (ou son fallback intégré)."""
+    return get_prompt(PERSONAL_MESSAGE).text
 
 
-def build_personal_message_prompt(dream: Dream, user) -> str:
+def build_personal_message_prompt(dream: Dream, user, prompt=None) -> str:
     """
     Prépare le prompt avec données du rêve + profil (astro) + émotion dominante.
     """
@@ -90,8 +63,7 @@ def build_personal_message_prompt(dream: Dream, user) -> str:
         "dominant_emotion": emotion_label or "neutre",
     }
 
-    template = get_personal_message_template()
-    return template.format(**ctx)
+    return (prompt or get_prompt(PERSONAL_MESSAGE)).format(**ctx)
 
 def _fallback_personal_message(dream: Dream, user) -> str:
     """
@@ -142,141 +114,263 @@ def _fallback_personal_message(dream: Dream, user) -> str:
 
 
 def get_system_prompt() -> str:
-    """Prompt système pour générer le prompt d'image si besoin."""
-    content = read_context_file("context.txt")
-    if content:
-        return content
-    return (
-        "Tu es un artiste onirique et un expert en interprétation des rêves. "
-        "Transforme la transcription d'un rêve en un prompt court, évocateur et visuel pour un modèle de génération d'images. "
-        "- Décris la scène, les personnages, l'ambiance. "
-        "- Utilise un langage descriptif riche (couleurs, textures, lumières). "
-        "- Termine par des mots-clés de style : photorealistic, cinematic lighting, high detail, 8k. "
-        "- Réponds uniquement par le prompt."
+    """Prompt système pour générer le prompt d'image."""
+    return get_prompt(IMAGE_PROMPT_SYSTEM).text
+
+
+def get_emotion_system_prompt() -> str:
+    """Consigne du LLM d'émotions."""
+    return get_prompt(EMOTION_SYSTEM).text
+
+
+def _llm_emotion_scores_single(transcription: str) -> dict:
+    system_prompt = get_emotion_system_prompt()
+    if not system_prompt:
+        return {}
+    return get_provider().emotion_scores(transcription, system_prompt)
+
+
+def _llm_emotion_scores_batch(transcriptions: list) -> list:
+    system_prompt = get_emotion_system_prompt()
+    if not system_prompt:
+        return [{} for _ in transcriptions]
+    return get_provider().emotion_scores_batch(transcriptions, system_prompt)
+
+
+def submit_llm_emotion_scores(transcription: str):
+    """
+    Confie la transcription au batcher du processus ; renvoie un
+    concurrent.futures.Future, ou None si le regroupement est désactivé.
+    """
+    if settings.DREAM_EMOTION_BATCH_SIZE <= 1:
+        return None
+    batcher = emotion_batcher.get_batcher(
+        _llm_emotion_scores_batch, _llm_emotion_scores_single,
+        settings.DREAM_EMOTION_BATCH_WINDOW_MS / 1000, settings.DREAM_EMOTION_BATCH_SIZE,
     )
+    return batcher.submit(transcription)
+
+
+def _llm_emotion_scores(transcription: str) -> dict:
+    future = submit_llm_emotion_scores(transcription)
+    if future is None:
+        return _llm_emotion_scores_single(transcription)
+    return future.result()
+
+
+def get_emotion_scores(transcription: str) -> dict:
+    """
+    Score chaque émotion de la transcription : lexique local, LLM seulement
+    si le lexique hésite (voir emotions.py).
+    """
+    return emotions.classify(transcription, _llm_emotion_scores)
+
+
+def dominant_emotion(emotions_scores: dict) -> str:
+    """Émotion au score le plus élevé, "neutre" si aucun score."""
+    if not emotions_scores:
+        return "neutre"
+    return max(emotions_scores, key=emotions_scores.get)
 
 
 def get_emotion_from_text(transcription: str) -> str:
-    """Analyse la transcription pour déduire l'émotion principale via Mistral."""
+    """Analyse la transcription pour déduire l'émotion principale."""
+    return dominant_emotion(get_emotion_scores(transcription))
+
+
+# ----------------------- Cache de transcription -----------------------
+# Un ré-upload du même enregistrement (échec, double envoi) a la même clé de
+# blob, c'est-à-dire le même SHA-256 : on réutilise la transcription déjà
+# payée au lieu de rappeler Whisper. Compteurs : stats "transcriptions.".
+
+def lookup_transcription(audio_ref: str, provider_name: str):
+    """Transcription en cache pour cet audio, ou None (chemins hérités : jamais en cache)."""
+    if not blobstore.is_blob_key(audio_ref):
+        return None
+    entry = TranscriptionCache.objects.filter(
+        audio_sha256=audio_ref, provider=provider_name, model=TRANSCRIPTION_MODEL
+    ).first()
+    if entry is None:
+        stats.incr("transcriptions.misses")
+        return None
+    stats.incr("transcriptions.hits")
+    TranscriptionCache.objects.filter(pk=entry.pk).update(hits=F("hits") + 1, last_used_at=timezone.now())
+    return entry
+
+
+def remember_transcription(audio_ref: str, provider_name: str, text: str) -> None:
+    if not blobstore.is_blob_key(audio_ref) or not text:
+        return
+    TranscriptionCache.objects.get_or_create(
+        audio_sha256=audio_ref, provider=provider_name, model=TRANSCRIPTION_MODEL,
+        defaults={"text": text, "language": TRANSCRIPTION_LANGUAGE},
+    )
+
+
+def transcribe_audio(audio_ref: str) -> str:
+    """Transcrit l'audio d'un rêve, en passant d'abord par le cache."""
+    provider = get_provider()
+    entry = lookup_transcription(audio_ref, provider.name)
+    if entry is not None:
+        return entry.text
+    text = provider.transcribe(blobstore.resolve(audio_ref))
+    remember_transcription(audio_ref, provider.name, text)
+    return text
+
+
+# ----------------------- Pipeline par étapes -----------------------
+# Chaque étape relit le rêve, saute son travail si son artefact est déjà en
+# base (point de reprise) et n'enregistre que ses propres colonnes : les étapes
+# émotion et prompt d'image peuvent donc tourner en parallèle sans s'écraser.
+
+def _discard_source_audio(dream: Dream) -> None:
+    """
+    Rend l'audio source au blob store (transcription enregistrée ou rêve en
+    échec). Le rêve n'en rend qu'une référence, même si deux branches
+    échouent en même temps : seul celui qui vide audio_ref la libère.
+    """
+    ref, dream.audio_ref = dream.audio_ref, ""
+    if not ref or not Dream.objects.filter(id=dream.id, audio_ref=ref).update(audio_ref=""):
+        return
+    if blobstore.is_blob_key(ref):
+        blobstore.release(ref)
+    elif os.path.exists(ref):
+        os.remove(ref)
+        logger.info("Deleted temporary file: %s", ref)
+
+
+def run_transcription_stage(dream_id: str) -> None:
+    """Étape 1 : transcription de l'audio (Whisper)."""
+    dream = Dream.objects.get(id=dream_id)
+    if dream.status != Dream.DreamStatus.PROCESSING:
+        dream.status = Dream.DreamStatus.PROCESSING
+        db_writer.save_fields(dream, ["status", "updated_at"])
+    if dream.transcription:
+        return
+
+    dream.transcription = transcribe_audio(dream.audio_ref)
+    db_writer.save_fields(dream, ["transcription", "updated_at"])
+    _discard_source_audio(dream)
+
+
+def run_emotion_stage(dream_id: str) -> None:
+    """Étape 2a : émotion dominante (ne dépend que de la transcription)."""
+    dream = Dream.objects.get(id=dream_id)
+    if dream.emotion_scores is not None:
+        return
+
+    dream.emotion_prompt_version = get_prompt(EMOTION_SYSTEM).version
+    dream.emotion_scores = get_emotion_scores(dream.transcription)
+    dream.emotion = dominant_emotion(dream.emotion_scores)
+    db_writer.save_fields(dream, ["emotion_scores", "emotion", "emotion_prompt_version", "updated_at"])
+
+
+def run_image_prompt_stage(dream_id: str) -> None:
+    """Étape 2b : prompt d'image (ne dépend que de la transcription)."""
+    dream = Dream.objects.get(id=dream_id)
+    if dream.image_prompt:
+        return
+
+    system_prompt = get_prompt(IMAGE_PROMPT_SYSTEM)
+    dream.image_prompt = get_provider().image_prompt(dream.transcription, system_prompt.text)
+    dream.image_prompt_version = system_prompt.version
+    db_writer.save_fields(dream, ["image_prompt", "image_prompt_version", "updated_at"])
+
+
+def run_image_stage(dream_id: str) -> None:
+    """
+    Étape 3 : image (agent d'images). Le rêve reste PROCESSING : la branche
+    émotion peut encore tourner ou échouer (voir complete_dream).
+    """
+    dream = Dream.objects.get(id=dream_id)
+    if not dream.generated_image:
+        image_store.store_image_stream(dream, get_provider().generate_image_stream(dream.image_prompt))
+        db_writer.save_fields(dream, ["generated_image", "updated_at"])
+    if not dream.image_derivatives:
+        schedule_image_derivatives(str(dream.id))
+
+
+def schedule_image_derivatives(dream_id: str) -> bool:
+    """
+    Envoie l'encodage des miniatures AVIF/WebP (file DREAM_IMAGE_QUEUE si
+    configurée ; best effort : sans dérivés, la galerie affiche l'original).
+    """
+    from .tasks import generate_image_derivatives_task
+
     try:
-        mistral_client = Mistral(api_key=MISTRAL_API_KEY)
-        system_prompt = read_context_file("context_emotion.txt")
-        if not system_prompt:
-            return "neutre"
-
-        chat_response = mistral_client.chat.complete(
-            model="mistral-large-latest",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": (
-                        "Analyse le texte ci-dessous. Ta réponse doit être un dictionnaire JSON valide "
-                        "avec des émotions en clé et des scores entre 0 et 1 en valeur. "
-                        "Ne mets pas de texte, uniquement du JSON : "
-                        f"{transcription}"
-                    ),
-                },
-            ],
-            response_format={"type": "json_object"},
-        )
-
-        prediction_str = chat_response.choices[0].message.content
-        emotions_scores = json.loads(prediction_str)
-        if not emotions_scores:
-            return "neutre"
-        return max(emotions_scores, key=emotions_scores.get)
-    except Exception:
-        return "neutre"
+        generate_image_derivatives_task.delay(dream_id)
+    except Exception as e:
+        logger.warning("Dérivés de l'image du rêve %s non planifiés : %s", dream_id, e)
+        return False
+    return True
 
 
-def orchestrate_dream_generation(dream_id: str, audio_path: str) -> None:
-    """Orchestre le pipeline (transcription → émotion → prompt → image)."""
+def run_personal_message_stage(dream_id: str) -> None:
+    """Étape 4 : message personnalisé (best effort, n'invalide pas le rêve)."""
+    dream = Dream.objects.get(id=dream_id)
+    if dream.personal_phrase:
+        return
     try:
-        dream = Dream.objects.get(id=dream_id)
-        dream.save(update_fields=["status"])
-
-        USE_SIMULATION = True 
-
-        if USE_SIMULATION:
-            sim_path = os.path.join(settings.BASE_DIR, "dream_bridge_app", "simulation.pkl")
-            with open(sim_path, "rb") as f:
-                simulation_data = pickle.load(f)
-
-            dream.transcription = simulation_data["transcription"]
-            dream.image_prompt = simulation_data["image_prompt"]
-            file_bytes = simulation_data["image_bytes"]
-
-            # ✔ calcule aussi l'émotion en simulation
-            dream.emotion = get_emotion_from_text(dream.transcription) or "neutre"
-            dream.save(update_fields=["transcription", "image_prompt", "emotion", "updated_at"])
-
-        else:
-            # --- Transcription (Whisper Groq)
-            groq_client = Groq(api_key=settings.GROQ_API_KEY)
-            mistral_client = Mistral(api_key=settings.MISTRAL_API_KEY)
-
-            with open(audio_path, "rb") as audio_file:
-                transcription = groq_client.audio.transcriptions.create(
-                    file=audio_file, model="whisper-large-v3", language="fr"
-                )
-            dream.transcription = transcription.text
-
-            # --- Émotion
-            dream.emotion = get_emotion_from_text(dream.transcription)
-            dream.save(update_fields=["emotion"])
-
-            # --- Prompt d'image
-            completion = groq_client.chat.completions.create(
-                model="llama3-70b-8192",
-                messages=[
-                    {"role": "system", "content": get_system_prompt()},
-                    {"role": "user", "content": dream.transcription},
-                ],
-            )
-            dream.image_prompt = completion.choices[0].message.content.strip()
-            dream.save(update_fields=["transcription", "image_prompt", "updated_at"])
-
-            # --- Image (Mistral image tool)
-            image_agent = mistral_client.beta.agents.create(
-                model="mistral-large-latest",
-                name="Générateur d'images de rêves",
-                description="Agent qui utilise un outil de génération d'images à partir d'un prompt texte.",
-                instructions="Utilise l'outil de génération d'image pour créer une image basée sur le prompt fourni.",
-                tools=[{"type": "image_generation"}],
-            )
-            conversation_response = mistral_client.beta.conversations.start(
-                agent_id=image_agent.id, inputs=dream.image_prompt
-            )
-            file_bytes = None
-            last_output = conversation_response.outputs[-1]
-            for chunk in last_output.content:
-                if isinstance(chunk, ToolFileChunk):
-                    file_bytes = mistral_client.files.download(file_id=chunk.file_id).read()
-                    break
-            if file_bytes is None:
-                raise ValueError("L'agent Mistral n'a pas retourné de fichier image.")
-
-        image_name = f"dream_{dream.id}.png"
-        dream.generated_image.save(image_name, ContentFile(file_bytes))
-        dream.status = Dream.DreamStatus.COMPLETED
-        dream.save(update_fields=["status", "updated_at"])
-
-        # Génération auto du message personnalisé
-        try:
-            generate_personal_message_for_dream(str(dream.id), force=True)
-
-            dream.personal_phrase_date = timezone.localdate()
-            dream.save(update_fields=["personal_phrase", "personal_phrase_date", "updated_at"])
-
-        except Exception:
-            pass
+        generate_personal_message_for_dream(str(dream.id), force=True)
+    except Exception:
+        pass
+
+
+def complete_dream(dream_id: str) -> None:
+    """
+    Étape finale, après la jonction des branches (émotion ‖ prompt → image)
+    et le message : seul endroit où le rêve passe en COMPLETED, pour qu'un
+    échec tardif d'une branche ne le fasse pas repasser de COMPLETED à FAILED.
+    """
+    dream = Dream.objects.get(id=dream_id)
+    dream.status = Dream.DreamStatus.COMPLETED
+    dream.failed_stage = ""
+    dream.error_message = ""
+    db_writer.save_fields(dream, ["status", "failed_stage", "error_message", "updated_at"])
+
 
+def mark_dream_failed(dream_id: str, stage: str, exc: Exception) -> None:
+    """
+    Passe le rêve en FAILED en notant l'étape fautive (pour la reprise) et
+    rend son audio source : un échec à la transcription ne se relance donc
+    pas sans nouvel envoi.
+    """
+    dream = Dream.objects.filter(id=dream_id).first()
+    if dream is None:
+        return
+    _discard_source_audio(dream)
+    dream.status = Dream.DreamStatus.FAILED
+    dream.failed_stage = stage
+    dream.error_message = f"Une erreur est survenue lors du traitement: {str(exc)}"
+    db_writer.save_fields(dream, ["status", "failed_stage", "error_message", "updated_at"])
+
+
+PIPELINE_STAGES = [
+    (STAGE_TRANSCRIPTION, run_transcription_stage),
+    (STAGE_EMOTION, run_emotion_stage),
+    (STAGE_IMAGE_PROMPT, run_image_prompt_stage),
+    (STAGE_IMAGE, run_image_stage),
+    (STAGE_PERSONAL_MESSAGE, run_personal_message_stage),
+]
+
+
+def orchestrate_dream_generation(dream_id: str, audio_path: str = "") -> None:
+    """
+    Exécute toutes les étapes à la suite dans le processus courant
+    (transcription → émotion → prompt → image → message).
+    Les workers Celery passent plutôt par tasks.build_dream_pipeline.
+    """
+    stage = STAGE_TRANSCRIPTION
+    try:
+        if audio_path:
+            dream = Dream.objects.get(id=dream_id)
+            dream.audio_ref = audio_path
+            db_writer.save_fields(dream, ["audio_ref", "updated_at"])
+        for stage, run_stage in PIPELINE_STAGES:
+            run_stage(dream_id)
+        complete_dream(dream_id)
     except Exception as e:
-        if "dream" in locals():
-            dream.status = Dream.DreamStatus.FAILED
-            dream.error_message = f"Une erreur est survenue lors du traitement: {str(e)}"
-            dream.save(update_fields=["status", "error_message", "updated_at"])
+        mark_dream_failed(dream_id, stage, e)
 
 
 # ----------------------- Horoscope & citations -----------------------
@@ -316,25 +410,93 @@ def get_astrological_sign(birth_date):
     return "poissons"
 
 
-def get_quote_of_the_day() -> str:
-    url = "https://zenquotes.io/api/today"
+# Les 12 horoscopes et la citation ne changent qu'une fois par jour : ils sont
+# récupérés et traduits en un lot par refresh_daily_messages (tâche beat
+# peu après minuit, Europe/Paris) et rangés dans DailyMessage. Les vues ne
+# lisent que cette table, sans jamais attendre une API tierce.
+
+HOROSCOPE_URL = "https://horoscope-app-api.vercel.app/api/v1/get-horoscope/daily"
+QUOTE_URL = "https://zenquotes.io/api/today"
+DAILY_FETCH_TIMEOUT = 10
+DAILY_MESSAGE_UNAVAILABLE = "Le message du jour arrive bientôt, reviens un peu plus tard."
+
+
+def _translate_en_fr(texts: list) -> list:
+    return translations.translate_many(texts, source="en", target="fr")
+
+
+def _fetch_horoscope(session, sign_en: str) -> str:
+    """Horoscope anglais du jour pour un signe (lève une exception en cas d'échec)."""
+    r = session.get(HOROSCOPE_URL, params={"sign": sign_en.capitalize(), "day": "TODAY"}, timeout=DAILY_FETCH_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    if not data.get("success"):
+        raise ValueError("réponse non réussie de l'API")
+    return data["data"]["horoscope_data"]
+
+
+def _fetch_quote(session) -> tuple:
+    r = session.get(QUOTE_URL, timeout=DAILY_FETCH_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    return data[0]["q"], data[0]["a"]
+
+
+def refresh_daily_messages(day=None) -> dict:
+    """
+    Récupère les 12 horoscopes et la citation (en parallèle), les traduit
+    ensemble (voir translations.translate_many) et les enregistre pour `day`.
+    Un élément en échec, à la récupération ou à la traduction, garde sa
+    valeur précédente sans bloquer les autres ; renvoie {clé: "ok" | message d'erreur}.
+    """
+    day = day or timezone.localdate()
+    signs = sorted(set(sign_map.values()))
+    fetched, report = {}, {}
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=len(signs) + 1) as pool:
+        futures = {sign: pool.submit(_fetch_horoscope, session, sign) for sign in signs}
+        futures[DailyMessage.QUOTE_KEY] = pool.submit(_fetch_quote, session)
+        for key, future in futures.items():
+            try:
+                fetched[key] = future.result()
+            except Exception as e:
+                report[key] = f"Erreur : {e}"
+
+    quote_author = None
+    if DailyMessage.QUOTE_KEY in fetched:
+        fetched[DailyMessage.QUOTE_KEY], quote_author = fetched[DailyMessage.QUOTE_KEY]
+    keys = list(fetched)
     try:
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            quote = data[0]["q"]
-            author = data[0]["a"]
-            translated = GoogleTranslator(source="en", target="fr").translate(quote)
-            return f"« {translated} » — {author}"
-        return f"Erreur HTTP {r.status_code} lors de la récupération."
+        translated_texts = _translate_en_fr([fetched[key] for key in keys]) if keys else []
     except Exception as e:
-        return f"Erreur lors de la requête : {e}"
+        return {**report, **{key: f"Erreur de traduction : {e}" for key in keys}}
+
+    for key, translated in zip(keys, translated_texts):
+        if translated is None:
+            report[key] = "Erreur de traduction"
+            continue
+        text = f"« {translated} » — {quote_author}" if key == DailyMessage.QUOTE_KEY else translated
+        DailyMessage.objects.update_or_create(key=key, day=day, defaults={"text": text})
+        report[key] = "ok"
+    return report
+
+
+def get_cached_daily_text(key: str, day=None) -> str:
+    """Texte du jour depuis la table ; à défaut le plus récent (la nuit, avant le rafraîchissement)."""
+    day = day or timezone.localdate()
+    message = (DailyMessage.objects.filter(key=key, day__lte=day)
+               .order_by("-day").values_list("text", flat=True).first())
+    return message or ""
+
+
+def get_quote_of_the_day() -> str:
+    return get_cached_daily_text(DailyMessage.QUOTE_KEY) or DAILY_MESSAGE_UNAVAILABLE
 
 
 def get_daily_message(user_id, day="TODAY") -> str:
-    """Renvoie l'horoscope (si croyance) ou la citation du jour."""
+    """Renvoie l'horoscope (si croyance) ou la citation du jour, depuis le cache."""
     try:
-        user = User.objects.get(id=user_id)
+        user = User.objects.select_related("profile").get(id=user_id)
     except User.DoesNotExist:
         return "Utilisateur non trouvé."
 
@@ -351,66 +513,87 @@ def get_daily_message(user_id, day="TODAY") -> str:
         sign_en = sign_map.get(remove_accents(sign_fr.lower()))
         if not sign_en:
             return f"Signe astrologique '{sign_fr}' non reconnu."
-        url = f"https://horoscope-app-api.vercel.app/api/v1/get-horoscope/daily?sign={sign_en.capitalize()}&day={day.upper()}"
-        r = requests.get(url, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            if data.get("success"):
-                horoscope = data["data"]["horoscope_data"]
-                translated = GoogleTranslator(source="en", target="fr").translate(horoscope)
-                return f"Horoscope pour {user.get_full_name() or user.username} ({sign_fr.capitalize()}) :\n{translated}"
-            return "Erreur : réponse non réussie de l'API."
-        return f"Erreur HTTP {r.status_code} lors de la récupération."
+        offset = {"YESTERDAY": -1, "TOMORROW": 1}.get(day.upper(), 0)
+        horoscope = get_cached_daily_text(sign_en, timezone.localdate() + timedelta(days=offset))
+        if not horoscope:
+            return DAILY_MESSAGE_UNAVAILABLE
+        return f"Horoscope pour {user.get_full_name() or user.username} ({sign_fr.capitalize()}) :\n{horoscope}"
     else:
         return get_quote_of_the_day()
 
 
+# ----------------------- Message personnalisé -----------------------
+# La page d'un rêve ne génère plus rien : elle sert le message enregistré et,
+# s'il n'est pas du jour, en demande un nouveau à Celery (stale-while-revalidate).
 
+PERSONAL_MESSAGE_REFRESH_LOCK_SECONDS = 600
+
+def personal_message_is_fresh(dream: Dream) -> bool:
+    """Le message personnalisé existe et date d'aujourd'hui (heure de Paris)."""
+    return bool(dream.personal_phrase) and dream.personal_phrase_date == timezone.localdate()
+
+
+def schedule_personal_message_refresh(dream: Dream) -> bool:
+    """
+    Demande à Celery de régénérer un message périmé ; une seule demande par
+    rêve et par jour (cache Django). Renvoie True si une tâche a été envoyée.
+    """
+    from .tasks import refresh_personal_message_task
+
+    lock_key = f"personal-message-refresh:{dream.id}:{timezone.localdate().isoformat()}"
+    if not cache.add(lock_key, True, timeout=PERSONAL_MESSAGE_REFRESH_LOCK_SECONDS):
+        return False
+    try:
+        refresh_personal_message_task.delay(str(dream.id))
+    except Exception as e:
+        cache.delete(lock_key)
+        logger.warning("Rafraîchissement du message du rêve %s non planifié : %s", dream.id, e)
+        return False
+    return True
 
-# ----------------------- Message personnalisé -----------------------
 
-# --- remplace la fonction existante ---
 def generate_personal_message_for_dream(
     dream_id: str, force: bool = True, model: str = "llama3-70b-8192"
 ) -> str:
     """
-    Génère et ENREGISTRE TOUJOURS Dream.personal_phrase (+ date).
+    Génère et enregistre Dream.personal_phrase (+ date).
     Enregistre dans 'phrase' la phrase du jour (astro/citation),
     et dans 'personal_phrase' le message personnalisé du rêve enrichi avec la phrase du jour.
+    Sans `force`, un message déjà frais (daté d'aujourd'hui) est gardé tel quel.
+    Les appels concurrents pour un même rêve partagent une seule génération
+    (singleflight).
     """
+    return singleflight.run(
+        f"personal-message:{dream_id}",
+        lambda: _generate_personal_message(dream_id, force, model),
+    )
+
+
+def _generate_personal_message(dream_id: str, force: bool, model: str) -> str:
     dream = Dream.objects.select_related("user", "user__profile").get(id=dream_id)
-    prompt = build_personal_message_prompt(dream, dream.user)
+    if not force and personal_message_is_fresh(dream):
+        return dream.personal_phrase
+    template = get_prompt(PERSONAL_MESSAGE)
+    prompt = build_personal_message_prompt(dream, dream.user, template)
     phrase_du_jour = get_daily_message(dream.user_id)
     try:
-        if not getattr(settings, "GROQ_API_KEY", None):
-            msg = _fallback_personal_message(dream, dream.user)
-        else:
-            client = Groq(api_key=settings.GROQ_API_KEY)
-            completion = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "Tu es un coach onirique bienveillant. Rédige un message en français, "
-                            "sans emoji ni liste ni titre, en 2–3 phrases, ancré dans le rêve."
-                        ),
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.8,
-            )
-            msg = (completion.choices[0].message.content or "").strip()
+        msg = get_provider().personal_message(prompt, model)
     except Exception:
         msg = _fallback_personal_message(dream, dream.user)
 
-    # Enregistre la phrase du jour dans la colonne 'phrase'
-    dream.phrase = phrase_du_jour or ""
-    dream.phrase_date = timezone.localdate()
-
     # Enregistre uniquement le message personnalisé dans la colonne 'personal_phrase'
     dream.personal_phrase = msg or ""
     dream.personal_phrase_date = timezone.localdate()
-
-    dream.save(update_fields=["phrase", "personal_phrase", "personal_phrase_date", "updated_at", "phrase_date"])
+    dream.personal_phrase_prompt_version = template.version
+    update_fields = ["personal_phrase", "personal_phrase_date", "personal_phrase_prompt_version", "updated_at"]
+
+    # Enregistre la phrase du jour dans la colonne 'phrase', sauf si le cache
+    # est encore vide : l'ancienne phrase est gardée et le prochain
+    # rafraîchissement du message (le lendemain) la remplacera.
+    if phrase_du_jour != DAILY_MESSAGE_UNAVAILABLE:
+        dream.phrase = phrase_du_jour or ""
+        dream.phrase_date = timezone.localdate()
+        update_fields += ["phrase", "phrase_date"]
+
+    dream.save(update_fields=update_fields)
     return dream.personal_phrase
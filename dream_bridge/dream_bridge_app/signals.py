@@ -0,0 +1,50 @@
+"""
+Signaux des rêves : maintien de l'agrégat quotidien (voir rollups.py),
+invalidation des rapports en cache (voir report_cache.py), publication
+des changements de statut et miroir Redis du statut (voir status_events.py)
+et libération de l'audio source d'un rêve supprimé (voir blobstore.py).
+Branchés dans DreamBridgeAppConfig.ready().
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import blobstore, report_cache, rollups, status_events
+from .models import Dream
+
+
+@receiver(post_save, sender=Dream)
+def refresh_daily_stat_on_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return  # loaddata : rebuild_dream_stats après import
+    if created or update_fields is None or rollups.TRACKED_FIELDS & set(update_fields):
+        rollups.refresh_for_dream(instance)
+        # Après commit : un rapport calculé avant le commit serait rangé sous la nouvelle génération.
+        transaction.on_commit(partial(report_cache.bump_generation, instance.user_id))
+
+
+@receiver(post_save, sender=Dream)
+def publish_status_on_save(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created or update_fields is None or "status" in update_fields:
+        # Après commit : un abonné qui relit le rêve doit voir le nouveau statut.
+        transaction.on_commit(partial(
+            status_events.publish_status, instance.pk, instance.status, instance.user_id, instance.updated_at
+        ))
+
+
+@receiver(post_delete, sender=Dream)
+def refresh_daily_stat_on_delete(sender, instance, **kwargs):
+    rollups.refresh_for_dream(instance)
+    transaction.on_commit(partial(report_cache.bump_generation, instance.user_id))
+    transaction.on_commit(partial(status_events.forget_status, instance.pk))
+
+
+@receiver(post_delete, sender=Dream)
+def release_audio_on_delete(sender, instance, **kwargs):
+    # Rêve supprimé avant la fin de sa transcription : sa référence au blob n'a pas été rendue.
+    if blobstore.is_blob_key(instance.audio_ref):
+        transaction.on_commit(partial(blobstore.release, instance.audio_ref))
@@ -0,0 +1,146 @@
+"""
+Single-flight : un seul calcul à la fois par clé, les appelants concurrents
+partagent son résultat.
+
+Le message personnalisé d'un même rêve peut être demandé en même temps par
+le pipeline, plusieurs onglets et le bouton « Régénérer » : chacun payait
+un appel Groq et la dernière écriture gagnait. Ici :
+
+- dans un processus, les threads concurrents attendent le Future du
+  premier appelant ;
+- entre processus, un verrou Redis (SET NX PX, durée SINGLE_FLIGHT_LOCK_TTL)
+  élit un meneur ; les autres attendent que le verrou tombe puis lisent le
+  résultat qu'il a publié (clé suffixée par son jeton). Si le meneur échoue,
+  un suiveur reprend le verrou et calcule lui-même.
+
+Redis injoignable : on se contente du niveau processus et on ne réessaie
+Redis qu'après REDIS_RETRY_SECONDS. Le résultat doit être sérialisable en
+JSON. Compteurs : stats "singleflight." (leaders, collapsed, timeouts,
+redis_errors).
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+
+import redis
+from django.conf import settings
+
+from . import clients, stats
+
+logger = logging.getLogger(__name__)
+
+RESULT_TTL_SECONDS = 60
+POLL_SECONDS = 0.1
+REDIS_RETRY_SECONDS = 30
+
+# Ne supprime le verrou que s'il porte encore notre jeton (il a pu expirer et changer de main).
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_flights = {}
+_flights_lock = threading.Lock()
+_redis_down_until = 0.0
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Le meneur n'a pas fini dans le délai d'attente."""
+
+
+def _redis_client():
+    if time.monotonic() < _redis_down_until:
+        return None
+    return clients.get_redis_client()
+
+
+def _mark_redis_down(exc: Exception) -> None:
+    global _redis_down_until
+    stats.incr("singleflight.redis_errors")
+    _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+    logger.warning("Single-flight : Redis injoignable (%s), verrou limité au processus.", exc)
+
+
+def _lead(client, lock_key: str, token: str, fn):
+    stats.incr("singleflight.leaders")
+    try:
+        result = fn()
+        try:
+            client.set(f"{lock_key}:result:{token}", json.dumps(result), ex=RESULT_TTL_SECONDS)
+        except redis.RedisError as e:
+            # Le travail est fait : les suiveurs recalculeront, l'appelant a son résultat.
+            _mark_redis_down(e)
+        return result
+    finally:
+        try:
+            client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+        except redis.RedisError:
+            pass  # le TTL libérera le verrou
+
+
+def _run_across_processes(key: str, fn, ttl: float, wait_timeout: float):
+    client = _redis_client()
+    if client is None:
+        stats.incr("singleflight.leaders")
+        return fn()
+
+    lock_key = f"singleflight:{key}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + wait_timeout
+    collapsed = False
+    while True:
+        try:
+            if client.set(lock_key, token, nx=True, px=int(ttl * 1000)):
+                break
+            leader_token = client.get(lock_key)
+            if leader_token is None:
+                continue
+            if not collapsed:
+                stats.incr("singleflight.collapsed")
+                collapsed = True
+            while client.get(lock_key) == leader_token:
+                if time.monotonic() > deadline:
+                    stats.incr("singleflight.timeouts")
+                    raise SingleFlightTimeout(f"Single-flight {key} : délai d'attente dépassé.")
+                time.sleep(POLL_SECONDS)
+            published = client.get(f"{lock_key}:result:{leader_token.decode()}")
+            if published is not None:
+                return json.loads(published)
+            # Le meneur a échoué (ou son verrou a expiré) : on retente d'être meneur.
+        except redis.RedisError as e:
+            _mark_redis_down(e)
+            stats.incr("singleflight.leaders")
+            return fn()
+    return _lead(client, lock_key, token, fn)
+
+
+def run(key: str, fn, ttl: float = None, wait_timeout: float = None):
+    """Exécute `fn()` une seule fois pour `key` parmi les appelants concurrents."""
+    ttl = ttl or settings.SINGLE_FLIGHT_LOCK_TTL
+    wait_timeout = wait_timeout or settings.SINGLE_FLIGHT_WAIT_TIMEOUT
+
+    with _flights_lock:
+        future = _flights.get(key)
+        leader = future is None
+        if leader:
+            future = _flights[key] = Future()
+    if not leader:
+        stats.incr("singleflight.collapsed")
+        return future.result(timeout=wait_timeout)
+
+    try:
+        result = _run_across_processes(key, fn, ttl, wait_timeout)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
@@ -0,0 +1,56 @@
+"""
+Profil SQLite de production.
+
+Par défaut, chaque connexion SQLite garde les réglages d'origine : journal
+en mode DELETE (une écriture bloque toutes les lectures), fsync complet à
+chaque commit, et transactions différées qui échouent aussitôt en
+"database is locked" quand deux écrivains veulent passer en écriture.
+Avec les petits save(update_fields=...) des workers Celery et les
+lectures des pages web, la base se bloquait sous charge.
+
+Avec DREAM_SQLITE_PROFILE=production (settings.py), chaque nouvelle
+connexion reçoit les PRAGMA de PRODUCTION_PRAGMAS (signal
+connection_created) :
+
+- journal_mode=WAL : les lectures ne bloquent plus les écritures, et inversement ;
+- synchronous=NORMAL : plus de fsync à chaque commit en WAL (durable au checkpoint) ;
+- busy_timeout : un écrivain attend le verrou au lieu d'échouer ;
+- mmap_size / cache_size : lectures servies par la mémoire.
+
+Le profil ouvre aussi les transactions en IMMEDIATE (OPTIONS de
+DATABASES), seul mode où busy_timeout s'applique à la prise du verrou
+d'écriture. Pour regrouper les écritures du pipeline, voir db_writer.py ;
+pour mesurer, `python manage.py bench_sqlite`.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRODUCTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,  # ms
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # négatif : en KiB (64 Mio)
+}
+
+
+def profile_pragmas(profile: str = None) -> dict:
+    """PRAGMA du profil (`settings.DREAM_SQLITE_PROFILE` par défaut) ; vide hors production."""
+    profile = profile or settings.DREAM_SQLITE_PROFILE
+    return dict(PRODUCTION_PRAGMAS) if profile == "production" else {}
+
+
+def apply_pragmas(cursor, pragmas: dict) -> None:
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def tune_sqlite_connection(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = profile_pragmas()
+    if pragmas:
+        with connection.cursor() as cursor:
+            apply_pragmas(cursor, pragmas)
@@ -47,13 +47,26 @@ document.addEventListener('DOMContentLoaded', () => {
     }
   }
 
+  function finish() {
+    if (loadingScreen.dataset.reloadOnDone) {
+      // Le contenu du rêve a été rendu avant la fin du pipeline : on recharge la page.
+      const elapsed = Date.now() - startTime;
+      setTimeout(() => window.location.reload(), Math.max(0, MIN_WAIT - elapsed));
+      return;
+    }
+    showDreamAfterDelay();
+  }
+
+  // --- Repli : polling toutes les 3 secondes ---
+  let pollInterval = null;
+
   function checkStatus() {
     fetch(checkUrl)
       .then(res => res.json())
       .then(data => {
         if (data.status === 'COMPLETED' || data.status === 'FAILED') {
           clearInterval(pollInterval);
-          showDreamAfterDelay();
+          finish();
         }
       })
       .catch(error => {
@@ -66,7 +79,32 @@ document.addEventListener('DOMContentLoaded', () => {
       });
   }
 
-  let pollInterval = setInterval(checkStatus, 3000);
-  checkStatus();
+  function startPolling() {
+    if (pollInterval) return;
+    pollInterval = setInterval(checkStatus, 3000);
+    checkStatus();
+  }
+
+  // --- Flux SSE : le serveur pousse chaque changement de statut ---
+  const streamUrl = loadingScreen.dataset.streamUrl;
+  if (streamUrl && window.EventSource) {
+    const source = new EventSource(streamUrl);
+    source.addEventListener('status', (event) => {
+      const data = JSON.parse(event.data);
+      if (data.status === 'COMPLETED' || data.status === 'FAILED') {
+        source.close();
+        finish();
+      }
+    });
+    source.onerror = () => {
+      // Flux refusé (503 sans Redis, 404…) : le navigateur abandonne, on repasse au polling.
+      // Sinon (fin du flux, coupure réseau), EventSource se reconnecte seul.
+      if (source.readyState === EventSource.CLOSED) {
+        startPolling();
+      }
+    };
+  } else {
+    startPolling();
+  }
 });
 
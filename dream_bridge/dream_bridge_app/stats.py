@@ -0,0 +1,39 @@
+"""
+Compteurs en mémoire, propres au processus (hits/miss des caches et
+registres). Thread-safe ; lus via snapshot() pour les logs ou l'admin.
+"""
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def incr(name: str, amount: int = 1) -> None:
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Copie des compteurs dont le nom commence par `prefix`."""
+    with _lock:
+        return {k: v for k, v in _counters.items() if k.startswith(prefix)}
+
+
+def hit_rate(prefix: str) -> float:
+    """Taux de hits de `<prefix>.hits` / (`hits` + `misses`), 0.0 si aucun appel."""
+    with _lock:
+        hits = _counters[f"{prefix}.hits"]
+        total = hits + _counters[f"{prefix}.misses"]
+    return round(hits / total, 3) if total else 0.0
+
+
+def reset(prefix: str = "") -> None:
+    with _lock:
+        for name in [k for k in _counters if k.startswith(prefix)]:
+            del _counters[name]
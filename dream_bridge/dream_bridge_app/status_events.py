@@ -0,0 +1,218 @@
+"""
+Diffusion en direct du statut des rêves (Server-Sent Events).
+
+La page d'attente interrogeait check_dream_status_api toutes les 3 s :
+une requête Django complète (session + requête Dream) par page ouverte.
+Ici, chaque changement de statut d'un rêve est publié sur le canal Redis
+"dream-status:<id>" (signals.py, après commit). La vue asynchrone
+dream_status_stream_view s'abonne à ce canal et pousse les transitions au
+navigateur (text/event-stream) jusqu'à COMPLETED ou FAILED.
+
+Il faut un serveur ASGI (dream_bridge/asgi.py, ex. uvicorn) : sous WSGI, la
+réponse n'est envoyée qu'à la fin du flux. Si Redis est injoignable, la
+vue répond 503 et waiting_screen.js repasse au polling, qui reste le repli
+en cas d'erreur du flux.
+
+Pour les clients qui restent au polling, la même écriture recopie le
+statut dans un miroir Redis (hash "dream-status-mirror:<id>" : user,
+status, updated_at, stamp). check_dream_status_api y lit le statut et
+répond avec un ETag : un If-None-Match inchangé renvoie 304 sans corps et
+sans requête sur la table Dream. Miroir absent ou Redis indisponible :
+lecture en base, qui remplit de nouveau le miroir.
+
+Le miroir ne doit jamais rester bloqué sur un statut périmé :
+
+- chaque écriture est un compare-and-set (script Lua) sur `stamp`
+  (updated_at en secondes) : un polling qui a lu PROCESSING en base avant
+  le commit de COMPLETED ne peut plus réécrire l'ancien statut ;
+- un statut non final n'est gardé que PENDING_MIRROR_SECONDS, un statut
+  final MIRROR_SECONDS ;
+- si la publication échoue, le miroir du rêve est supprimé (au mieux).
+
+Compteurs : stats "status_events." (published, redis_errors, streams,
+mirror_hits, mirror_misses).
+"""
+import hashlib
+import json
+import logging
+import time
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.urls import reverse
+
+from . import clients, stats
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+KEEPALIVE_SECONDS = 15
+REDIS_RETRY_SECONDS = 30
+MIRROR_SECONDS = 24 * 3600  # statut final : un rêve consulté plus d'un jour après repasse par la base
+PENDING_MIRROR_SECONDS = 5  # statut non final : une écriture perdue ne fige pas la page d'attente
+
+# Écrit le miroir seulement si `stamp` est plus récent que celui en place.
+# KEYS[1] : clé du miroir ; ARGV : user, status, updated_at, stamp, ttl.
+_MIRROR_CAS = """
+local current = redis.call('HGET', KEYS[1], 'stamp')
+if current and tonumber(current) >= tonumber(ARGV[4]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'user', ARGV[1], 'status', ARGV[2], 'updated_at', ARGV[3], 'stamp', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return 1
+"""
+
+_redis_down_until = 0.0
+
+
+def channel(dream_id) -> str:
+    return f"dream-status:{dream_id}"
+
+
+def event_payload(dream_id, status: str) -> dict:
+    payload = {"status": status}
+    if status in TERMINAL_STATUSES:
+        payload["status_url"] = reverse("dream_bridge_app:dream-status", kwargs={"dream_id": dream_id})
+    return payload
+
+
+def format_event(payload: dict) -> str:
+    return f"event: status\ndata: {json.dumps(payload)}\n\n"
+
+
+def mirror_key(dream_id) -> str:
+    return f"dream-status-mirror:{dream_id}"
+
+
+def status_etag(status: str, updated_at) -> str:
+    stamp = updated_at.isoformat() if hasattr(updated_at, "isoformat") else updated_at
+    return '"' + hashlib.sha1(f"{status}|{stamp}".encode()).hexdigest()[:16] + '"'
+
+
+def _redis_call(action, error_message: str):
+    """Exécute `action(client)` sauf pendant le repli ; None si Redis est injoignable."""
+    global _redis_down_until
+    if time.monotonic() < _redis_down_until:
+        return None
+    try:
+        return action(clients.get_redis_client())
+    except redis.RedisError as e:
+        stats.incr("status_events.redis_errors")
+        _redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+        logger.warning("%s (%s), le polling lit la base.", error_message, e)
+        return None
+
+
+def _mirror_args(user_id, status: str, updated_at) -> list:
+    """ARGV de _MIRROR_CAS : user, status, updated_at (ISO), stamp (secondes), ttl."""
+    if hasattr(updated_at, "isoformat"):
+        iso, stamp = updated_at.isoformat(), updated_at.timestamp()
+    else:
+        iso, stamp = str(updated_at or ""), 0
+    ttl = MIRROR_SECONDS if status in TERMINAL_STATUSES else PENDING_MIRROR_SECONDS
+    return [str(user_id), status, iso, repr(float(stamp)), ttl]
+
+
+def _write_mirror(client, dream_id, user_id, status: str, updated_at) -> None:
+    """Ajoute l'écriture conditionnelle du miroir à `client` (client ou pipeline)."""
+    script = clients.get_redis_client().register_script(_MIRROR_CAS)
+    script(keys=[mirror_key(dream_id)], args=_mirror_args(user_id, status, updated_at), client=client)
+
+
+def _drop_mirror(dream_id) -> None:
+    """Après une publication manquée : supprime le miroir plutôt que de garder l'ancien statut."""
+    try:
+        clients.get_redis_client().delete(mirror_key(dream_id))
+    except redis.RedisError:
+        pass  # Redis toujours absent : un statut non final expire de lui-même
+
+
+def publish_status(dream_id, status: str, user_id=None, updated_at=None) -> bool:
+    """
+    Met à jour le miroir et publie le changement de statut en un aller-retour
+    (best effort : sans Redis, le polling prend le relais).
+    """
+    def write(client):
+        pipe = client.pipeline(transaction=False)
+        if user_id is not None:
+            _write_mirror(pipe, dream_id, user_id, status, updated_at)
+        pipe.publish(channel(dream_id), json.dumps(event_payload(dream_id, status)))
+        pipe.execute()
+        return True
+
+    was_down = time.monotonic() < _redis_down_until
+    if _redis_call(write, f"Statut du rêve {dream_id} non publié"):
+        stats.incr("status_events.published")
+        return True
+    if not was_down:
+        _drop_mirror(dream_id)
+    return False
+
+
+def mirror_status(dream_id, user_id, status: str, updated_at) -> None:
+    """
+    Remplit le miroir après une lecture en base (miroir expiré ou perdu) ;
+    sans effet si une publication plus récente l'a déjà écrit.
+    """
+    _redis_call(lambda client: _write_mirror(client, dream_id, user_id, status, updated_at),
+                f"Miroir du rêve {dream_id} non écrit")
+
+
+def forget_status(dream_id) -> None:
+    _redis_call(lambda client: client.delete(mirror_key(dream_id)), f"Miroir du rêve {dream_id} non supprimé")
+
+
+def read_mirror(dream_id):
+    """{"user", "status", "updated_at"} depuis Redis, ou None (absent, Redis indisponible)."""
+    fields = _redis_call(lambda client: client.hgetall(mirror_key(dream_id)), "Miroir des statuts illisible")
+    if not fields:
+        stats.incr("status_events.mirror_misses")
+        return None
+    stats.incr("status_events.mirror_hits")
+    return {key.decode(): value.decode() for key, value in fields.items()}
+
+
+async def subscribe(dream_id):
+    """Client Redis asynchrone abonné au canal du rêve ; lève redis.RedisError si Redis est absent."""
+    client = aioredis.from_url(settings.DREAM_REDIS_URL, socket_connect_timeout=settings.DREAM_REDIS_TIMEOUT)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(channel(dream_id))
+    except BaseException:
+        await pubsub.aclose()
+        await client.aclose()
+        raise
+    return client, pubsub
+
+
+async def stream_events(dream_id, current_status: str, client=None, pubsub=None, timeout: float = None):
+    """
+    Corps du flux SSE : le statut courant, puis chaque transition publiée,
+    jusqu'à un statut final ou `timeout` secondes (le navigateur se reconnecte).
+    Un commentaire est envoyé toutes les KEEPALIVE_SECONDS pour garder la
+    connexion. Sans abonnement (statut déjà final), seul le statut courant part.
+    """
+    timeout = timeout or settings.DREAM_STATUS_STREAM_TIMEOUT
+    deadline = time.monotonic() + timeout
+    stats.incr("status_events.streams")
+    try:
+        yield "retry: 3000\n\n"
+        yield format_event(event_payload(dream_id, current_status))
+        if current_status in TERMINAL_STATUSES or pubsub is None:
+            return
+        while time.monotonic() < deadline:
+            wait = min(KEEPALIVE_SECONDS, deadline - time.monotonic())
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=wait)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.loads(message["data"])
+            yield format_event(payload)
+            if payload.get("status") in TERMINAL_STATUSES:
+                return
+    finally:
+        if pubsub is not None:
+            await pubsub.aclose()
+            await client.aclose()
@@ -1,19 +1,166 @@
-import os
-from celery import shared_task
-from .services import orchestrate_dream_generation
+from celery import Task, chain, group, shared_task
+from celery.signals import worker_process_init
+from django.conf import settings
 
-# bind=True permet d'accéder à l'instance de la tâche (self)
-@shared_task
-def process_dream_audio_task(dream_id: str, temp_audio_path: str):
+from . import clients, image_derivatives
+from .async_pipeline import get_executor
+from .models import Dream
+from .services import (
+    STAGE_EMOTION,
+    STAGE_IMAGE,
+    STAGE_IMAGE_PROMPT,
+    STAGE_PERSONAL_MESSAGE,
+    STAGE_TRANSCRIPTION,
+    complete_dream,
+    generate_personal_message_for_dream,
+    mark_dream_failed,
+    refresh_daily_messages,
+    run_emotion_stage,
+    run_image_prompt_stage,
+    run_image_stage,
+    run_personal_message_stage,
+    run_transcription_stage,
+)
+
+
+@worker_process_init.connect
+def warm_up_provider_clients(**kwargs):
+    """Chaque processus enfant crée ses propres clients (et pools) dès le fork."""
+    clients.reset_clients()
+    clients.warm_up()
+
+
+class DreamStageTask(Task):
+    """
+    Base des tâches d'étape : réessaie avec backoff, puis marque le rêve
+    en FAILED (avec l'étape fautive) une fois les essais épuisés.
+    Les artefacts des étapes précédentes restent en base : un nouvel essai
+    reprend là où le pipeline s'est arrêté.
+    """
+    autoretry_for = (Exception,)
+    max_retries = 3
+    retry_backoff = True
+    retry_backoff_max = 60
+    retry_jitter = True
+    stage = ""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        mark_dream_failed(args[0], self.stage, exc)
+
+
+@shared_task(base=DreamStageTask, stage=STAGE_TRANSCRIPTION)
+def transcribe_dream_task(dream_id: str):
+    run_transcription_stage(dream_id)
+
+
+@shared_task(base=DreamStageTask, stage=STAGE_EMOTION)
+def detect_dream_emotion_task(dream_id: str):
+    run_emotion_stage(dream_id)
+
+
+@shared_task(base=DreamStageTask, stage=STAGE_IMAGE_PROMPT)
+def generate_image_prompt_task(dream_id: str):
+    run_image_prompt_stage(dream_id)
+
+
+@shared_task(base=DreamStageTask, stage=STAGE_IMAGE)
+def generate_dream_image_task(dream_id: str):
+    run_image_stage(dream_id)
+
+
+@shared_task(base=DreamStageTask, stage=STAGE_PERSONAL_MESSAGE, max_retries=0)
+def generate_personal_message_task(dream_id: str):
+    """Callback du chord : n'arrive qu'après le succès des deux branches."""
+    run_personal_message_stage(dream_id)
+    complete_dream(dream_id)
+
+
+def build_dream_pipeline(dream_id: str):
+    """
+    transcription → (émotion ‖ prompt → image) → message personnalisé.
+    Le groupe suivi d'une tâche devient un chord : le message attend
+    l'émotion ET l'image, et c'est lui qui passe le rêve en COMPLETED.
+    """
+    return chain(
+        transcribe_dream_task.si(dream_id),
+        group(
+            detect_dream_emotion_task.si(dream_id),
+            chain(
+                generate_image_prompt_task.si(dream_id),
+                generate_dream_image_task.si(dream_id),
+            ),
+        ),
+        generate_personal_message_task.si(dream_id),
+    )
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=30)
+def generate_image_derivatives_task(self, dream_id: str):
     """
-    Celery task that receives a temporary file path for processing.
-    It ensures the temporary file is deleted after execution.
+    Miniatures AVIF/WebP et placeholder flou de l'image d'un rêve. Routée
+    sur la file DREAM_IMAGE_QUEUE si elle est configurée (worker prefork
+    dédié) : l'encodage ne bloque alors pas le pipeline.
     """
     try:
-        print(f"Processing dream {dream_id} from temp file: {temp_audio_path}")
-        orchestrate_dream_generation(dream_id, temp_audio_path)
-    finally:
-        
-        if os.path.exists(temp_audio_path):
-            os.remove(temp_audio_path)
-            print(f"Deleted temporary file: {temp_audio_path}")
\ No newline at end of file
+        image_derivatives.build_derivatives(dream_id)
+    except Dream.DoesNotExist:
+        return
+    except Exception as e:
+        raise self.retry(exc=e)
+
+
+@shared_task
+def process_dream_audio_task(dream_id: str, temp_audio_path: str = ""):
+    """
+    Point d'entrée : lance le pipeline par étapes pour un rêve.
+    La clé du blob audio est déjà enregistrée dans Dream.audio_ref par la
+    vue ; l'argument (ancien chemin local) reste accepté pour les messages
+    déjà en file.
+    """
+    if temp_audio_path:
+        Dream.objects.filter(id=dream_id, audio_ref="").update(audio_ref=temp_audio_path)
+    print(f"Processing dream {dream_id}")
+    if settings.DREAM_PIPELINE_MODE == "async":
+        process_dream_async_task.delay(dream_id)
+    else:
+        build_dream_pipeline(dream_id).apply_async()
+
+
+@shared_task
+def process_dream_async_task(dream_id: str):
+    """
+    Mode asynchrone : confie le rêve à la boucle asyncio du processus et
+    attend sa fin. À lancer sur un pool de threads (file 'dreams_async')
+    pour que chaque processus fasse avancer des dizaines de rêves.
+    """
+    get_executor().submit(dream_id).result()
+
+
+@shared_task
+def resume_dream_pipeline_task(dream_id: str):
+    """Relance un rêve en échec : les étapes déjà faites sont sautées."""
+    dream = Dream.objects.get(id=dream_id)
+    dream.status = Dream.DreamStatus.PROCESSING
+    dream.failed_stage = ""
+    dream.error_message = ""
+    dream.save(update_fields=["status", "failed_stage", "error_message", "updated_at"])
+    build_dream_pipeline(dream_id).apply_async()
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def refresh_daily_messages_task(self):
+    """
+    Tâche beat (00:05, Europe/Paris) : horoscopes des 12 signes et citation
+    du jour, traduits en un lot. Réessaie tant qu'un élément manque.
+    """
+    report = refresh_daily_messages()
+    failed = {key: status for key, status in report.items() if status != "ok"}
+    if failed and self.request.retries < self.max_retries:
+        raise self.retry(exc=RuntimeError(f"Messages du jour manquants : {failed}"))
+    return report
+
+
+@shared_task
+def refresh_personal_message_task(dream_id: str):
+    """Régénère le message personnalisé d'un rêve s'il n'est plus du jour."""
+    generate_personal_message_for_dream(dream_id, force=False)
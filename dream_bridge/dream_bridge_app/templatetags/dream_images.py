@@ -0,0 +1,49 @@
+"""
+Balises d'affichage des images de rêves (dérivés de image_derivatives.py).
+
+    {% load dream_images %}
+    {% dream_picture dream sizes="(min-width: 992px) 25vw, 50vw" css_class="card-img-top" %}
+    <img srcset="{{ dream|image_srcset:'webp' }}" ...>
+
+Sans dérivés (pas encore encodés), on retombe sur l'image originale.
+"""
+from django import template
+from django.core.files.storage import default_storage
+
+from ..image_derivatives import MIME_TYPES
+
+register = template.Library()
+
+
+def _sources(dream) -> dict:
+    return ((dream.image_derivatives or {}).get("sources") or {}) if dream else {}
+
+
+@register.filter
+def image_srcset(dream, fmt: str = "webp") -> str:
+    """Valeur d'attribut srcset ("url 320w, url 640w") pour un format."""
+    storage = dream.generated_image.storage if dream and dream.generated_image else default_storage
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in _sources(dream).get(fmt, []))
+
+
+@register.filter
+def image_placeholder(dream) -> str:
+    """Data URI du placeholder flou, ou chaîne vide."""
+    return (dream.image_derivatives or {}).get("placeholder", "") if dream else ""
+
+
+@register.inclusion_tag("dream_bridge_app/includes/dream_picture.html")
+def dream_picture(dream, sizes: str = "100vw", css_class: str = "", alt: str = "Image générée"):
+    """<picture> avec une <source> par format (AVIF avant WebP) et l'original en repli."""
+    sources = [
+        {"type": MIME_TYPES.get(fmt, f"image/{fmt}"), "srcset": image_srcset(dream, fmt)}
+        for fmt in _sources(dream)
+    ]
+    return {
+        "dream": dream,
+        "sources": [source for source in sources if source["srcset"]],
+        "placeholder": image_placeholder(dream),
+        "sizes": sizes,
+        "css_class": css_class,
+        "alt": alt,
+    }
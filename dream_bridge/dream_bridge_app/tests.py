@@ -1,24 +1,49 @@
 # dream_bridge/dream_bridge_app/tests.py
 
-from django.test import TestCase, Client
+import atexit
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from django.core.files.uploadedfile import SimpleUploadedFile
 from unittest.mock import patch
-from datetime import timedelta
+from datetime import date, timedelta
 from unittest.mock import patch, MagicMock
 from django.utils import timezone
 
 from .services import *
 
-from .models import Dream
-from .metrics_dashboard import total_dreams, emotion_distribution
+from .clients import client_pool_stats, get_groq_client, get_mistral_client, reset_clients
+from .providers import ProviderError, SimulatedBackend, get_provider, reset_providers
+from . import blobstore
+from .models import AudioBlob, Dream, TranscriptionCache, Translation
+from .metrics_dashboard import total_dreams, report_metrics
 
 # ---
 # Catégorie 1 : Tests Unitaires sur la Logique Métier
 # On teste ici des fonctions pures, sans interaction avec les vues ou le web.
 # ---
 
+# Pas de Redis en test : le cache partagé des rapports devient un cache local.
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'reports': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'reports'},
+}
+
+# Images écrites par les tests du pipeline et des vues : hors du dépôt, supprimées en fin de run.
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='dream-bridge-test-media-')
+atexit.register(shutil.rmtree, TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(CACHES=LOCAL_CACHES)
 class MetricsDashboardLogicTest(TestCase):
     """
     Teste les fonctions de calcul du tableau de bord de manière isolée.
@@ -29,6 +54,12 @@ class MetricsDashboardLogicTest(TestCase):
         On crée un utilisateur et plusieurs rêves avec des caractéristiques
         différentes pour pouvoir tester nos calculs.
         """
+        from django.core.cache import caches
+        from . import report_cache
+
+        cache.clear()
+        caches['reports'].clear()  # rapports en cache d'un test précédent (mêmes ids utilisateur)
+        report_cache.reset()
         self.user = User.objects.create_user(username='testmetrics', password='password')
         now = timezone.now()
 
@@ -73,11 +104,250 @@ class MetricsDashboardLogicTest(TestCase):
         self.assertAlmostEqual(emotions.count('peur') / len(emotions), 1/3)
 
 
+    def test_report_metrics_from_one_query(self):
+        """Les quatre métriques en une requête sur l'agrégat, quel que soit le nombre de rêves."""
+        with self.assertNumQueries(1):
+            metrics = report_metrics(self.user, period="all")
+        self.assertEqual(metrics["total_dreams"], 4)
+        self.assertEqual(metrics["emotion_distribution"], {'joie': 0.75, 'peur': 0.25})
+
+        for _ in range(40):
+            Dream.objects.create(user=self.user, emotion='surprise', transcription="x" * 10)
+        with self.assertNumQueries(1):
+            metrics = report_metrics(self.user, period="7d")
+        self.assertEqual(metrics["total_dreams"], 44)
+        self.assertEqual(metrics["dream_frequency"], round(1 / 7 * 100, 2))
+        # Tous créés aujourd'hui : 40 récits de 10 caractères et 4 vides.
+        self.assertEqual(metrics["transcription_trend"],
+                         [{"date": str(timezone.localdate()), "avg_length": round(400 / 44, 2)}])
+
+    def test_report_view_query_count_is_constant(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.login(username='testmetrics', password='password')
+        url = reverse('dream_bridge_app:dashboard')
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(50):
+                Dream.objects.create(user=self.user, emotion='joie')
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(few), len(many))
+
+    def test_daily_stat_follows_dream_changes(self):
+        from .models import DreamDailyStat
+        from .rollups import rebuild
+
+        today = timezone.localdate()
+        dream = Dream.objects.create(user=self.user, emotion='peur', transcription="abcd")
+        stat = DreamDailyStat.objects.get(user=self.user, day=today, emotion='peur')
+        self.assertEqual((stat.dreams, stat.transcription_length, stat.completed), (2, 4, 1))
+
+        dream.status = Dream.DreamStatus.FAILED
+        dream.emotion = 'colère'
+        dream.save(update_fields=['status', 'emotion'])
+        stat = DreamDailyStat.objects.get(user=self.user, day=today, emotion='colère')
+        self.assertEqual((stat.dreams, stat.failed), (1, 1))
+        self.assertEqual(DreamDailyStat.objects.get(user=self.user, day=today, emotion='peur').dreams, 1)
+
+        dream.delete()
+        self.assertFalse(DreamDailyStat.objects.filter(user=self.user, emotion='colère').exists())
+
+        # Écriture en masse (sans signaux) : rattrapée par la reconstruction.
+        Dream.objects.bulk_create([Dream(user=self.user, emotion='joie') for _ in range(3)])
+        before = report_metrics(self.user)["total_dreams"]
+        rebuild(self.user)
+        self.assertEqual(report_metrics(self.user)["total_dreams"], before + 3)
+
+    def test_report_is_cached_until_a_dream_changes(self):
+        self.client.login(username='testmetrics', password='password')
+        url = reverse('dream_bridge_app:dashboard')
+        self.assertEqual(self.client.get(url, {'period': 'all'}).context['total_dreams'], 4)
+
+        with patch('dream_bridge_app.views.report_metrics') as mock_metrics:
+            response = self.client.get(url, {'period': 'all'})
+        mock_metrics.assert_not_called()
+        self.assertEqual(response.context['total_dreams'], 4)
+
+        # Autre onglet : entrée distincte.
+        self.assertEqual(self.client.get(url, {'period': 'all', 'emotion': 'peur'}).context['total_dreams'], 1)
+
+        dream = Dream.objects.filter(user=self.user, emotion='joie').first()
+        dream.emotion = 'peur'
+        with self.captureOnCommitCallbacks(execute=True):
+            dream.save(update_fields=['emotion'])
+        self.assertEqual(self.client.get(url, {'period': 'all', 'emotion': 'peur'}).context['total_dreams'], 2)
+
+        # Un changement sans effet sur les métriques ne vide pas le cache.
+        self.client.get(url, {'period': 'all'})
+        dream.image_prompt = "Nouveau prompt"
+        with self.captureOnCommitCallbacks(execute=True):
+            dream.save(update_fields=['image_prompt'])
+        with patch('dream_bridge_app.views.report_metrics') as mock_metrics:
+            self.client.get(url, {'period': 'all'})
+        mock_metrics.assert_not_called()
+
+    def test_generation_is_bumped_only_after_commit(self):
+        from . import report_cache
+
+        before = report_cache.generation(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Dream.objects.create(user=self.user, emotion='joie')
+            # Un rapport calculé ici (données non validées) ne doit pas prendre la nouvelle génération.
+            self.assertEqual(report_cache.generation(self.user.pk), before)
+        self.assertGreater(report_cache.generation(self.user.pk), before)
+
+    def test_generation_bump_in_another_process_invalidates_reports(self):
+        import multiprocessing
+        import shutil
+        from . import report_cache
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        shared = dict(LOCAL_CACHES, reports={
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        })
+        self.client.login(username='testmetrics', password='password')
+        url = reverse('dream_bridge_app:dashboard')
+
+        with override_settings(CACHES=shared):
+            self.client.get(url, {'period': 'all'})
+            # Un autre processus (worker Celery) modifie un rêve de l'utilisateur.
+            worker = multiprocessing.get_context('fork').Process(
+                target=report_cache.bump_generation, args=(self.user.pk,)
+            )
+            worker.start()
+            worker.join()
+            self.assertEqual(worker.exitcode, 0)
+
+            with patch('dream_bridge_app.views.report_metrics', wraps=report_metrics) as mock_metrics:
+                self.client.get(url, {'period': 'all'})
+        mock_metrics.assert_called_once()
+
+    @patch('dream_bridge_app.views.report_metrics', wraps=report_metrics)
+    def test_unreachable_report_cache_computes_without_caching(self, mock_metrics):
+        from . import report_cache
+
+        self.client.login(username='testmetrics', password='password')
+        url = reverse('dream_bridge_app:dashboard')
+        with patch.object(report_cache, 'generation', side_effect=redis.ConnectionError("down")):
+            self.assertEqual(self.client.get(url, {'period': 'all'}).context['total_dreams'], 4)
+            self.assertEqual(self.client.get(url, {'period': 'all'}).context['total_dreams'], 4)
+        self.assertEqual(mock_metrics.call_count, 2)
+        report_cache.reset()
+
+
+class DreamAnalyticsTest(TestCase):
+    """Séries, moyennes glissantes et transitions calculées avec NumPy."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analytics', password='password')
+        self.today = timezone.localdate()
+        # Jours (en arrière) et émotions : série de 3 jours il y a 10 jours, série de 2 en cours.
+        for days_ago, emotion, text in [(12, 'peur', 'aa'), (11, 'peur', 'aaaa'), (10, 'joie', 'a'),
+                                        (1, 'joie', 'aaaaaa'), (0, 'peur', 'aaaa')]:
+            dream = Dream.objects.create(user=self.user, emotion=emotion, transcription=text)
+            Dream.objects.filter(pk=dream.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        # update() contourne les signaux : l'agrégat quotidien est reconstruit.
+        from .rollups import rebuild
+        rebuild(self.user)
+
+    def test_history_is_loaded_in_two_queries(self):
+        from .analytics import EMOTION_CODES, DreamHistory
+
+        with self.assertNumQueries(2):
+            history = DreamHistory.load(self.user)
+        self.assertEqual(len(history), 5)
+        self.assertEqual(history.counts.tolist(), [1, 1, 1, 1, 1])
+        self.assertEqual(history.length_sums.tolist(), [2, 4, 1, 6, 4])
+        peur, joie = EMOTION_CODES.index('peur'), EMOTION_CODES.index('joie')
+        self.assertEqual(history.emotions.tolist(), [peur, peur, joie, joie, peur])
+
+    def test_unknown_emotions_are_ignored(self):
+        from .analytics import EMOTION_CODES, _encode_emotions
+
+        self.assertEqual(_encode_emotions(['', 'inconnue', 'joie']).tolist(), [-1, -1, EMOTION_CODES.index('joie')])
+
+    @override_settings(CACHES=LOCAL_CACHES)
+    def test_dashboard_loads_history_once_across_periods(self):
+        from django.core.cache import caches
+        from . import report_cache
+        from .analytics import dream_analytics
+
+        caches['reports'].clear()
+        report_cache.reset()
+        self.client.force_login(self.user)
+        with patch('dream_bridge_app.views.dream_analytics', wraps=dream_analytics) as mock_analytics:
+            for period in ('7d', 'all', '3d'):
+                response = self.client.get(reverse('dream_bridge_app:dashboard'), {'period': period})
+                self.assertEqual(response.status_code, 200)
+        mock_analytics.assert_called_once()
+
+    def test_streaks_rolling_and_transitions(self):
+        from .analytics import EMOTION_CODES, dream_analytics
+
+        analytics = dream_analytics(self.user, today=self.today)
+        self.assertEqual(analytics['streaks'], {'longest': 3, 'current': 2})
+
+        self.assertEqual(analytics['rolling']['7d']['dreams_per_day'], round(2 / 7, 3))
+        self.assertEqual(analytics['rolling']['7d']['avg_length'], 5.0)
+        self.assertEqual(analytics['rolling']['30d']['dreams_per_day'], round(5 / 30, 3))
+        self.assertEqual(len(analytics['rolling']['7d']['series']), 13)
+
+        peur, joie = EMOTION_CODES.index('peur'), EMOTION_CODES.index('joie')
+        counts = analytics['transitions']['counts']
+        self.assertEqual((counts[peur][peur], counts[peur][joie], counts[joie][joie], counts[joie][peur]), (1, 1, 1, 1))
+        self.assertEqual(analytics['transitions']['probabilities'][peur][joie], 0.5)
+
+    def test_empty_history(self):
+        from .analytics import dream_analytics
+
+        other = User.objects.create_user(username='analytics-empty', password='password')
+        analytics = dream_analytics(other)
+        self.assertEqual(analytics['streaks'], {'longest': 0, 'current': 0})
+        self.assertEqual(analytics['transitions']['rows'], [])
+
 # ---
 # Catégorie 2 : Tests d'Intégration sur les Vues
 # On teste ici le comportement complet d'une page, de la requête à la réponse.
 # ---
 
+@override_settings(CACHES=LOCAL_CACHES)
+class ViewBenchmarkTest(TestCase):
+    """Budgets de requêtes des vues et métriques (bench_views) sur un petit historique semé."""
+    def setUp(self):
+        from . import report_cache
+
+        cache.clear()
+        report_cache.reset()
+
+    @patch('dream_bridge_app.status_events.read_mirror', return_value=None)
+    @patch('dream_bridge_app.tasks.refresh_personal_message_task.delay')
+    def test_every_case_stays_within_query_budget(self, mock_delay, mock_mirror):
+        from . import view_benchmarks
+
+        user = view_benchmarks.seed(users=1, dreams_per_user=60, days=30)[0]
+        results = {name: view_benchmarks.measure(prepare, call, repeat=1)
+                   for name, prepare, call in view_benchmarks.cases(user)}
+
+        self.assertEqual(set(results), set(view_benchmarks.QUERY_BUDGETS))
+        self.assertEqual(view_benchmarks.over_budget(results), [])
+        self.assertEqual(Dream.objects.filter(user=user).count(), 60)
+
+    def test_compare_flags_extra_queries_and_slower_p95(self):
+        from .view_benchmarks import compare
+
+        baseline = {"view:galerie": {"p50_ms": 10.0, "p95_ms": 20.0, "queries": 4}}
+        _, regressions = compare({"view:galerie": {"p50_ms": 10.0, "p95_ms": 21.0, "queries": 4}}, baseline, 0.25)
+        self.assertEqual(regressions, [])
+
+        _, regressions = compare({"view:galerie": {"p50_ms": 30.0, "p95_ms": 40.0, "queries": 5}}, baseline, 0.25)
+        self.assertEqual(len(regressions), 2)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
 class DreamAppViewsTest(TestCase):
     """
     Teste les vues principales de l'application (dashboard, galerie, etc.).
@@ -130,11 +400,68 @@ class DreamAppViewsTest(TestCase):
         self.assertEqual(len(response.context['images']), 1)
         self.assertEqual(response.context['images'][0].emotion, 'joie')
 
+class GalleryKeysetTest(TestCase):
+    """Galerie limitée à l'utilisateur, paginée par curseur (created_at, id)."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='gallery', password='password')
+        self.client.login(username='gallery', password='password')
+        other = User.objects.create_user(username='gallery-other', password='password')
+        Dream.objects.create(user=other, status='COMPLETED', generated_image='dreams/images/other.gif')
+
+        # Cinq rêves, dont trois à la même seconde : le départage se fait sur l'id.
+        now = timezone.now()
+        self.dreams = []
+        for i, offset in enumerate([0, 0, 0, 1, 2]):
+            dream = Dream.objects.create(user=self.user, status='COMPLETED', emotion='joie' if i % 2 else 'peur',
+                                         generated_image=f'dreams/images/{i}.gif')
+            Dream.objects.filter(pk=dream.pk).update(created_at=now - timedelta(minutes=offset))
+            self.dreams.append(dream)
+
+    @override_settings(DREAM_GALLERY_PAGE_SIZE=2)
+    def test_pages_cover_every_dream_once_in_order(self):
+        seen, cursor = [], None
+        url = reverse('dream_bridge_app:galerie-page-api')
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [item['id'] for item in page['results']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        expected = [str(d.id) for d in Dream.objects.filter(user=self.user).order_by('-created_at', '-id')]
+        self.assertEqual(seen, expected)
+
+    @override_settings(DREAM_GALLERY_PAGE_SIZE=2)
+    def test_first_page_is_scoped_to_user(self):
+        response = self.client.get(reverse('dream_bridge_app:galerie'))
+        self.assertEqual(len(response.context['images']), 2)
+        self.assertIsNotNone(response.context['next_cursor'])
+        self.assertTrue(all(d.user_id == self.user.id for d in response.context['images']))
+
+    def test_emotion_filter_and_invalid_cursor(self):
+        url = reverse('dream_bridge_app:galerie-page-api')
+        page = self.client.get(url, {'emotion': 'joie'}).json()
+        self.assertEqual(len(page['results']), 2)
+        self.assertTrue(all(item['emotion'] == 'joie' for item in page['results']))
+        self.assertIsNone(page['next_cursor'])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'pas-un-curseur'}).status_code, 400)
+
+
 # Le test d'intégration pour la vue 'narrate' reste pertinent.
 # On le garde et on s'assure qu'il est dans la même classe ou une classe dédiée.
 
 class DreamCreateViewIntegrationTest(TestCase):
     def setUp(self):
+        blob_root = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_root.cleanup)
+        blob_settings = self.settings(DREAM_BLOB_ROOT=blob_root.name)
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
         self.client = Client()
         self.password = 'a-strong-password'
         self.user = User.objects.create_user(username='testuser', password=self.password)
@@ -150,6 +477,10 @@ class DreamCreateViewIntegrationTest(TestCase):
         self.assertEqual(Dream.objects.count(), 1)
         dream = Dream.objects.first()
         self.assertEqual(dream.user, self.user)
+        # La tâche ne reçoit que l'id ; l'audio est dans le blob store, sous son SHA-256.
+        self.assertEqual(dream.audio_ref, hashlib.sha256(fake_audio_content).hexdigest())
+        with open(blobstore.blob_path(dream.audio_ref), 'rb') as f:
+            self.assertEqual(f.read(), fake_audio_content)
         
         mock_celery_task_delay.assert_called_once()
         
@@ -157,6 +488,241 @@ class DreamCreateViewIntegrationTest(TestCase):
         expected_redirect_url = reverse('dream_bridge_app:dream-status', kwargs={'dream_id': dream.id})
         self.assertRedirects(response, expected_redirect_url)
 
+
+class DreamStatusFreshnessTest(TestCase):
+    """La page d'un rêve sert le message enregistré ; Celery le rafraîchit s'il a vieilli."""
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.user = User.objects.create_user(username='testfresh', password='password')
+        self.client.force_login(self.user)
+
+    def _completed_dream(self, phrase_date):
+        dream = Dream.objects.create(
+            user=self.user, status=Dream.DreamStatus.COMPLETED,
+            personal_phrase="Message d'hier.", personal_phrase_date=phrase_date,
+        )
+        return dream, reverse('dream_bridge_app:dream-status', kwargs={'dream_id': dream.id})
+
+    @patch('dream_bridge_app.tasks.refresh_personal_message_task.delay')
+    @patch('dream_bridge_app.views.generate_personal_message_for_dream')
+    def test_fresh_message_is_served_as_is(self, mock_generate, mock_delay):
+        _, url = self._completed_dream(timezone.localdate())
+
+        response = self.client.get(url)
+
+        self.assertContains(response, "Message d&#x27;hier.")
+        mock_generate.assert_not_called()
+        mock_delay.assert_not_called()
+
+    @patch('dream_bridge_app.tasks.refresh_personal_message_task.delay')
+    @patch('dream_bridge_app.views.generate_personal_message_for_dream')
+    def test_stale_message_is_served_and_refreshed_once_in_background(self, mock_generate, mock_delay):
+        dream, url = self._completed_dream(timezone.localdate() - timedelta(days=1))
+
+        self.assertContains(self.client.get(url), "Message d&#x27;hier.")
+        self.client.get(url)
+
+        mock_generate.assert_not_called()
+        mock_delay.assert_called_once_with(str(dream.id))
+
+
+@override_settings(DREAM_STATUS_STREAM_ENABLED=True)
+class DreamStatusStreamTest(TestCase):
+    """Flux SSE du statut : propriétaire seulement, repli 503 sans Redis, publication après commit."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='teststream', password='password')
+        self.other = User.objects.create_user(username='otherstream', password='password')
+
+    def _url(self, dream):
+        return reverse('dream_bridge_app:dream-status-stream', kwargs={'dream_id': dream.id})
+
+    async def _read(self, response):
+        return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+    async def test_other_user_dream_is_not_found(self):
+        dream = await Dream.objects.acreate(user=self.other, status=Dream.DreamStatus.PENDING)
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self._url(dream))
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_terminal_dream_streams_current_status_and_ends(self):
+        dream = await Dream.objects.acreate(user=self.user, status=Dream.DreamStatus.COMPLETED)
+        await self.async_client.aforce_login(self.user)
+
+        with patch('dream_bridge_app.status_events.subscribe') as mock_subscribe:
+            response = await self.async_client.get(self._url(dream))
+            body = await self._read(response)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: status\ndata: {"status": "COMPLETED"', body)
+        mock_subscribe.assert_not_called()
+
+    async def test_redis_unavailable_returns_503_for_polling_fallback(self):
+        dream = await Dream.objects.acreate(user=self.user, status=Dream.DreamStatus.PENDING)
+        await self.async_client.aforce_login(self.user)
+
+        with patch('dream_bridge_app.status_events.subscribe', side_effect=redis.ConnectionError("down")):
+            response = await self.async_client.get(self._url(dream))
+
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(DREAM_STATUS_STREAM_ENABLED=False)
+    async def test_disabled_stream_returns_503_for_polling_fallback(self):
+        dream = await Dream.objects.acreate(user=self.user, status=Dream.DreamStatus.PENDING)
+        await self.async_client.aforce_login(self.user)
+
+        with patch('dream_bridge_app.status_events.subscribe') as mock_subscribe:
+            response = await self.async_client.get(self._url(dream))
+
+        self.assertEqual(response.status_code, 503)
+        mock_subscribe.assert_not_called()
+
+    def test_waiting_page_offers_stream_only_when_enabled(self):
+        dream = Dream.objects.create(user=self.user, status=Dream.DreamStatus.PROCESSING)
+        self.client.force_login(self.user)
+        page = reverse('dream_bridge_app:dream-status', kwargs={'dream_id': dream.id})
+
+        self.assertContains(self.client.get(page), 'data-stream-url=')
+        with self.settings(DREAM_STATUS_STREAM_ENABLED=False):
+            response = self.client.get(page)
+        self.assertNotContains(response, 'data-stream-url=')
+        self.assertContains(response, 'data-check-url=')
+
+    @patch('dream_bridge_app.status_events.publish_status')
+    def test_status_change_is_published_after_commit(self, mock_publish):
+        dream = Dream.objects.create(user=self.user, status=Dream.DreamStatus.PENDING)
+        mock_publish.reset_mock()
+
+        dream.emotion = "joie"
+        with self.captureOnCommitCallbacks(execute=True):
+            dream.save(update_fields=["emotion"])
+        mock_publish.assert_not_called()
+
+        dream.status = Dream.DreamStatus.COMPLETED
+        with self.captureOnCommitCallbacks(execute=True):
+            dream.save(update_fields=["status"])
+        mock_publish.assert_called_once_with(
+            dream.pk, Dream.DreamStatus.COMPLETED, self.user.pk, dream.updated_at
+        )
+
+
+class DreamStatusMirrorTest(TestCase):
+    """check_dream_status_api : miroir Redis, ETag / 304, table Dream lue seulement sans miroir."""
+    def setUp(self):
+        self.user = User.objects.create_user(username='testmirror', password='password')
+        self.client.force_login(self.user)
+        self.dream = Dream.objects.create(user=self.user, status=Dream.DreamStatus.PROCESSING)
+        self.url = reverse('dream_bridge_app:check-dream-status-api', kwargs={'dream_id': self.dream.id})
+        self.mirror = {"user": str(self.user.pk), "status": "PROCESSING", "updated_at": "2026-01-01T00:00:00+00:00"}
+
+    def _dream_queries(self, queries):
+        return [q['sql'] for q in queries if 'dream_bridge_app_dream' in q['sql']]
+
+    @patch('dream_bridge_app.status_events.read_mirror')
+    def test_unchanged_poll_returns_304_without_reading_dreams(self, mock_read):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        mock_read.return_value = self.mirror
+        etag = self.client.get(self.url)['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self._dream_queries(ctx.captured_queries), [])
+
+    @patch('dream_bridge_app.status_events.read_mirror')
+    def test_status_change_changes_etag(self, mock_read):
+        mock_read.return_value = self.mirror
+        etag = self.client.get(self.url)['ETag']
+        mock_read.return_value = dict(self.mirror, status="COMPLETED")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], "COMPLETED")
+        self.assertIn('status_url', response.json())
+
+    @patch('dream_bridge_app.status_events.read_mirror')
+    def test_mirror_of_other_user_is_not_found(self, mock_read):
+        mock_read.return_value = dict(self.mirror, user=str(self.user.pk + 1))
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @patch('dream_bridge_app.status_events.read_mirror')
+    def test_session_invalidated_by_password_change_is_refused(self, mock_read):
+        mock_read.return_value = self.mirror
+        # Mot de passe changé ailleurs : l'empreinte de session ne correspond plus.
+        self.user.set_password('new-password')
+        self.user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+
+    @patch('dream_bridge_app.status_events.mirror_status')
+    @patch('dream_bridge_app.status_events.read_mirror', return_value=None)
+    def test_missing_mirror_reads_database_and_refills_it(self, mock_read, mock_mirror):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.json(), {'status': 'PROCESSING'})
+        self.assertTrue(response.has_header('ETag'))
+        mock_mirror.assert_called_once_with(
+            self.dream.id, self.user.pk, 'PROCESSING', self.dream.updated_at
+        )
+
+
+class StatusMirrorWriteTest(TestCase):
+    """Écritures du miroir : compare-and-set sur updated_at, TTL court hors statut final."""
+    def setUp(self):
+        from . import status_events
+
+        status_events._redis_down_until = 0.0
+        self.addCleanup(setattr, status_events, '_redis_down_until', 0.0)
+        self.client_mock = MagicMock()
+        patcher = patch('dream_bridge_app.clients.get_redis_client', return_value=self.client_mock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.updated_at = timezone.now()
+
+    def test_late_poll_write_is_conditional_and_short_lived(self):
+        from . import status_events
+
+        status_events.mirror_status("d1", 7, "PROCESSING", self.updated_at)
+
+        self.client_mock.register_script.assert_called_once_with(status_events._MIRROR_CAS)
+        script = self.client_mock.register_script.return_value
+        script.assert_called_once_with(
+            keys=["dream-status-mirror:d1"],
+            args=["7", "PROCESSING", self.updated_at.isoformat(), repr(self.updated_at.timestamp()),
+                  status_events.PENDING_MIRROR_SECONDS],
+            client=self.client_mock,
+        )
+        self.client_mock.hset.assert_not_called()
+
+    def test_terminal_status_keeps_the_long_ttl(self):
+        from . import status_events
+
+        self.assertEqual(status_events._mirror_args(7, "COMPLETED", self.updated_at)[-1],
+                         status_events.MIRROR_SECONDS)
+
+    def test_failed_publish_drops_the_mirror(self):
+        from . import status_events
+
+        self.client_mock.pipeline.return_value.execute.side_effect = redis.ConnectionError("blip")
+
+        self.assertFalse(status_events.publish_status("d1", "PROCESSING", 7, self.updated_at))
+        self.client_mock.delete.assert_called_once_with("dream-status-mirror:d1")
+
+
+@override_settings(DREAM_PROVIDER_BACKEND="real", MEDIA_ROOT=TEST_MEDIA_ROOT)
 class ServicesLogicTest(TestCase):
     """
     Teste la fonction d'orchestration `orchestrate_dream_generation` en simulant
@@ -165,13 +731,20 @@ class ServicesLogicTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testservices', password='password')
         self.dream = Dream.objects.create(user=self.user)
+        # Le registre garde les clients d'un test à l'autre : on repart de zéro
+        # pour que les mocks de Groq/Mistral soient bien ceux utilisés.
+        reset_clients()
+        self.addCleanup(reset_clients)
+        reset_providers()
+        self.addCleanup(reset_providers)
     
     # Le décorateur @patch intercepte les appels aux fonctions spécifiées
     # et les remplace par des "mocks" (simulateurs) que l'on peut contrôler.
-    @patch('dream_bridge_app.services.Mistral')
-    @patch('dream_bridge_app.services.Groq')
-    @patch('dream_bridge_app.services.get_emotion_from_text')
-    def test_orchestrate_dream_generation_success(self, mock_get_emotion, mock_groq, mock_mistral):
+    @patch('dream_bridge_app.services.schedule_image_derivatives')  # pas de broker en test
+    @patch('dream_bridge_app.clients.Mistral')
+    @patch('dream_bridge_app.clients.Groq')
+    @patch('dream_bridge_app.services.get_emotion_scores')
+    def test_orchestrate_dream_generation_success(self, mock_get_emotion, mock_groq, mock_mistral, mock_derivatives):
         """
         Teste le scénario idéal où toutes les API répondent correctement.
         
@@ -190,11 +763,18 @@ class ServicesLogicTest(TestCase):
         mock_groq.return_value.chat.completions.create.return_value.choices[0].message.content = "Un prompt d'image simulé."
         
         # Simuler la réponse de notre fonction d'analyse d'émotion
-        mock_get_emotion.return_value = 'joie'
+        mock_get_emotion.return_value = {'joie': 0.9, 'peur': 0.1}
         
         # Simuler la réponse de Mistral AI pour la génération d'image
-        mock_mistral.return_value.beta.agents.create.return_value = MagicMock()
+        # L'agent d'images est enregistré en base (ProviderAgent) : il lui faut un vrai identifiant.
+        mock_mistral.return_value.beta.agents.create.return_value.id = "agent-test"
+        # La conversation renvoie le fichier image généré par l'outil de l'agent.
+        from mistralai.models import ToolFileChunk
+        mock_mistral.return_value.beta.conversations.start.return_value.outputs = [
+            MagicMock(content=[ToolFileChunk(tool="image_generation", file_id="file-test")])
+        ]
         mock_mistral.return_value.files.download.return_value.read.return_value = b'fausses_donnees_image'
+        mock_mistral.return_value.files.download.return_value.iter_bytes.return_value = [b'fausses_donnees_image']
         
         # --- 2. Act (Action) ---
         # On appelle la fonction que l'on veut tester.
@@ -203,7 +783,6 @@ class ServicesLogicTest(TestCase):
         # --- 3. Assert (Vérification) ---
         # On recharge l'objet Dream depuis la base de données pour avoir ses dernières valeurs.
         self.dream.refresh_from_db()
-        
         self.assertEqual(self.dream.status, Dream.DreamStatus.COMPLETED)
         self.assertEqual(self.dream.transcription, "Ceci est une transcription simulée.")
         self.assertEqual(self.dream.image_prompt, "Un prompt d'image simulé.")
@@ -211,7 +790,7 @@ class ServicesLogicTest(TestCase):
         self.assertTrue(self.dream.generated_image.name.endswith('.png'))
         self.assertEqual(self.dream.error_message, "")
 
-    @patch('dream_bridge_app.services.Groq')
+    @patch('dream_bridge_app.clients.Groq')
     def test_orchestrate_dream_generation_api_failure(self, mock_groq):
         """
         Teste le scénario où une des API lève une exception.
@@ -230,6 +809,926 @@ class ServicesLogicTest(TestCase):
         self.assertIn("Erreur API simulée", self.dream.error_message)
 
 
+@override_settings(DREAM_PROVIDER_BACKEND="simulated", DREAM_SIMULATION_LATENCY_SCALE=0, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class DreamPipelineStagesTest(TestCase):
+    """
+    Teste le découpage en étapes : points de reprise et étape fautive.
+    (Le backend simulé fournit transcription, prompt et image.)
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='testpipeline', password='password')
+        reset_providers()
+        self.addCleanup(reset_providers)
+        # Les dérivés d'image partent dans leur propre tâche : pas de broker en test.
+        derivatives = patch('dream_bridge_app.services.schedule_image_derivatives')
+        self.schedule_derivatives = derivatives.start()
+        self.addCleanup(derivatives.stop)
+
+    @patch('dream_bridge_app.services.generate_personal_message_for_dream')
+    @patch('dream_bridge_app.services.get_emotion_scores')
+    def test_completed_stages_are_skipped_on_resume(self, mock_scores, mock_personal):
+        mock_scores.return_value = {'peur': 0.8, 'joie': 0.1}
+        dream = Dream.objects.create(
+            user=self.user, transcription="Déjà transcrit.", image_prompt="Déjà généré.",
+            status=Dream.DreamStatus.FAILED, failed_stage="emotion",
+        )
+
+        orchestrate_dream_generation(str(dream.id))
+
+        dream.refresh_from_db()
+        self.assertEqual(dream.status, Dream.DreamStatus.COMPLETED)
+        self.assertEqual(dream.transcription, "Déjà transcrit.")
+        self.assertEqual(dream.image_prompt, "Déjà généré.")
+        self.assertEqual(dream.emotion, 'peur')
+        self.assertEqual(dream.failed_stage, "")
+        mock_personal.assert_called_once()
+
+    @patch('dream_bridge_app.image_store.ImageWriter.commit', side_effect=Exception("Disque plein"))
+    @patch('dream_bridge_app.services.get_emotion_scores', return_value={'joie': 1.0})
+    def test_failure_keeps_earlier_artifacts(self, mock_scores, mock_commit):
+        dream = Dream.objects.create(user=self.user)
+
+        orchestrate_dream_generation(str(dream.id))
+
+        dream.refresh_from_db()
+        self.assertEqual(dream.status, Dream.DreamStatus.FAILED)
+        self.assertEqual(dream.failed_stage, STAGE_IMAGE)
+        self.assertIn("Disque plein", dream.error_message)
+        self.assertTrue(dream.transcription)
+        self.assertEqual(dream.emotion_scores, {'joie': 1.0})
+
+    @patch('dream_bridge_app.services.generate_personal_message_for_dream')
+    @patch('dream_bridge_app.services.get_emotion_scores', return_value={'surprise': 0.7})
+    def test_celery_pipeline_runs_all_stages(self, mock_scores, mock_personal):
+        from .tasks import build_dream_pipeline
+
+        dream = Dream.objects.create(user=self.user)
+        build_dream_pipeline(str(dream.id)).apply()
+
+        dream.refresh_from_db()
+        self.assertEqual(dream.status, Dream.DreamStatus.COMPLETED)
+        self.assertEqual(dream.emotion, 'surprise')
+        self.assertTrue(dream.generated_image.name.endswith('.png'))
+        self.assertEqual(dream.image_prompt_version, "context@builtin")
+        self.assertRegex(dream.emotion_prompt_version, r"^context_emotion@[0-9a-f]{8}$")
+        mock_personal.assert_called_once()
+
+
+    @patch('dream_bridge_app.services.generate_personal_message_for_dream')
+    def test_image_stage_leaves_the_dream_processing(self, mock_personal):
+        from .services import run_image_stage
+
+        dream = Dream.objects.create(user=self.user, status=Dream.DreamStatus.PROCESSING,
+                                     transcription="Texte.", image_prompt="Prompt.")
+        run_image_stage(str(dream.id))
+
+        dream.refresh_from_db()
+        self.assertTrue(dream.generated_image.name)
+        self.assertEqual(dream.status, Dream.DreamStatus.PROCESSING)
+
+    @patch('dream_bridge_app.services.generate_personal_message_for_dream')
+    @patch('dream_bridge_app.services.get_emotion_scores', side_effect=Exception("Mistral HS"))
+    def test_celery_emotion_failure_never_shows_completed(self, mock_scores, mock_personal):
+        from .tasks import build_dream_pipeline
+
+        dream = Dream.objects.create(user=self.user)
+        statuses = []
+        with patch('dream_bridge_app.status_events.publish_status',
+                   side_effect=lambda dream_id, status, *args: statuses.append(status)), \
+                self.captureOnCommitCallbacks(execute=True):
+            try:
+                build_dream_pipeline(str(dream.id)).apply()
+            except Exception:
+                pass
+
+        dream.refresh_from_db()
+        self.assertEqual(dream.status, Dream.DreamStatus.FAILED)
+        self.assertEqual(dream.failed_stage, STAGE_EMOTION)
+        self.assertTrue(dream.generated_image.name)
+        self.assertNotIn(Dream.DreamStatus.COMPLETED, statuses)
+        mock_personal.assert_not_called()
+
+
+@override_settings(DREAM_PROVIDER_BACKEND="simulated", DREAM_SIMULATION_LATENCY_SCALE=0, MEDIA_ROOT=TEST_MEDIA_ROOT)
+class AsyncPipelineTest(TransactionTestCase):
+    """
+    Teste le mode asynchrone : plusieurs rêves menés de front par une seule boucle.
+    (TransactionTestCase : l'ORM async passe par un autre thread, donc une autre connexion.)
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(username='testasync', password='password')
+        reset_providers()
+        self.addCleanup(reset_providers)
+        # Les dérivés d'image partent dans leur propre tâche : pas de broker en test.
+        derivatives = patch('dream_bridge_app.services.schedule_image_derivatives')
+        self.schedule_derivatives = derivatives.start()
+        self.addCleanup(derivatives.stop)
+
+    @patch('dream_bridge_app.services.run_personal_message_stage')
+    @patch('dream_bridge_app.async_pipeline._get_emotion_scores')
+    def test_run_dreams_concurrently_completes_every_dream(self, mock_scores, mock_personal):
+        import asyncio
+        from .async_pipeline import run_dreams_concurrently
+
+        mock_scores.return_value = {'tristesse': 0.6}
+        dreams = [Dream.objects.create(user=self.user) for _ in range(3)]
+
+        asyncio.run(run_dreams_concurrently([str(d.id) for d in dreams], concurrency=2))
+
+        for dream in dreams:
+            dream.refresh_from_db()
+            self.assertEqual(dream.status, Dream.DreamStatus.COMPLETED)
+            self.assertEqual(dream.emotion, 'tristesse')
+        self.assertEqual(mock_personal.call_count, 3)
+        self.assertEqual(self.schedule_derivatives.call_count, 3)
+
+
+class SqliteProfileTest(TestCase):
+    """Profil SQLite : PRAGMA de production appliqués à la connexion, rien par défaut."""
+    def test_default_profile_sets_nothing(self):
+        from .sqlite_tuning import profile_pragmas
+
+        self.assertEqual(profile_pragmas("default"), {})
+
+    @override_settings(DREAM_SQLITE_PROFILE="production")
+    def test_production_profile_tunes_new_connections(self):
+        from django.db import connections
+
+        connection = connections.create_connection("default")  # connection_created à l'ouverture
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+
+class DbWriterTest(TransactionTestCase):
+    """File d'écriture unique : lots en une transaction, une écriture en échec n'annule pas le lot."""
+    def setUp(self):
+        from . import db_writer
+
+        self.user = User.objects.create_user(username='testwriter', password='password')
+        db_writer.reset_writer()
+        self.addCleanup(db_writer.reset_writer)
+
+    def test_failed_write_does_not_roll_back_its_batch(self):
+        from django.db import DatabaseError
+        from .db_writer import WriteBatcher, _save_batch
+
+        kept, gone = Dream.objects.create(user=self.user), Dream.objects.create(user=self.user)
+        Dream.objects.filter(pk=gone.pk).delete()
+        kept.transcription, gone.transcription = "gardé", "perdu"
+        writer = WriteBatcher(_save_batch, window=0.5, max_size=2)
+
+        ok = writer.submit((kept, ["transcription", "updated_at"]))
+        failed = writer.submit((gone, ["transcription", "updated_at"]))
+
+        self.assertIsNone(ok.result(timeout=5))
+        self.assertIsInstance(failed.exception(timeout=5), DatabaseError)
+        kept.refresh_from_db()
+        self.assertEqual(kept.transcription, "gardé")
+
+    @override_settings(DREAM_DB_WRITER_BATCH_SIZE=8)
+    def test_save_fields_goes_through_writer_and_waits_for_commit(self):
+        from . import db_writer, stats
+
+        dream = Dream.objects.create(user=self.user)
+        before = stats.snapshot("db_writer.").get("db_writer.writes", 0)
+        dream.status = Dream.DreamStatus.PROCESSING
+
+        db_writer.save_fields(dream, ["status", "updated_at"])
+
+        self.assertEqual(Dream.objects.get(pk=dream.pk).status, Dream.DreamStatus.PROCESSING)
+        self.assertEqual(stats.snapshot("db_writer.")["db_writer.writes"], before + 1)
+
+
+class DailyMessageCacheTest(TestCase):
+    """Horoscopes et citation récupérés en un lot ; les vues ne lisent que le cache."""
+    def _fake_get(self, url, params=None, timeout=None):
+        response = MagicMock()
+        if params:
+            response.json.return_value = {"success": True, "data": {"horoscope_data": f"Stars for {params['sign']}"}}
+        else:
+            response.json.return_value = [{"q": "Dream big.", "a": "Anonyme"}]
+        return response
+
+    @patch('dream_bridge_app.services._translate_en_fr', side_effect=lambda texts: [f"FR {t}" for t in texts])
+    @patch('dream_bridge_app.services.requests.Session')
+    def test_refresh_then_read_without_network(self, mock_session, mock_translate):
+        from accounts.models import UserProfile
+
+        mock_session.return_value.__enter__.return_value.get.side_effect = self._fake_get
+        report = refresh_daily_messages()
+
+        self.assertEqual(set(report.values()), {"ok"})
+        self.assertEqual(len(report), 13)
+        mock_translate.assert_called_once()
+
+        believer = User.objects.create_user(username='astro', password='password')
+        UserProfile.objects.create(user=believer, believes_in_astrology=True, birth_date=date(1990, 4, 1))
+        skeptic = User.objects.create_user(username='citation', password='password')
+        UserProfile.objects.create(user=skeptic)
+
+        mock_session.reset_mock()
+        self.assertIn("FR Stars for Aries", get_daily_message(believer.id))
+        self.assertEqual(get_daily_message(skeptic.id), "« FR Dream big. » — Anonyme")
+        mock_session.assert_not_called()
+
+    @patch('dream_bridge_app.services._translate_en_fr',
+           side_effect=lambda texts: [None if "Aries" in t else f"FR {t}" for t in texts])
+    @patch('dream_bridge_app.services.requests.Session')
+    def test_failed_translation_keeps_previous_text_only_for_that_key(self, mock_session, mock_translate):
+        from .models import DailyMessage
+
+        yesterday = timezone.localdate() - timedelta(days=1)
+        DailyMessage.objects.create(key="aries", day=yesterday, text="Bélier d'hier")
+        mock_session.return_value.__enter__.return_value.get.side_effect = self._fake_get
+
+        report = refresh_daily_messages()
+
+        self.assertEqual(report.pop("aries"), "Erreur de traduction")
+        self.assertEqual(set(report.values()), {"ok"})
+        self.assertEqual(get_cached_daily_text("aries"), "Bélier d'hier")
+        self.assertEqual(get_cached_daily_text(DailyMessage.QUOTE_KEY), "« FR Dream big. » — Anonyme")
+
+    def test_missing_cache_gives_a_placeholder(self):
+        from accounts.models import UserProfile
+
+        user = User.objects.create_user(username='tot', password='password')
+        UserProfile.objects.create(user=user)
+        self.assertEqual(get_daily_message(user.id), DAILY_MESSAGE_UNAVAILABLE)
+
+    @patch('dream_bridge_app.services.get_provider')
+    def test_placeholder_is_never_saved_as_the_dream_phrase(self, mock_provider):
+        from accounts.models import UserProfile
+        from .services import generate_personal_message_for_dream
+
+        mock_provider.return_value.personal_message.return_value = "Message du rêve."
+        user = User.objects.create_user(username='fresh', password='password')
+        UserProfile.objects.create(user=user)
+        dream = Dream.objects.create(user=user, transcription="Un rêve.")
+
+        generate_personal_message_for_dream(str(dream.id))
+
+        dream.refresh_from_db()
+        self.assertEqual(dream.personal_phrase, "Message du rêve.")
+        self.assertEqual(dream.phrase, "")
+        self.assertIsNone(dream.phrase_date)
+
+
+class TranslationMemoTest(TestCase):
+    """Chaque texte n'est traduit qu'une fois : LRU du processus, puis table partagée."""
+    def setUp(self):
+        from .translations import reset_lru
+
+        reset_lru()
+        self.addCleanup(reset_lru)
+
+    @patch('dream_bridge_app.translations._translate_remote', side_effect=lambda texts, s, t: [f"FR {x}" for x in texts])
+    def test_batch_lookup_translates_only_unknown_texts(self, mock_remote):
+        from . import stats
+        from .translations import reset_lru, translate_many
+
+        self.assertEqual(translate_many(["Hello", "Dream"]), ["FR Hello", "FR Dream"])
+        reset_lru()  # autre processus : la table suffit
+        before = stats.snapshot("translations.")
+        self.assertEqual(translate_many(["Dream", "Night", "Hello"]), ["FR Dream", "FR Night", "FR Hello"])
+
+        self.assertEqual(mock_remote.call_args_list[1].args[0], ["Night"])
+        after = stats.snapshot("translations.")
+        self.assertEqual(after["translations.hits"] - before.get("translations.hits", 0), 2)
+        self.assertEqual(after["translations.misses"] - before.get("translations.misses", 0), 1)
+
+    @patch('dream_bridge_app.translations.GoogleTranslator')
+    def test_failed_text_is_not_stored_and_others_are_kept(self, mock_translator):
+        from .translations import translate_many
+
+        def translate(text):
+            if text == "Night":
+                raise ConnectionError("quota")
+            return f"FR {text}"
+
+        mock_translator.return_value.translate.side_effect = translate
+        self.assertEqual(translate_many(["Hello", "Night", "Dream"]), ["FR Hello", None, "FR Dream"])
+        self.assertEqual(sorted(Translation.objects.values_list("source_text", flat=True)), ["Dream", "Hello"])
+
+        mock_translator.return_value.translate.side_effect = lambda text: f"FR {text}"
+        mock_translator.return_value.translate.reset_mock()
+        self.assertEqual(translate_many(["Hello", "Night"]), ["FR Hello", "FR Night"])
+        mock_translator.return_value.translate.assert_called_once_with("Night")
+
+    @override_settings(DREAM_TRANSLATION_MAX_ROWS=2)
+    @patch('dream_bridge_app.translations._translate_remote', side_effect=lambda texts, s, t: texts)
+    def test_table_keeps_the_most_recently_used_rows(self, mock_remote):
+        from .translations import translate
+
+        for text in ("un", "deux", "trois"):
+            translate(text)
+        self.assertEqual(Translation.objects.count(), 2)
+        self.assertFalse(Translation.objects.filter(source_text="un").exists())
+
+
+class PromptRegistryTest(TestCase):
+    """Prompts chargés une fois, rechargés seulement si le fichier change, versionnés."""
+    def setUp(self):
+        from .prompt_registry import PromptRegistry
+
+        prompts_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(prompts_dir.cleanup)
+        self.path = os.path.join(prompts_dir.name, "salut.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("Bonjour {username}, rêve de {dominant_emotion!s:>6}.")
+        self.registry = PromptRegistry(prompts_dir.name, {"secours": "Prompt {x}"})
+
+    def test_template_is_preparsed_and_matches_str_format(self):
+        prompt = self.registry.get("salut")
+
+        self.assertEqual(prompt.fields, {"username", "dominant_emotion"})
+        self.assertEqual(prompt.format(username="Léa", dominant_emotion="joie"),
+                         prompt.text.format(username="Léa", dominant_emotion="joie"))
+        self.assertEqual(self.registry.get("secours").version, "secours@builtin")
+
+    def test_file_is_reloaded_only_when_its_mtime_changes(self):
+        first = self.registry.get("salut")
+        self.registry.reload()
+        self.assertIs(self.registry.get("salut"), first)
+
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("Salut {username}.")
+        os.utime(self.path, (first.mtime + 10, first.mtime + 10))
+        self.registry.reload()
+
+        second = self.registry.get("salut")
+        self.assertEqual(second.format(username="Léa"), "Salut Léa.")
+        self.assertNotEqual(second.version, first.version)
+
+
+class EmotionClassifierTest(TestCase):
+    """Lexique local d'abord ; LLM seulement quand le lexique hésite."""
+    def setUp(self):
+        from .emotions import reset_cache
+
+        reset_cache()
+        self.addCleanup(reset_cache)
+
+    def test_clear_text_is_scored_locally(self):
+        from .emotions import classify
+
+        llm = MagicMock()
+        scores = classify("J'étais poursuivie par un monstre, j'avais tellement peur.", llm)
+
+        llm.assert_not_called()
+        self.assertEqual(dominant_emotion(scores), 'peur')
+        self.assertEqual(set(scores), {code for code, _ in Dream.EMOTIONS if code != 'neutre'})
+
+    def test_negated_words_are_ignored(self):
+        from .emotions import score_locally
+
+        scores, _ = score_locally("Je n'avais pas peur, j'étais heureuse.")
+        self.assertEqual(scores['peur'], 0.0)
+        self.assertEqual(scores['joie'], 1.0)
+
+    def test_negation_reaches_over_filler_words(self):
+        from .emotions import score_locally
+
+        for text in ("Ce n'était pas une joie.", "Jamais de peur.", "Je n'ai pas eu de peur."):
+            scores, _ = score_locally(text)
+            self.assertEqual(sum(scores.values()), 0.0, text)
+
+        # Au-delà de la fenêtre, le mot compte de nouveau.
+        scores, _ = score_locally("Pas un seul instant je ne perdais ma joie.")
+        self.assertEqual(scores['joie'], 1.0)
+
+    def test_plus_negates_only_after_ne(self):
+        from .emotions import score_locally
+
+        scores, _ = score_locally("Je n'avais plus peur.")
+        self.assertEqual(scores['peur'], 0.0)
+
+        for text in ("De plus en plus heureux.", "Plus heureux que jamais."):
+            scores, _ = score_locally(text)
+            self.assertEqual(scores['joie'], 1.0, text)
+
+    def test_llm_failure_without_signal_raises_and_is_not_cached(self):
+        import asyncio
+        from .emotions import aclassify, classify
+
+        failing = MagicMock(side_effect=Exception("API HS"))
+        with self.assertRaises(ProviderError):
+            classify("Je marchais dans une rue.", failing)
+        with self.assertRaises(ProviderError):
+            classify("Je marchais dans une rue.", MagicMock(return_value={}))
+
+        async def afailing(text):
+            raise Exception("API HS")
+
+        with self.assertRaises(ProviderError):
+            asyncio.run(aclassify("Je marchais dans une rue.", afailing))
+
+        llm = MagicMock(return_value={'surprise': 0.8})
+        self.assertEqual(classify("Je marchais dans une rue.", llm), {'surprise': 0.8})
+        llm.assert_called_once()
+
+    def test_uncertain_text_asks_the_llm_once_then_hits_the_cache(self):
+        from .emotions import classify
+
+        llm = MagicMock(return_value={'surprise': 0.8, 'joie': 0.2})
+        self.assertEqual(classify("Je marchais dans une rue.", llm), {'surprise': 0.8, 'joie': 0.2})
+        # Même texte à la casse et à la ponctuation près : même clé de cache.
+        self.assertEqual(classify("je marchais dans une rue", llm), {'surprise': 0.8, 'joie': 0.2})
+        llm.assert_called_once()
+
+    def test_llm_failure_keeps_the_lexical_scores(self):
+        from .emotions import classify
+
+        scores = classify("J'étais triste et j'avais peur.", MagicMock(side_effect=Exception("API HS")))
+        self.assertEqual(scores['peur'], scores['tristesse'])
+        self.assertGreater(scores['peur'], 0)
+
+    @patch('dream_bridge_app.services._llm_emotion_scores', side_effect=Exception("API HS"))
+    def test_emotion_stage_leaves_no_checkpoint_when_nothing_is_found(self, _):
+        from .services import run_emotion_stage
+
+        user = User.objects.create_user(username='emotionless', password='password')
+        dream = Dream.objects.create(user=user, transcription="Je marchais dans une rue.")
+
+        # L'exception remonte à DreamStageTask, qui relance l'étape.
+        with self.assertRaises(ProviderError):
+            run_emotion_stage(str(dream.id))
+        dream.refresh_from_db()
+        self.assertIsNone(dream.emotion_scores)
+
+
+class EmotionBatcherTest(TestCase):
+    """Les transcriptions en attente partent en un seul appel LLM, avec repli individuel."""
+
+    def test_pending_texts_are_classified_in_one_request(self):
+        from .emotion_batcher import EmotionBatcher
+
+        batch_scorer = MagicMock(side_effect=lambda texts: [{'joie': len(t) / 100} for t in texts])
+        single_scorer = MagicMock()
+        batcher = EmotionBatcher(batch_scorer, single_scorer, window=0.5, max_size=3)
+
+        futures = [batcher.submit(text) for text in ("a", "bb", "ccc")]
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [{'joie': 0.01}, {'joie': 0.02}, {'joie': 0.03}])
+        batch_scorer.assert_called_once_with(["a", "bb", "ccc"])
+        single_scorer.assert_not_called()
+
+    def test_unreadable_batch_falls_back_to_single_requests(self):
+        from .emotion_batcher import EmotionBatcher
+        from .providers import parse_emotion_batch
+
+        def batch_scorer(texts):
+            return parse_emotion_batch('{"results": [{"id": 0, "scores": {"peur": 1}}]}', len(texts))
+
+        batcher = EmotionBatcher(batch_scorer, lambda text: {'surprise': 1.0}, window=0.5, max_size=2)
+        futures = [batcher.submit(text) for text in ("un", "deux")]
+
+        self.assertEqual([f.result(timeout=5) for f in futures], [{'surprise': 1.0}] * 2)
+
+    def test_fallback_requests_run_concurrently(self):
+        import threading
+        from .emotion_batcher import EmotionBatcher
+
+        # Les trois requêtes individuelles doivent être en vol en même temps pour passer la barrière.
+        barrier = threading.Barrier(3, timeout=5)
+
+        def single_scorer(text):
+            barrier.wait()
+            return {'joie': 1.0}
+
+        batcher = EmotionBatcher(MagicMock(side_effect=ValueError("illisible")), single_scorer, window=0.5, max_size=3)
+        futures = [batcher.submit(text) for text in ("un", "deux", "trois")]
+
+        self.assertEqual([f.result(timeout=10) for f in futures], [{'joie': 1.0}] * 3)
+
+    def test_batching_is_opt_in(self):
+        from .services import submit_llm_emotion_scores
+
+        self.assertEqual(settings.DREAM_EMOTION_BATCH_SIZE, 1)
+        self.assertIsNone(submit_llm_emotion_scores("Un rêve."))
+
+
+class ImageDerivativesTest(TestCase):
+    """Miniatures AVIF/WebP et placeholder enregistrés à côté de l'image générée."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=media_root.name, DREAM_IMAGE_DERIVATIVE_WIDTHS=[320, 640, 4000],
+                                       DREAM_IMAGE_DERIVATIVE_FORMATS=["webp"])
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), (80, 40, 160)).save(buffer, format="PNG")
+        user = User.objects.create_user(username='derivatives', password='password')
+        self.dream = Dream.objects.create(user=user, status='COMPLETED')
+        self.dream.generated_image.save('dream_test.png', SimpleUploadedFile('dream_test.png', buffer.getvalue()))
+
+    def test_derivatives_use_the_default_queue_unless_configured(self):
+        from .tasks import generate_image_derivatives_task
+
+        # Un worker qui ne lit que 'celery' doit recevoir les dérivés : la file dédiée est opt-in.
+        self.assertEqual(settings.DREAM_IMAGE_QUEUE, "")
+        self.assertNotIn(generate_image_derivatives_task.name, settings.CELERY_TASK_ROUTES)
+
+    @patch('dream_bridge_app.tasks.generate_image_derivatives_task.delay', side_effect=ConnectionError("broker HS"))
+    def test_unreachable_broker_is_logged_not_raised(self, mock_delay):
+        from .services import schedule_image_derivatives
+
+        with self.assertLogs('dream_bridge_app.services', level='WARNING') as logs:
+            self.assertFalse(schedule_image_derivatives("42"))
+        self.assertIn("broker HS", logs.output[0])
+
+    def test_build_derivatives_stores_variants_next_to_original(self):
+        from PIL import Image
+        from .image_derivatives import build_derivatives
+
+        manifest = build_derivatives(str(self.dream.id))
+
+        # Pas d'agrandissement : 4000 est ramené à la largeur de l'original.
+        widths = [width for width, _ in manifest['sources']['webp']]
+        self.assertEqual(widths, [320, 640, 1200])
+        for width, name in manifest['sources']['webp']:
+            self.assertEqual(name, f"dreams/images/dream_test.w{width}.webp")
+            with Image.open(os.path.join(settings.MEDIA_ROOT, name)) as image:
+                self.assertEqual((image.format, image.width), ("WEBP", width))
+        self.assertTrue(manifest['placeholder'].startswith("data:image/webp;base64,"))
+
+        self.dream.refresh_from_db()
+        self.assertEqual(self.dream.image_derivatives, manifest)
+
+    def test_picture_tag_renders_srcset_or_falls_back_to_original(self):
+        from django.template import Context, Template
+        from .image_derivatives import build_derivatives
+
+        template = Template('{% load dream_images %}{% dream_picture dream sizes="50vw" %}')
+        html = template.render(Context({'dream': self.dream}))
+        self.assertNotIn('<source', html)
+        self.assertIn(self.dream.generated_image.url, html)
+
+        build_derivatives(str(self.dream.id))
+        self.dream.refresh_from_db()
+        html = template.render(Context({'dream': self.dream}))
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('dream_test.w320.webp 320w', html)
+
+
+class ImageStoreTest(TestCase):
+    """Image générée écrite en flux, ré-encodée puis publiée par renommage atomique."""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = self.settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.image_dir = os.path.join(media_root.name, 'dreams', 'images')
+
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), (10, 200, 90)).save(buffer, format="PNG")
+        self.png = buffer.getvalue()
+        user = User.objects.create_user(username='imagestore', password='password')
+        self.dream = Dream.objects.create(user=user)
+
+    def _chunks(self, data, size=100):
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    def test_streamed_png_is_named_by_hash_without_leftovers(self):
+        from PIL import Image
+        from .image_store import store_image_stream
+
+        name = store_image_stream(self.dream, self._chunks(self.png))
+
+        digest = hashlib.sha256(self.png).hexdigest()[:8]
+        self.assertEqual(name, f"dreams/images/dream_{self.dream.id}.{digest}.png")
+        with Image.open(os.path.join(settings.MEDIA_ROOT, name)) as image:
+            self.assertEqual((image.format, image.size), ("PNG", (64, 48)))
+        self.assertEqual(os.listdir(self.image_dir), [os.path.basename(name)])
+
+    @override_settings(DREAM_IMAGE_STORAGE_FORMAT="webp")
+    def test_configured_format_and_unreadable_bytes(self):
+        from .image_store import store_image_stream
+
+        self.assertTrue(store_image_stream(self.dream, self._chunks(self.png)).endswith('.webp'))
+        # Octets illisibles par Pillow : conservés tels quels.
+        name = store_image_stream(self.dream, [b'pas une image'])
+        with open(os.path.join(settings.MEDIA_ROOT, name), 'rb') as f:
+            self.assertEqual(f.read(), b'pas une image')
+
+    def test_failed_stream_leaves_no_partial_file(self):
+        from .image_store import store_image_stream
+
+        def broken():
+            yield self.png[:100]
+            raise ConnectionError("coupure")
+
+        with self.assertRaises(ConnectionError):
+            store_image_stream(self.dream, broken())
+        self.assertEqual(os.listdir(self.image_dir), [])
+        self.assertFalse(self.dream.generated_image)
+
+
+class BlobStoreTest(TestCase):
+    """Audios adressés par contenu : stockés une fois, supprimés à la dernière référence."""
+    def setUp(self):
+        blob_root = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_root.cleanup)
+        blob_settings = self.settings(DREAM_BLOB_ROOT=blob_root.name)
+        blob_settings.enable()
+        self.addCleanup(blob_settings.disable)
+
+    def test_same_content_is_stored_once_and_refcounted(self):
+        key = blobstore.put([b'meme ', b'audio'])
+        self.assertEqual(blobstore.put([b'meme audio']), key)
+
+        path = blobstore.blob_path(key)
+        self.assertEqual(path, os.path.join(settings.DREAM_BLOB_ROOT, key[:2], key[2:4], key))
+        self.assertEqual(AudioBlob.objects.get(key=key).refcount, 2)
+
+        blobstore.release(key)
+        self.assertTrue(os.path.exists(path))
+        blobstore.release(key)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(AudioBlob.objects.filter(key=key).exists())
+
+    @override_settings(DREAM_PROVIDER_BACKEND="simulated", DREAM_SIMULATION_LATENCY_SCALE=0)
+    def test_transcription_stage_releases_the_blob(self):
+        reset_providers()
+        self.addCleanup(reset_providers)
+        user = User.objects.create_user(username='testblob', password='password')
+        key = blobstore.put([b'audio du reve'])
+        dream = Dream.objects.create(user=user, audio_ref=key)
+
+        run_transcription_stage(str(dream.id))
+
+        dream.refresh_from_db()
+        self.assertTrue(dream.transcription)
+        self.assertEqual(dream.audio_ref, "")
+        self.assertFalse(os.path.exists(blobstore.blob_path(key)))
+
+    def test_failed_dream_releases_the_blob_once(self):
+        user = User.objects.create_user(username='testblobfail', password='password')
+        key = blobstore.put([b'audio partage'])
+        blobstore.put([b'audio partage'])  # un autre rêve garde sa référence
+        dream = Dream.objects.create(user=user, audio_ref=key)
+
+        mark_dream_failed(str(dream.id), STAGE_TRANSCRIPTION, Exception("Whisper HS"))
+        mark_dream_failed(str(dream.id), STAGE_TRANSCRIPTION, Exception("Whisper HS"))
+
+        dream.refresh_from_db()
+        self.assertEqual((dream.status, dream.audio_ref), (Dream.DreamStatus.FAILED, ""))
+        self.assertEqual(AudioBlob.objects.get(key=key).refcount, 1)
+
+    def test_deleted_dream_releases_the_blob(self):
+        user = User.objects.create_user(username='testblobdelete', password='password')
+        key = blobstore.put([b'audio abandonne'])
+        dream = Dream.objects.create(user=user, audio_ref=key)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dream.delete()
+
+        self.assertFalse(AudioBlob.objects.filter(key=key).exists())
+        self.assertFalse(os.path.exists(blobstore.blob_path(key)))
+
+    @override_settings(DREAM_PROVIDER_BACKEND="simulated", DREAM_SIMULATION_LATENCY_SCALE=0)
+    def test_duplicate_upload_reuses_cached_transcription(self):
+        from . import stats
+
+        reset_providers()
+        self.addCleanup(reset_providers)
+        user = User.objects.create_user(username='testcache', password='password')
+        before = stats.snapshot("transcriptions.")
+        first = Dream.objects.create(user=user, audio_ref=blobstore.put([b'meme enregistrement']))
+        run_transcription_stage(str(first.id))
+
+        second = Dream.objects.create(user=user, audio_ref=blobstore.put([b'meme enregistrement']))
+        with patch.object(get_provider(), 'transcribe') as mock_transcribe:
+            run_transcription_stage(str(second.id))
+        mock_transcribe.assert_not_called()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.transcription, first.transcription)
+        entry = TranscriptionCache.objects.get()
+        self.assertEqual((entry.language, entry.hits), ("fr", 1))
+        after = stats.snapshot("transcriptions.")
+        self.assertEqual(after["transcriptions.hits"] - before.get("transcriptions.hits", 0), 1)
+        self.assertEqual(after["transcriptions.misses"] - before.get("transcriptions.misses", 0), 1)
+
+
+class ProviderBackendTest(TestCase):
+    """Choix du backend par réglage, et injection de pannes du backend simulé."""
+    def setUp(self):
+        reset_providers()
+        self.addCleanup(reset_providers)
+
+    def test_backend_is_selected_by_setting_and_reused(self):
+        with self.settings(DREAM_PROVIDER_BACKEND="simulated"):
+            backend = get_provider()
+            self.assertIsInstance(backend, SimulatedBackend)
+            self.assertIs(get_provider(), backend)
+        with self.settings(DREAM_PROVIDER_BACKEND="inconnu"):
+            with self.assertRaises(ValueError):
+                get_provider()
+
+    def test_simulated_backend_injects_errors_per_stage(self):
+        backend = SimulatedBackend(
+            stages={STAGE_TRANSCRIPTION: {"latency": 0.0, "error_rate": 1.0}},
+            latency_scale=0, seed=1,
+        )
+        with self.assertRaises(ProviderError):
+            backend.transcribe("inutile.webm")
+        # Les autres étapes n'ont pas de profil : ni latence ni erreur.
+        self.assertTrue(backend.image_prompt("Un rêve.", "système"))
+
+    def test_recording_covers_batched_emotions_and_streamed_images(self):
+        import asyncio
+        from .providers import RecordingBackend, ReplayBackend
+
+        record_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(record_dir.cleanup)
+        inner = MagicMock()
+        inner.name = "simulated"
+        inner.emotion_scores_batch.return_value = [{'joie': 0.9}, {'peur': 0.7}]
+        inner.generate_image_stream.return_value = iter([b"ab", b"cd"])
+
+        async def astream(prompt):
+            yield b"ef"
+
+        inner.agenerate_image_stream = astream
+        backend = RecordingBackend(inner, record_dir.name)
+
+        self.assertEqual(backend.emotion_scores_batch(["a", "b"], "système"), [{'joie': 0.9}, {'peur': 0.7}])
+        self.assertEqual(b"".join(backend.generate_image_stream("prompt")), b"abcd")
+
+        async def consume():
+            return b"".join([chunk async for chunk in backend.agenerate_image_stream("prompt")])
+
+        self.assertEqual(asyncio.run(consume()), b"ef")
+
+        replay = ReplayBackend(record_dir.name, speed=0)
+        self.assertEqual([replay.emotion_scores("a", "s"), replay.emotion_scores("b", "s")],
+                         [{'joie': 0.9}, {'peur': 0.7}])
+        self.assertEqual([replay.generate_image("p"), replay.generate_image("p")], [b"abcd", b"ef"])
+
+
+class SingleFlightTest(TestCase):
+    """Appels concurrents sur une même clé : un seul calcul, résultat partagé."""
+
+    @patch('dream_bridge_app.singleflight._redis_client', return_value=None)
+    def test_concurrent_callers_share_one_call(self, mock_redis):
+        import threading
+        from . import singleflight, stats
+
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def generate():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "Message partagé."
+
+        before = stats.get("singleflight.collapsed")
+        results = []
+        leader = threading.Thread(target=lambda: results.append(singleflight.run("personal-message:1", generate)))
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=lambda: results.append(singleflight.run("personal-message:1", generate)))
+                     for _ in range(3)]
+        for follower in followers:
+            follower.start()
+        while stats.get("singleflight.collapsed") - before < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["Message partagé."] * 4)
+
+    def test_redis_down_falls_back_to_a_direct_call(self):
+        import redis
+        from . import singleflight
+
+        client = MagicMock()
+        client.set.side_effect = redis.ConnectionError("refusé")
+        with patch('dream_bridge_app.singleflight.clients.get_redis_client', return_value=client), \
+                patch('dream_bridge_app.singleflight._redis_down_until', 0.0):
+            self.assertEqual(singleflight.run("personal-message:2", lambda: "ok"), "ok")
+
+    def test_redis_failure_after_the_work_still_returns_the_result(self):
+        import redis
+        from . import singleflight
+
+        client = MagicMock()
+        # Verrou obtenu, puis Redis tombe au moment de publier le résultat.
+        client.set.side_effect = [True, redis.ConnectionError("coupure")]
+        calls = []
+        with patch('dream_bridge_app.singleflight.clients.get_redis_client', return_value=client), \
+                patch('dream_bridge_app.singleflight._redis_down_until', 0.0):
+            result = singleflight.run("personal-message:3", lambda: calls.append(1) or "Message enregistré.")
+
+        self.assertEqual(result, "Message enregistré.")
+        self.assertEqual(calls, [1])
+
+
+class ProviderClientRegistryTest(TestCase):
+    """Le registre ne construit qu'un client par fournisseur et par processus."""
+    def setUp(self):
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+    @patch('dream_bridge_app.clients.Mistral')
+    @patch('dream_bridge_app.clients.Groq')
+    def test_clients_are_built_once_and_reused(self, mock_groq, mock_mistral):
+        before = client_pool_stats()
+
+        first = get_groq_client()
+        self.assertIs(get_groq_client(), first)
+        self.assertIs(get_mistral_client(), get_mistral_client())
+
+        self.assertEqual(mock_groq.call_count, 1)
+        self.assertEqual(mock_mistral.call_count, 1)
+        after = client_pool_stats()
+        self.assertEqual(after["misses"] - before["misses"], 2)
+        self.assertEqual(after["hits"] - before["hits"], 2)
+        self.assertEqual(after["clients"], ["groq", "mistral"])
+
+
+    @patch('dream_bridge_app.clients.Mistral')
+    @patch('dream_bridge_app.clients.Groq')
+    def test_warm_up_builds_clients_only_for_configured_real_backend(self, mock_groq, mock_mistral):
+        from .clients import warm_up
+
+        with self.settings(DREAM_PROVIDER_BACKEND="simulated", GROQ_API_KEY="k", MISTRAL_API_KEY="k"):
+            warm_up()
+        with self.settings(DREAM_PROVIDER_BACKEND="real", GROQ_API_KEY=None, MISTRAL_API_KEY="k"):
+            warm_up()
+        mock_groq.assert_not_called()
+        mock_mistral.assert_not_called()
+
+        with self.settings(DREAM_PROVIDER_BACKEND="real", GROQ_API_KEY="k", MISTRAL_API_KEY="k",
+                           PROVIDER_WARMUP_CONNECT=False):
+            warm_up()
+        self.assertEqual(client_pool_stats()["clients"], ["groq", "mistral"])
+
+
+class ProviderAgentRegistryTest(TestCase):
+    """L'agent d'images est créé une fois par configuration, puis réutilisé."""
+    def setUp(self):
+        from .agents import reset_agent_cache
+
+        reset_agent_cache()
+        self.addCleanup(reset_agent_cache)
+        self.client_mock = MagicMock()
+        self.client_mock.beta.agents.create.side_effect = [MagicMock(id='ag-1'), MagicMock(id='ag-2')]
+
+    def test_agent_is_created_once_and_persisted(self):
+        from .agents import reset_agent_cache, start_conversation
+        from .models import ProviderAgent
+
+        start_conversation(self.client_mock, "prompt 1")
+        start_conversation(self.client_mock, "prompt 2")
+        reset_agent_cache()  # nouveau processus : l'id vient de la base
+        start_conversation(self.client_mock, "prompt 3")
+
+        self.assertEqual(self.client_mock.beta.agents.create.call_count, 1)
+        self.assertEqual(ProviderAgent.objects.get().agent_id, 'ag-1')
+        self.client_mock.beta.conversations.start.assert_called_with(agent_id='ag-1', inputs="prompt 3")
+
+    def test_missing_agent_is_recreated(self):
+        import httpx
+        from mistralai.models import SDKError
+        from .agents import start_conversation
+        from .models import ProviderAgent
+
+        start_conversation(self.client_mock, "prompt 1")
+        gone = SDKError("Agent introuvable", httpx.Response(404, request=httpx.Request("POST", "https://x")))
+        self.client_mock.beta.conversations.start.side_effect = [gone, MagicMock()]
+
+        start_conversation(self.client_mock, "prompt 2")
+
+        self.assertEqual(self.client_mock.beta.agents.create.call_count, 2)
+        self.assertEqual(ProviderAgent.objects.get().agent_id, 'ag-2')
+
+    def test_config_change_creates_a_new_agent(self):
+        from .agents import IMAGE_AGENT_CONFIG, get_agent_id
+
+        first = get_agent_id(self.client_mock)
+        second = get_agent_id(self.client_mock, {**IMAGE_AGENT_CONFIG, "instructions": "Autre consigne."})
+
+        self.assertNotEqual(first, second)
+
+
 class SecurityTest(TestCase):
     """Vérifie que les utilisateurs ne peuvent pas accéder aux données des autres."""
     def setUp(self):
@@ -0,0 +1,156 @@
+"""
+Mémo persistant des traductions (deep_translator / Google).
+
+Un même texte anglais (citation du jour, horoscope) était retraduit à
+chaque appel : un aller-retour réseau pour un résultat déjà connu. Ici :
+
+1. LRU en mémoire, propre au processus (DREAM_TRANSLATION_LRU_SIZE entrées) ;
+2. table Translation, clé (source, cible, SHA-256 du texte), partagée par
+   tous les processus et bornée à DREAM_TRANSLATION_MAX_ROWS lignes (les
+   moins récemment utilisées partent en premier) ;
+3. le traducteur, pour les seuls textes manquants.
+
+translate_many() traite une liste entière avec une requête SQL. Google
+n'a pas de vraie traduction par lot (translate_batch n'est qu'une boucle
+de requêtes) : les textes manquants partent en parallèle, au plus
+REMOTE_CONCURRENCY à la fois. Un texte en échec vaut None dans le résultat,
+n'est pas mémorisé et sera retenté au prochain appel ; les autres sont
+gardés. Compteurs : stats "translations." (hits = LRU ou base, misses =
+traducteur, errors) ; stats.hit_rate("translations").
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.utils import timezone
+
+from deep_translator import GoogleTranslator
+
+from . import stats
+from .models import Translation
+
+logger = logging.getLogger(__name__)
+
+REMOTE_CONCURRENCY = 8
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _lru_get(key: tuple):
+    with _lock:
+        value = _lru.get(key)
+        if value is not None:
+            _lru.move_to_end(key)
+        return value
+
+
+def _lru_put(key: tuple, value: str) -> None:
+    with _lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > settings.DREAM_TRANSLATION_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _translate_one(text: str, source: str, target: str):
+    """Traduction d'un texte, ou None si le traducteur échoue."""
+    try:
+        return GoogleTranslator(source=source, target=target).translate(text)
+    except Exception as e:
+        stats.incr("translations.errors")
+        logger.warning("Traduction %s→%s impossible (%s), texte retenté au prochain appel.", source, target, e)
+        return None
+
+
+def _translate_remote(texts: list, source: str, target: str) -> list:
+    """Traductions de `texts` (None pour un échec), requêtes en parallèle."""
+    if len(texts) == 1:
+        return [_translate_one(texts[0], source, target)]
+    with ThreadPoolExecutor(max_workers=min(len(texts), REMOTE_CONCURRENCY)) as pool:
+        return list(pool.map(lambda text: _translate_one(text, source, target), texts))
+
+
+def _prune() -> None:
+    """Supprime les traductions les moins récemment utilisées au-delà de la limite."""
+    limit = settings.DREAM_TRANSLATION_MAX_ROWS
+    cutoff = (Translation.objects.order_by("-last_used_at")
+              .values_list("last_used_at", flat=True)[limit:limit + 1].first())
+    if cutoff is not None:
+        Translation.objects.filter(last_used_at__lte=cutoff).delete()
+
+
+def translate_many(texts: list, source: str = "en", target: str = "fr") -> list:
+    """Traductions de `texts`, dans l'ordre (mémoire → base → traducteur) ; None pour un échec."""
+    results = {}
+    hashes = {text: text_hash(text) for text in texts if text}
+
+    missing, remote = [], []
+    for text, digest in hashes.items():
+        cached = _lru_get((source, target, digest))
+        if cached is not None:
+            results[text] = cached
+        else:
+            missing.append(text)
+
+    if missing:
+        rows = dict(Translation.objects.filter(
+            source=source, target=target, text_hash__in=[hashes[t] for t in missing]
+        ).values_list("text_hash", "translated"))
+        if rows:
+            Translation.objects.filter(source=source, target=target, text_hash__in=list(rows)).update(
+                last_used_at=timezone.now()
+            )
+        for text in missing:
+            translated = rows.get(hashes[text])
+            if translated is None:
+                remote.append(text)
+            else:
+                results[text] = translated
+                _lru_put((source, target, hashes[text]), translated)
+
+        if remote:
+            stats.incr("translations.misses", len(remote))
+            translated_texts = _translate_remote(remote, source, target)
+            done = [(text, translated) for text, translated in zip(remote, translated_texts) if translated is not None]
+            Translation.objects.bulk_create(
+                [Translation(source=source, target=target, text_hash=hashes[text],
+                             source_text=text, translated=translated)
+                 for text, translated in done],
+                ignore_conflicts=True,
+            )
+            _prune()
+            for text, translated in zip(remote, translated_texts):
+                results[text] = translated
+            for text, translated in done:
+                _lru_put((source, target, hashes[text]), translated)
+
+    stats.incr("translations.hits", len(hashes) - len(remote))
+    return [results.get(text, text) for text in texts]
+
+
+def translate(text: str, source: str = "en", target: str = "fr"):
+    return translate_many([text], source, target)[0]
+
+
+def translation_cache_stats() -> dict:
+    return {
+        "lru_size": len(_lru),
+        "rows": Translation.objects.count(),
+        "hits": stats.get("translations.hits"),
+        "misses": stats.get("translations.misses"),
+        "errors": stats.get("translations.errors"),
+        "hit_rate": stats.hit_rate("translations"),
+    }
+
+
+def reset_lru() -> None:
+    with _lock:
+        _lru.clear()
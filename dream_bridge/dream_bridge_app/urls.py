@@ -10,10 +10,12 @@ urlpatterns = [
     path("narrate/", views.dream_create_view, name="narrate"),
     path("dashboard/", views.report, name="dashboard"),
     path("galerie/", views.galerie_filtree, name="galerie"),
+    path("api/galerie/", views.galerie_page_api, name="galerie-page-api"),
 
     # Détail d’un rêve
     path("dreams/<uuid:dream_id>/status/", views.dream_status_view, name="dream-status"),
     path("api/dreams/<uuid:dream_id>/status/", views.check_dream_status_api, name="check-dream-status-api"),
+    path("api/dreams/<uuid:dream_id>/events/", views.dream_status_stream_view, name="dream-status-stream"),
 
     # Action : personnaliser un rêve
     #path("dreams/<uuid:dream_id>/personalize/", views.generate_personal_message_view, name="dream-personalize"),
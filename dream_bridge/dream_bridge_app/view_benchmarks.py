@@ -0,0 +1,183 @@
+"""
+Benchmark des vues et des métriques sur un gros historique.
+
+Les tests vérifient le comportement sur quelques rêves ; rien ne signalait
+qu'une vue passe à O(n) requêtes ou charge toute une table. Ici :
+
+- seed() remplit la base avec des utilisateurs ayant chacun des dizaines
+  de milliers (jusqu'au million) de rêves étalés sur `days` jours, puis
+  reconstruit l'agrégat quotidien (bulk_create contourne les signaux) ;
+- cases() liste les vues (galerie, page de galerie, tableau de bord froid et
+  en cache, page d'un rêve, statut JSON) et les fonctions de métriques ;
+- measure() exécute chaque cas `repeat` fois : p50 / p95 en ms et nombre
+  maximal de requêtes SQL, comparé à QUERY_BUDGETS (indépendant du volume) ;
+- compare() confronte un résultat à une référence JSON enregistrée.
+
+Commande : `python manage.py bench_views` (base de test jetable).
+"""
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import report_cache, rollups
+from .analytics import dream_analytics
+from .gallery import encode_cursor, gallery_page
+from .metrics_dashboard import emotions_disponible, report_metrics
+from .models import Dream
+
+User = get_user_model()
+
+# Requêtes SQL maximales par cas, quel que soit le nombre de rêves.
+# Les vues comptent 2 requêtes d'authentification (session + utilisateur).
+QUERY_BUDGETS = {
+    "view:galerie": 4,
+    "view:galerie_page_api": 3,
+    "view:dashboard_7d": 6,
+    "view:dashboard_all": 6,
+    "view:dashboard_all_cached": 2,
+    "view:dream_status": 3,
+    "view:check_dream_status_api": 3,
+    "metrics:report_metrics_7d": 1,
+    "metrics:report_metrics_all": 1,
+    "metrics:dream_analytics": 2,
+    "metrics:emotions_disponible": 1,
+    "metrics:gallery_page": 1,
+}
+
+SEED_BATCH_SIZE = 5000
+_TEXT = ("Je marchais dans une forêt de verre, les arbres chantaient et la lune "
+         "descendait lentement vers une mer immobile où flottaient des horloges. ") * 6
+
+
+def seed(users: int, dreams_per_user: int, days: int = 730, seed_value: int = 42, progress=None) -> list:
+    """Crée `users` utilisateurs de `dreams_per_user` rêves ; renvoie les utilisateurs."""
+    rng = random.Random(seed_value)
+    emotions = [code for code, _ in Dream.EMOTIONS]
+    now = timezone.now()
+    created_at_field = Dream._meta.get_field("created_at")
+    seeded = []
+    for index in range(users):
+        user = User.objects.create_user(username=f"bench{index}", password="bench")
+        seeded.append(user)
+        remaining = dreams_per_user
+        # auto_now_add écraserait les dates étalées de l'historique.
+        created_at_field.auto_now_add = False
+        try:
+            while remaining:
+                count = min(SEED_BATCH_SIZE, remaining)
+                dreams = []
+                for _ in range(count):
+                    completed = rng.random() < 0.9
+                    dreams.append(Dream(
+                        user=user,
+                        status=Dream.DreamStatus.COMPLETED if completed else Dream.DreamStatus.FAILED,
+                        transcription=_TEXT[:rng.randint(40, len(_TEXT))],
+                        emotion=rng.choice(emotions),
+                        generated_image="dreams/images/bench.png" if completed else "",
+                        personal_phrase="Message de test." if completed else "",
+                        created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+                    ))
+                Dream.objects.bulk_create(dreams, batch_size=1000)
+                remaining -= count
+                if progress:
+                    progress(f"{user.username} : {dreams_per_user - remaining}/{dreams_per_user} rêves")
+        finally:
+            created_at_field.auto_now_add = True
+    rollups.rebuild()
+    return seeded
+
+
+def cases(user) -> list:
+    """(nom, préparation hors chrono ou None, appel mesuré) pour l'utilisateur `user`."""
+    client = Client()
+    client.force_login(user)
+    dream = Dream.objects.filter(user=user, status=Dream.DreamStatus.COMPLETED).order_by("-created_at").first()
+    dream.personal_phrase_date = timezone.localdate()  # message frais : pas de régénération
+    dream.save(update_fields=["personal_phrase_date"])
+    first_page, _ = gallery_page(user)
+    cursor = encode_cursor(first_page[-1])
+
+    def get(url, **params):
+        response = client.get(url, params)
+        assert response.status_code == 200, f"{url} → {response.status_code}"
+        return response
+
+    dashboard = reverse("dream_bridge_app:dashboard")
+    clear_reports = caches[report_cache.CACHE_ALIAS].clear
+    return [
+        ("view:galerie", None, lambda: get(reverse("dream_bridge_app:galerie"))),
+        ("view:galerie_page_api", None, lambda: get(reverse("dream_bridge_app:galerie-page-api"), cursor=cursor)),
+        ("view:dashboard_7d", clear_reports, lambda: get(dashboard, period="7d")),
+        ("view:dashboard_all", clear_reports, lambda: get(dashboard, period="all")),
+        ("view:dashboard_all_cached", lambda: get(dashboard, period="all"), lambda: get(dashboard, period="all")),
+        ("view:dream_status", None,
+         lambda: get(reverse("dream_bridge_app:dream-status", kwargs={"dream_id": dream.id}))),
+        ("view:check_dream_status_api", None,
+         lambda: get(reverse("dream_bridge_app:check-dream-status-api", kwargs={"dream_id": dream.id}))),
+        ("metrics:report_metrics_7d", None, lambda: report_metrics(user, "7d")),
+        ("metrics:report_metrics_all", None, lambda: report_metrics(user, "all")),
+        ("metrics:dream_analytics", None, lambda: dream_analytics(user)),
+        ("metrics:emotions_disponible", None, lambda: list(emotions_disponible(user))),
+        ("metrics:gallery_page", None, lambda: gallery_page(user)),
+    ]
+
+
+def measure(prepare, call, repeat: int) -> dict:
+    """p50 / p95 (ms) et nombre maximal de requêtes sur `repeat` appels."""
+    timings, queries = [], 0
+    for _ in range(repeat):
+        if prepare:
+            prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, len(captured.captured_queries))
+    cuts = statistics.quantiles(timings, n=20, method="inclusive") if len(timings) > 1 else timings * 19
+    return {
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(cuts[18], 3),
+        "queries": queries,
+    }
+
+
+def over_budget(results: dict) -> list:
+    return [
+        f"{name} : {result['queries']} requêtes (budget {QUERY_BUDGETS[name]})"
+        for name, result in results.items()
+        if name in QUERY_BUDGETS and result["queries"] > QUERY_BUDGETS[name]
+    ]
+
+
+def compare(results: dict, baseline: dict, tolerance: float, noise_ms: float = 1.0) -> tuple:
+    """
+    (lignes de comparaison, régressions) face à `baseline` : une régression
+    est une requête de plus, ou un p95 au-delà de (1 + tolerance) fois la
+    référence et d'au moins `noise_ms`.
+    """
+    lines, regressions = [], []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            lines.append(f"{name:<32} nouveau")
+            continue
+        delta = result["p95_ms"] - reference["p95_ms"]
+        ratio = delta / reference["p95_ms"] * 100 if reference["p95_ms"] else 0.0
+        lines.append(
+            f"{name:<32} p95 {reference['p95_ms']:9.2f} → {result['p95_ms']:9.2f} ms ({ratio:+6.1f} %)"
+            f"  requêtes {reference['queries']} → {result['queries']}"
+        )
+        if result["queries"] > reference["queries"]:
+            regressions.append(f"{name} : {reference['queries']} → {result['queries']} requêtes")
+        if delta > noise_ms and result["p95_ms"] > reference["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name} : p95 {reference['p95_ms']:.2f} → {result['p95_ms']:.2f} ms")
+    return lines, regressions
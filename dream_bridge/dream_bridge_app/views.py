@@ -1,15 +1,19 @@
 # dream_bridge_app/views.py
-import tempfile
-import uuid
 import json
 
-from django.http import JsonResponse, HttpResponseBadRequest
+import redis
+from django.conf import settings
+from django.http import JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 
+from . import blobstore, report_cache, status_events
+from .analytics import dream_analytics
+from .gallery import InvalidCursor, gallery_page, serialize_dream
 from .models import Dream
 from .forms import DreamForm, UserForm, ProfileForm
 from .tasks import process_dream_audio_task
@@ -31,16 +35,11 @@ def dream_create_view(request):
     if request.method == 'POST':
         form = DreamForm(request.POST, request.FILES)
         if form.is_valid():
-            uploaded_file = request.FILES['audio']
-            temp_dir = tempfile.gettempdir()
-            temp_filename = f"{uuid.uuid4()}_{uploaded_file.name}"
-            temp_path = f"{temp_dir}/{temp_filename}"
-            with open(temp_path, 'wb+') as temp_f:
-                for chunk in uploaded_file.chunks():
-                    temp_f.write(chunk)
-
-            dream = Dream.objects.create(user=request.user)
-            process_dream_audio_task.delay(str(dream.id), temp_path)
+            # Le worker peut tourner sur une autre machine : l'audio va dans
+            # le blob store partagé et la tâche ne reçoit que la clé.
+            audio_key = blobstore.put_upload(request.FILES['audio'])
+            dream = Dream.objects.create(user=request.user, audio_ref=audio_key)
+            process_dream_audio_task.delay(str(dream.id))
             return redirect(reverse('dream_bridge_app:dream-status', kwargs={'dream_id': dream.id}))
     else:
         form = DreamForm()
@@ -59,15 +58,15 @@ def dashboard(request):
 
 @login_required
 def galerie_filtree(request):
-    emotion_filtreedate_filtree = request.GET.get('emotion')
+    emotion_filtree = request.GET.get('emotion')
     date_filtree = request.GET.get('created_at')
-    images = Dream.objects.filter(status='COMPLETED', generated_image__isnull=False, phrase__isnull=False).order_by('-created_at')
 
-    if emotion_filtreedate_filtree and emotion_filtreedate_filtree != "all":
-        images = images.filter(emotion=emotion_filtreedate_filtree)
-
-    if date_filtree:
-        images = images.filter(created_at__date=date_filtree)
+    # Première page seulement : les suivantes arrivent par galerie_page_api.
+    try:
+        images, next_cursor = gallery_page(request.user, emotion_filtree, date_filtree,
+                                           cursor=request.GET.get('cursor'))
+    except InvalidCursor:
+        images, next_cursor = gallery_page(request.user, emotion_filtree, date_filtree)
 
     emotions_disponibles = (Dream.objects
                             .filter(user=request.user)
@@ -77,11 +76,26 @@ def galerie_filtree(request):
 
     return render(request, 'dream_bridge_app/galerie.html', {
         'images': images,
+        'next_cursor': next_cursor,
         'emotions': emotions_disponibles,
-        'selected_emotion': emotion_filtreedate_filtree,
+        'selected_emotion': emotion_filtree,
         'selected_date': date_filtree,
     })
 
+
+@login_required
+def galerie_page_api(request):
+    """Page suivante de la galerie (défilement infini) au format JSON."""
+    try:
+        images, next_cursor = gallery_page(request.user, request.GET.get('emotion'),
+                                           request.GET.get('created_at'), cursor=request.GET.get('cursor'))
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'results': [serialize_dream(dream) for dream in images],
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def library(request):
     return render(request, 'dream_bridge_app/library.html')
@@ -90,17 +104,14 @@ def library(request):
 @login_required
 def dream_status_view(request, dream_id):
     """
-    Page d’un rêve : génère/affiche le message personnalisé.
+    Page d’un rêve : affiche le message personnalisé déjà enregistré.
+    - S'il n'est pas du jour, Celery le régénère ; on sert l'ancien en attendant.
     - Montre l’émotion dominante et la date locale.
     """
     dream = get_object_or_404(Dream, id=dream_id, user=request.user)
 
-    if dream.status == Dream.DreamStatus.COMPLETED:
-        try:
-            generate_personal_message_for_dream(str(dream.id), force=True)
-            dream.refresh_from_db(fields=["personal_phrase", "personal_phrase_date", "phrase", "phrase_date", "emotion"])
-        except Exception:
-            pass
+    if dream.status == Dream.DreamStatus.COMPLETED and not personal_message_is_fresh(dream):
+        schedule_personal_message_refresh(dream)
 
     # Priorité d’affichage
     daily_message = dream.personal_phrase or dream.phrase or get_daily_message(request.user.id)
@@ -117,21 +128,71 @@ def dream_status_view(request, dream_id):
         'daily_message': daily_message,
         'created_at_local': created_at_local,
         'emotion_label': emotion_label,
+        'status_stream_enabled': settings.DREAM_STATUS_STREAM_ENABLED,
     })
 
 
 @login_required
 def check_dream_status_api(request, dream_id):
-    """Retourne le statut d'un rêve au format JSON."""
-    try:
-        dream = Dream.objects.get(id=dream_id, user=request.user)
-        if dream.status in ('COMPLETED', 'FAILED'):
-            status_url = reverse('dream_bridge_app:dream-status', kwargs={'dream_id': dream.id})
-            return JsonResponse({'status': dream.status, 'status_url': status_url})
-        return JsonResponse({'status': dream.status})
-    except Dream.DoesNotExist:
+    """
+    Retourne le statut d'un rêve au format JSON, depuis le miroir Redis
+    (status_events.py). Réponse avec ETag : un If-None-Match inchangé
+    renvoie 304. L'authentification est la normale (empreinte de session
+    comprise) ; la table Dream n'est lue que si le miroir est absent.
+    """
+    user_id = request.user.pk
+
+    mirror = status_events.read_mirror(dream_id)
+    if mirror is None:
+        row = Dream.objects.filter(id=dream_id, user_id=user_id).values_list('status', 'updated_at').first()
+        if row is None:
+            return JsonResponse({'status': 'NOT_FOUND'}, status=404)
+        status, updated_at = row
+        status_events.mirror_status(dream_id, user_id, status, updated_at)
+    elif mirror['user'] != str(user_id):
+        return JsonResponse({'status': 'NOT_FOUND'}, status=404)
+    else:
+        status, updated_at = mirror['status'], mirror['updated_at']
+
+    etag = status_events.status_etag(status, updated_at)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(status_events.event_payload(dream_id, status))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+async def dream_status_stream_view(request, dream_id):
+    """
+    Flux SSE du statut d'un rêve (remplace le polling quand le serveur est ASGI).
+    503 si le flux est désactivé (WSGI) ou Redis indisponible : le client repasse au polling.
+    """
+    if not settings.DREAM_STATUS_STREAM_ENABLED:
+        return JsonResponse({'error': 'stream_unavailable'}, status=503)
+    user = await request.auser()
+    owned = Dream.objects.filter(id=dream_id, user=user).values_list('status', flat=True)
+    current = await owned.afirst()
+    if current is None:
         return JsonResponse({'status': 'NOT_FOUND'}, status=404)
 
+    client = pubsub = None
+    if current not in status_events.TERMINAL_STATUSES:
+        try:
+            client, pubsub = await status_events.subscribe(dream_id)
+        except (redis.RedisError, OSError):
+            return JsonResponse({'status': current, 'error': 'stream_unavailable'}, status=503)
+        # Relu après l'abonnement : une transition publiée entre-temps n'est pas perdue.
+        current = await owned.afirst()
+
+    response = StreamingHttpResponse(
+        status_events.stream_events(dream_id, current, client, pubsub), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon côté proxy (nginx)
+    return response
+
 
 @login_required
 def report(request):
@@ -139,25 +200,22 @@ def report(request):
     period = request.GET.get("period", "7d")
     selected_emotion = request.GET.get("emotion", "all")
 
-    # Rêves filtrés
-    dreams = get_dreams_in_period(user, period, emotion=selected_emotion)
-
-    td = dreams.count()
-    freq = dream_frequency(user, period, emotion=selected_emotion)
-    ed = emotion_distribution(user, period, emotion=selected_emotion)
-
-    # --- Nouvelle métrique : longueur moyenne des transcriptions ---
-    transcription_data = get_transcription_trend(user, period, emotion=selected_emotion)
-
-    context = {
-        "total_dreams": td,
-        "dream_frequency": freq,
-        "emotion_distribution": json.dumps(ed),
-        "transcription_trend": json.dumps(transcription_data),
-        "period": period,
-        "emotions": list(emotions_disponible(user)),
-        "selected_emotion": selected_emotion,
-    }
+    def compute():
+        # Les quatre métriques viennent d'une seule requête sur l'agrégat quotidien
+        metrics = report_metrics(user, period, emotion=selected_emotion)
+        return {
+            "total_dreams": metrics["total_dreams"],
+            "dream_frequency": metrics["dream_frequency"],
+            "emotion_distribution": json.dumps(metrics["emotion_distribution"]),
+            "transcription_trend": json.dumps(metrics["transcription_trend"]),
+            "emotions": list(emotions_disponible(user)),
+        }
+
+    # Recalculé seulement si un rêve de l'utilisateur a changé (voir report_cache.py)
+    context = dict(report_cache.cached_report(user, period, selected_emotion, compute))
+    # Séries, moyennes glissantes, transitions : tout l'historique, chargé une fois par génération
+    context["analytics"] = report_cache.cached_analytics(user, lambda: dream_analytics(user))
+    context.update({"period": period, "selected_emotion": selected_emotion})
 
     return render(request, "dream_bridge_app/dashboard.html", context)
 